@@ -1,19 +1,31 @@
+import time
+_STARTED = time.perf_counter()  # 启动耗时基准（bench_startup.py 使用）
 import tkinter as tk
 from tkinter import ttk, scrolledtext, simpledialog, messagebox, filedialog
-import subprocess
 import threading
-import time
 import random
 import os
-import sys
 import json
-from datetime import datetime, timedelta
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+import functools
+import concurrent.futures
+from datetime import datetime
+import reboot_engine
+import profiles
+import scheduler
+import fleet
+from driver_pool import DriverPool
+from orchestrator import Orchestrator
+from phase_timer import PhaseRecorder, PhaseTimer
+from metrics import METRICS, MetricsServer
+from log_pipeline import LogPipeline, MAX_SCREEN_LINES
+from run_history import RunHistory
+from link_monitor import LinkMonitor
+from retry_policy import RetryPolicy
+from job_queue import JobRejected
+from daemon_client import DaemonClient, DaemonError
+
+# 启动性能测试模式：窗口首次显示后输出耗时并退出
+STARTUP_PROBE = bool(os.environ.get("ROUTER_APP_STARTUP_PROBE"))
 
 class RouterRebootApp:
     def __init__(self, root):
@@ -29,6 +41,15 @@ class RouterRebootApp:
         self.config_dir = os.path.join(os.path.dirname(__file__), "configs")
         self.default_config_path = os.path.join(self.config_dir, "default.json")
         self.last_used_config_path = os.path.join(self.config_dir, "last_used.json")
+        self.config_name = "default"
+        self.profile_repo = profiles.ProfileRepository(self.config_dir)
+        self.reported_config_errors = {}
+        
+        # 运行记录目录（阶段耗时等）
+        self.log_dir = os.path.join(os.path.dirname(__file__), "logs")
+        self.phase_recorder = PhaseRecorder(jsonl_path=os.path.join(self.log_dir, "phases.jsonl"))
+        # 日志先进入队列，由界面线程分批显示，完整日志写入按大小轮转的文件
+        self.log_pipeline = LogPipeline(file_path=os.path.join(self.log_dir, "app.log"))
         
         # 确保配置目录存在
         if not os.path.exists(self.config_dir):
@@ -40,19 +61,41 @@ class RouterRebootApp:
         
         # 先初始化UI (确保log_text被创建)
         self.init_ui()
+        self.pump_log()
         
         # 再加载配置 (此时log_text已存在)
         self.config = self.load_config_with_prompt()
         
         # 定时任务状态
         self.scheduled_task_running = False
-        self.scheduled_task_thread = None
-        self.stop_event = threading.Event()
+        self.scheduler = None
+        self.scheduled_future = None  # 执行中的定时任务作业，停止定时任务时取消
+        self.link_monitor = None
+        
+        # 本地指标服务（metrics_port 为0时不启动）
+        self.metrics_server = None
+        self.start_metrics_server()
+        
+        # 常驻浏览器会话池（按需创建）
+        self.driver_pool = None
+        # 设备操作编排（后台asyncio事件循环，首次提交操作时启动）
+        self.run_history = RunHistory(os.path.join(self.log_dir, "history.db"))
+        self.orchestrator = Orchestrator(history=self.run_history)
+        # 后台服务（daemon.py）在运行时，重启、WiFi连接和定时任务交给它执行，界面只作为客户端
+        self.daemon = None
+        self.daemon_seq = 0  # 已显示的后台服务日志序号
+        self.daemon_stop = threading.Event()
+        self.connect_daemon()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # 刷新WiFi列表和配置列表
         self.refresh_wifi_list()
         self.refresh_config_list()
         
+        # 窗口显示后再在后台预加载浏览器相关模块
+        if self.config.get("prewarm_imports"):
+            self.root.after(500, self.start_prewarm)
+        
     def setup_styles(self):
         """设置界面样式"""
         self.style.theme_use('clam')
@@ -182,6 +225,12 @@ class RouterRebootApp:
         self.clear_log_btn = ttk.Button(btn_frame, text="清空日志", command=self.clear_log)
         self.clear_log_btn.pack(side="right", padx=5)
         
+        self.phase_stats_btn = ttk.Button(btn_frame, text="耗时统计", command=self.show_phase_stats)
+        self.phase_stats_btn.pack(side="right", padx=5)
+        
+        self.history_btn = ttk.Button(btn_frame, text="运行统计", command=self.show_run_history)
+        self.history_btn.pack(side="right", padx=5)
+        
         # ASCII艺术
         self.ascii_label = ttk.Label(parent, text="", font=("Consolas", 8), background="#ffffff")
         self.ascii_label.pack(fill="x", padx=10, pady=5)
@@ -258,6 +307,27 @@ class RouterRebootApp:
         ttk.Label(form_frame, text="密码:").grid(row=5, column=0, sticky="w", pady=5)
         self.password_var = tk.StringVar()
         ttk.Entry(form_frame, textvariable=self.password_var, show="*").grid(row=5, column=1, sticky="ew", pady=5, padx=5)
+        
+        # 重启引擎：http 直连失败时自动回退到浏览器模拟
+        ttk.Label(form_frame, text="重启引擎:").grid(row=6, column=0, sticky="w", pady=5)
+        self.engine_var = tk.StringVar(value=reboot_engine.DEFAULT_ENGINE)
+        ttk.Combobox(form_frame, textvariable=self.engine_var, values=reboot_engine.ENGINE_CHOICES,
+                     state="readonly").grid(row=6, column=1, sticky="ew", pady=5, padx=5)
+        
+        # 常驻浏览器：多次重启之间复用同一个Chrome
+        self.keep_browser_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(form_frame, text="保持浏览器常驻（定时任务无需每次冷启动Chrome）",
+                        variable=self.keep_browser_var).grid(row=7, column=1, sticky="w", pady=5, padx=5)
+        
+        # 重启后确认：探测光猫断开并重新上线，记录停机时长
+        self.verify_reboot_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(form_frame, text="重启后确认光猫断开并恢复（记录停机时长）",
+                        variable=self.verify_reboot_var).grid(row=8, column=1, sticky="w", pady=5, padx=5)
+        
+        # 精简浏览器：浏览器模拟时不加载图片/样式/字体，页面DOM就绪即开始操作
+        self.browser_lean_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(form_frame, text="精简浏览器模式（不加载图片、样式和字体）",
+                        variable=self.browser_lean_var).grid(row=9, column=1, sticky="w", pady=5, padx=5)
     
     def setup_wifi_config(self, parent):
         """WiFi配置内容"""
@@ -338,6 +408,23 @@ class RouterRebootApp:
         
         self.stop_schedule_btn = ttk.Button(btn_frame, text="停止定时任务", command=self.stop_scheduled_task, state="disabled")
         self.stop_schedule_btn.pack(side="left", padx=10)
+        
+        # 链路监控：链路质量持续变差时才重启（阈值见配置中的 monitor_* 项）
+        monitor_frame = ttk.LabelFrame(parent, text="链路监控", padding=10)
+        monitor_frame.pack(fill="x", padx=10, pady=5)
+        
+        self.monitor_status_var = tk.StringVar(value="未运行")
+        ttk.Label(monitor_frame, textvariable=self.monitor_status_var).pack(anchor="w", padx=20, pady=5)
+        
+        monitor_btn_frame = ttk.Frame(monitor_frame)
+        monitor_btn_frame.pack(fill="x", padx=20, pady=5)
+        
+        self.start_monitor_btn = ttk.Button(monitor_btn_frame, text="启动链路监控", command=self.start_link_monitor)
+        self.start_monitor_btn.pack(side="left", padx=10)
+        
+        self.stop_monitor_btn = ttk.Button(monitor_btn_frame, text="停止链路监控", command=self.stop_link_monitor,
+                                           state="disabled")
+        self.stop_monitor_btn.pack(side="left", padx=10)
     
     def setup_config_file_tab(self, parent):
         """配置文件管理标签页"""
@@ -353,6 +440,7 @@ class RouterRebootApp:
         ttk.Label(list_frame, text="已保存的配置文件在\_internal\configs目录:").pack(anchor="w", pady=5)
         
         self.config_listbox = tk.Listbox(list_frame, height=8, font=("SimHei", 10),
+                                        selectmode=tk.EXTENDED,
                                         bg="#f9f9f9",
                                         bd=1,
                                         relief=tk.FLAT)
@@ -376,6 +464,9 @@ class RouterRebootApp:
         delete_btn = ttk.Button(btn_frame, text="删除选中配置", command=self.delete_selected_config)
         delete_btn.pack(side="left", padx=5)
         
+        self.fleet_btn = ttk.Button(btn_frame, text="批量重启选中", command=self.start_fleet_thread)
+        self.fleet_btn.pack(side="left", padx=5)
+        
         # 说明文本
         note_frame = ttk.LabelFrame(config_frame, text="说明")
         note_frame.pack(fill="x", padx=10, pady=10)
@@ -383,23 +474,14 @@ class RouterRebootApp:
         note_text = """- 默认配置：程序初始设置，不会被修改
 - 上次使用：自动保存的上次运行配置
 - 可将常用配置另存为不同文件，方便切换使用
+- 按住Ctrl/Shift多选后点击“批量重启选中”，可同时重启多台光猫
 """
         ttk.Label(note_frame, text=note_text, justify="left").pack(padx=10, pady=10, fill="x")
     
     # 配置文件管理相关方法
     def get_default_config(self):
         """获取默认配置"""
-        return {
-            "router_ip": "192.168.1.1",
-            "login_url": "http://{router_ip}/",
-            "start_page_url": "http://{router_ip}/",
-            "manage_url": "http://{router_ip}/",
-            "username": "user",
-            "password": "",
-            "wifi_list": [],
-            "auto_interval": 24,
-            "interval_unit": "时"
-        }
+        return profiles.get_default_config()
     
     def save_default_config(self):
         """保存默认配置到文件"""
@@ -412,8 +494,8 @@ class RouterRebootApp:
         if not os.path.exists(self.default_config_path):
             self.save_default_config()
             
-        # 检查是否有上次使用的配置
-        if os.path.exists(self.last_used_config_path):
+        # 检查是否有上次使用的配置（启动性能测试时不弹窗）
+        if os.path.exists(self.last_used_config_path) and not STARTUP_PROBE:
             # 询问用户
             answer = messagebox.askyesnocancel(
                 "加载配置", 
@@ -435,7 +517,7 @@ class RouterRebootApp:
     
     def choose_and_load_config(self):
         """让用户手动选择配置文件"""
-        config_files = [f for f in os.listdir(self.config_dir) if f.endswith('.json')]
+        config_files = self.profile_repo.list()
         
         if not config_files:
             messagebox.showinfo("提示", "没有找到配置文件，使用默认配置")
@@ -475,14 +557,8 @@ class RouterRebootApp:
     def load_config(self, file_path):
         """从文件加载配置"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            
-            # 确保配置完整（补充缺失的键）
-            default = self.get_default_config()
-            for key in default:
-                if key not in config:
-                    config[key] = default[key]
+            # 读取配置（未修改的文件直接取缓存），校验并补充缺失的键
+            config = self.profile_repo.load(file_path)
             
             # 更新界面控件值
             self.router_ip_var.set(config["router_ip"])
@@ -493,7 +569,12 @@ class RouterRebootApp:
             self.password_var.set(config["password"])
             self.interval_var.set(config["auto_interval"])
             self.interval_unit_var.set(config["interval_unit"])
+            self.engine_var.set(config["engine"])
+            self.keep_browser_var.set(config["keep_browser"])
+            self.verify_reboot_var.set(config["verify_reboot"])
+            self.browser_lean_var.set(config["browser_lean"])
                 
+            self.config_name = profiles.profile_name(file_path)
             self.log(f"已加载配置: {os.path.basename(file_path)}")
             return config
         except Exception as e:
@@ -512,11 +593,14 @@ class RouterRebootApp:
         self.config["password"] = self.password_var.get()
         self.config["auto_interval"] = self.interval_var.get()
         self.config["interval_unit"] = self.interval_unit_var.get()
+        self.config["engine"] = self.engine_var.get()
+        self.config["keep_browser"] = self.keep_browser_var.get()
+        self.config["verify_reboot"] = self.verify_reboot_var.get()
+        self.config["browser_lean"] = self.browser_lean_var.get()
         
         # 保存到上次使用的配置文件
         try:
-            with open(self.last_used_config_path, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=2)
+            self.profile_repo.save(self.last_used_config_path, self.config)
             
             self.log("配置已保存")
             messagebox.showinfo("成功", "配置已保存")
@@ -538,6 +622,10 @@ class RouterRebootApp:
         self.config["password"] = self.password_var.get()
         self.config["auto_interval"] = self.interval_var.get()
         self.config["interval_unit"] = self.interval_unit_var.get()
+        self.config["engine"] = self.engine_var.get()
+        self.config["keep_browser"] = self.keep_browser_var.get()
+        self.config["verify_reboot"] = self.verify_reboot_var.get()
+        self.config["browser_lean"] = self.browser_lean_var.get()
         
         # 询问文件名
         default_name = f"config_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
@@ -558,8 +646,7 @@ class RouterRebootApp:
         
         # 保存文件
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=2)
+            self.profile_repo.save(file_path, self.config)
             
             self.log(f"配置已另存为: {filename}")
             messagebox.showinfo("成功", f"配置已另存为: {filename}")
@@ -584,6 +671,10 @@ class RouterRebootApp:
             self.password_var.set(default_config["password"])
             self.interval_var.set(default_config["auto_interval"])
             self.interval_unit_var.set(default_config["interval_unit"])
+            self.engine_var.set(default_config["engine"])
+            self.keep_browser_var.set(default_config["keep_browser"])
+            self.verify_reboot_var.set(default_config["verify_reboot"])
+            self.browser_lean_var.set(default_config["browser_lean"])
             
             # 更新WiFi列表
             self.config["wifi_list"] = default_config["wifi_list"]
@@ -596,11 +687,21 @@ class RouterRebootApp:
         """刷新配置文件列表"""
         self.config_listbox.delete(0, tk.END)
         
-        # 获取所有配置文件
-        if os.path.exists(self.config_dir):
-            config_files = [f for f in os.listdir(self.config_dir) if f.endswith('.json')]
-            for f in config_files:
-                self.config_listbox.insert(tk.END, f)
+        # 获取所有配置文件（目录未变化时取缓存）
+        for f in self.profile_repo.list():
+            self.config_listbox.insert(tk.END, f)
+        # 界面空闲时校验各配置文件，格式有误的标红并输出原因
+        self.root.after_idle(self.check_config_files)
+    
+    def check_config_files(self):
+        """校验配置目录中的文件（未修改的文件不会重新解析）"""
+        problems = self.profile_repo.check()
+        for i, name in enumerate(self.config_listbox.get(0, tk.END)):
+            self.config_listbox.itemconfig(i, foreground="red" if name in problems else "")
+        for name, errors in problems.items():
+            if self.reported_config_errors.get(name) != errors:
+                self.log(f"⚠️ 配置文件 {name} 格式有误：{'；'.join(errors)}")
+        self.reported_config_errors = problems
     
     def load_selected_config(self):
         """加载选中的配置文件"""
@@ -692,15 +793,38 @@ class RouterRebootApp:
     
     # 日志和UI更新相关方法
     def log(self, message):
-        """添加日志到文本区域"""
-        if self.log_text is None:
-            return  # 日志控件尚未初始化时直接返回
-        
-        self.log_text.config(state="normal")
-        timestamp = time.strftime("%H:%M:%S")
-        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.log_text.see(tk.END)  # 滚动到最后
-        self.log_text.config(state="disabled")
+        """添加日志（可在任意线程调用，由界面线程分批显示）"""
+        self.log_pipeline.emit(message)
+        
+    def pump_log(self):
+        """在界面线程中把排队的日志一次性写入文本区域，并只保留最近的行"""
+        lines = self.log_pipeline.drain()
+        if lines and self.log_text is not None:
+            self.log_text.config(state="normal")
+            self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+            excess = int(self.log_text.index("end-1c").split(".")[0]) - 1 - MAX_SCREEN_LINES
+            if excess > 0:
+                self.log_text.delete("1.0", f"{excess + 1}.0")
+            self.log_text.see(tk.END)  # 滚动到最后
+            self.log_text.config(state="disabled")
+        # 积压较多时尽快继续处理，否则每100毫秒处理一批
+        self.root.after(10 if len(lines) >= 500 else 100, self.pump_log)
+        
+    def show_phase_stats(self):
+        """输出各阶段耗时的 p50/p95/max 汇总"""
+        self.log("各阶段耗时统计：\n" + self.phase_recorder.format_summary())
+        
+    def show_run_history(self):
+        """输出当前配置的重启成功率和耗时（近1天/7天/30天/全部）"""
+        summary = None
+        if self.daemon:
+            try:
+                summary = self.daemon.history(self.config_name)["summary"]
+            except DaemonError as e:
+                self.log(f"⚠️ 无法从后台服务读取运行统计：{str(e)}，显示本地记录")
+        if summary is None:
+            summary = self.run_history.format_summary(self.config_name)
+        self.log(f"运行统计（{self.config_name}）：\n" + summary)
         
     def clear_log(self):
         self.log_text.config(state="normal")
@@ -765,121 +889,218 @@ class RouterRebootApp:
     
     # 核心功能相关方法
     def start_reboot_thread(self):
-        """启动重启线程"""
+        """把重启操作加入设备作业队列（不阻塞界面）"""
         self.reboot_btn.config(state="disabled")
-        threading.Thread(target=self.reboot_router, daemon=True).start()
+        if self.daemon:
+            self.run_remote("reboot", self.reboot_btn)
+        else:
+            self.submit_job("reboot", self.reboot_btn)
         
     def start_wifi_thread(self):
-        """启动WiFi连接线程"""
+        """把WiFi连接操作加入设备作业队列（不阻塞界面）"""
         self.connect_wifi_btn.config(state="disabled")
-        threading.Thread(target=self.connect_wifi, daemon=True).start()
+        if self.daemon:
+            self.run_remote("wifi", self.connect_wifi_btn)
+        else:
+            self.submit_job("wifi", self.connect_wifi_btn)
         
-    def reboot_router(self):
-        """重启路由器的核心逻辑"""
+    def submit_job(self, kind, button):
+        """提交作业；被拒绝、取消或出错时由这里记录日志并恢复按钮"""
+        def done(future):
+            if future.cancelled():
+                self.root.after(0, lambda: button.config(state="normal"))
+                return
+            error = future.exception()
+            if error is None:
+                return
+            if isinstance(error, JobRejected):
+                self.log(f"⚠️ {str(error)}")
+            else:
+                self.log(f"❌ 操作出错：{str(error) or type(error).__name__}")
+            self.root.after(0, lambda: button.config(state="normal"))
+        
+        future = self.orchestrator.jobs.submit(self.config["router_ip"], kind, lambda: self.run_job_async(kind))
+        future.add_done_callback(done)
+        return future
+        
+    async def run_job_async(self, action):
+        """执行一个作业（在编排器的事件循环中运行）：reboot、wifi 或 wifi_reboot（先连接WiFi，再重启光猫）"""
+        if action == "reboot":
+            return await self.reboot_router_async()
+        if action == "wifi":
+            return await self.connect_wifi_async()
+        if not await self.connect_wifi_async():
+            self.log("WiFi连接失败，取消本次重启操作")
+            return False
+        self.log("WiFi连接成功，准备重启光猫...")
+        await self.wait_network_ready_async()
+        return await self.reboot_router_async()
+        
+    def start_fleet_thread(self):
+        """启动批量重启线程"""
+        selected = self.config_listbox.curselection()
+        if not selected:
+            messagebox.showwarning("提示", "请先选择一个或多个配置文件")
+            return
+        
+        paths = [os.path.join(self.config_dir, self.config_listbox.get(i)) for i in selected]
+        self.fleet_btn.config(state="disabled")
+        self.orchestrator.submit(self.run_fleet_async(paths))
+        
+    async def run_fleet_async(self, paths):
+        """并发重启多台光猫并输出汇总结果"""
+        try:
+            workers = self.config["fleet_workers"]
+            self.log(f"===== 开始批量重启 {len(paths)} 台光猫（并发 {workers}） =====")
+            results = await fleet.reboot_fleet(self.orchestrator, paths, workers=workers,
+                                               timeout=self.config["fleet_timeout"], log=self.log,
+                                               recorder=self.phase_recorder)
+            self.log("批量重启结果：\n" + fleet.format_results(results))
+        finally:
+            self.root.after(0, lambda: self.fleet_btn.config(state="normal"))
+        
+    def start_metrics_server(self):
+        """按配置启动本地指标服务"""
+        port = self.config.get("metrics_port") or 0
+        if not port:
+            return
+        try:
+            self.metrics_server = MetricsServer(port).start()
+            self.log(f"指标服务已启动：http://127.0.0.1:{port}/metrics")
+        except OSError as e:
+            self.log(f"❌ 指标服务启动失败：{str(e)}")
+        
+    def start_prewarm(self):
+        """后台预加载selenium，首次点击重启时无需再等待导入"""
+        threading.Thread(target=reboot_engine.prewarm, daemon=True).start()
+        
+    def get_driver_pool(self):
+        """按配置获取常驻浏览器池，未启用时关闭已有的池"""
+        if not self.config.get("keep_browser"):
+            if self.driver_pool:
+                self.driver_pool.close()
+                self.driver_pool = None
+            return None
+        lean = self.config.get("browser_lean", False)
+        if self.driver_pool is not None and self.driver_pool.factory.keywords["lean"] != lean:
+            # 浏览器模式变了，已启动的浏览器不再适用
+            self.driver_pool.close()
+            self.driver_pool = None
+        if self.driver_pool is None:
+            self.driver_pool = DriverPool(functools.partial(reboot_engine.create_chrome_driver, lean=lean),
+                                          max_age=self.config["browser_max_age"],
+                                          max_uses=self.config["browser_max_uses"],
+                                          log=self.log)
+        return self.driver_pool
+        
+    # 后台服务相关方法
+    def connect_daemon(self):
+        """连接本机运行中的后台服务，连接上后在后台线程中同步它的日志、进度和定时任务状态"""
+        self.daemon = DaemonClient.connect()
+        if self.daemon is None:
+            return
+        try:
+            entries = self.daemon.logs()
+            while entries:  # 只显示连接之后的日志
+                self.daemon_seq = entries[-1]["seq"]
+                entries = self.daemon.logs(self.daemon_seq)
+        except DaemonError:
+            pass
+        self.log(f"已连接后台服务（端口 {self.daemon.port}），重启、WiFi连接和定时任务由后台服务执行")
+        threading.Thread(target=self.follow_daemon, daemon=True).start()
+        
+    def follow_daemon(self):
+        """每秒拉取后台服务的新日志和状态（在后台线程中运行）；服务断开后改为本地执行"""
+        last_progress = None
+        while not self.daemon_stop.wait(1):
+            daemon = self.daemon
+            if daemon is None:
+                return
+            try:
+                entries = daemon.logs(self.daemon_seq)
+                status = daemon.status()
+            except DaemonError as e:
+                self.daemon = None
+                self.log(f"⚠️ 后台服务已断开（{str(e)}），之后的操作在本地执行")
+                self.root.after(0, lambda: self.show_schedule_state(None))
+                return
+            for entry in entries:
+                self.log(entry["message"])
+            if entries:
+                self.daemon_seq = entries[-1]["seq"]
+            progress = status["progress"].get(self.config_name)
+            if progress and progress != last_progress:
+                last_progress = progress
+                self.update_progress(progress["value"], progress["message"])
+            schedule = status["schedules"].get(self.config_name)
+            self.root.after(0, lambda schedule=schedule: self.show_schedule_state(schedule))
+        
+    def run_remote(self, action, button):
+        """交给后台服务执行（带上当前配置），在后台线程中等待执行完毕后恢复按钮"""
+        daemon, name, config = self.daemon, self.config_name, dict(self.config)
+        
+        def run():
+            try:
+                daemon.trigger(name, action, config=config, wait=True)
+            except DaemonError as e:
+                self.log(f"⚠️ {str(e)}" if e.status == 409 else f"❌ 后台服务执行失败：{str(e)}")
+            finally:
+                self.root.after(0, lambda: button.config(state="normal"))
+                self.root.after(5000, lambda: self.update_progress(0, "准备就绪"))
+        
+        threading.Thread(target=run, daemon=True).start()
+        
+    def show_schedule_state(self, schedule):
+        """按后台服务中当前配置的定时任务更新界面"""
+        running = bool(schedule and schedule["running"])
+        if running != self.scheduled_task_running:
+            self.set_schedule_ui(running)
+        if running and schedule["next"]:
+            self.next_run_var.set(f"{scheduler.format_time(schedule['next'])}（{schedule['next_name']}）")
+        
+    def on_close(self):
+        """关闭窗口时取消进行中的操作并退出常驻浏览器（后台服务中的定时任务不受影响）"""
+        self.daemon_stop.set()
+        if self.scheduler:
+            self.scheduler.stop()
+        if self.link_monitor:
+            self.link_monitor.stop()
+        self.orchestrator.stop(log=self.log)
+        if self.metrics_server:
+            self.metrics_server.stop()
+        if self.driver_pool:
+            self.driver_pool.close()
+        self.log_pipeline.close()
+        self.run_history.close()
+        self.root.destroy()
+        
+    async def reboot_router_async(self):
+        """重启路由器的核心逻辑（在编排器的事件循环中运行），返回是否成功"""
+        self.root.after(0, lambda: self.reboot_btn.config(state="disabled"))
         try:
-            # 替换URL中的占位符
-            router_ip = self.config["router_ip"]
-            login_url = self.config["login_url"].format(router_ip=router_ip)
-            start_page_url = self.config["start_page_url"].format(router_ip=router_ip)
-            manage_url = self.config["manage_url"].format(router_ip=router_ip)
-            username = self.config["username"]
-            password = self.config["password"]
-            
             self.log("开始重启光猫流程...")
-            self.update_progress(10, "初始化浏览器...")
+            self.update_progress(10, "初始化重启引擎...")
             
-            driver = None
+            timer = PhaseTimer(self.phase_recorder, self.config_name)
             try:
-                chrome_options = webdriver.ChromeOptions()
-                chrome_options.add_argument("--headless=new")
-                chrome_options.add_argument("--window-size=1920,1080")
-                chrome_options.add_argument("--log-level=0")
-                
-                if getattr(sys, 'frozen', False):
-                    chromedriver_path = os.path.join(sys._MEIPASS, "chromedriver.exe")
+                engine = await self.orchestrator.reboot(self.config, log=self.log, progress=self.update_progress,
+                                                        timeout=self.config["reboot_timeout"],
+                                                        driver_pool=self.get_driver_pool(), timer=timer)
+                label = reboot_engine.ENGINE_CLASSES[engine].label
+                if self.config.get("verify_reboot"):
+                    self.log(f"✅ 重启完成（{label}）")
+                    self.update_progress(100, "光猫已重启并恢复")
                 else:
-                    chromedriver_path = os.path.join(os.path.dirname(__file__), "chromedriver.exe")
-                
-                if not os.path.exists(chromedriver_path):
-                    raise FileNotFoundError(f"未找到Chrome驱动，请将chromedriver.exe放在以下目录：\n{os.path.dirname(chromedriver_path)}")
-                
-                service = Service(executable_path=chromedriver_path)
-                driver = webdriver.Chrome(service=service, options=chrome_options)
-                self.update_progress(20, "浏览器已启动")
-                
-                self.log(f"已打开光猫登录页：{login_url}")
-                driver.get(login_url)
-                self.update_progress(30, "加载登录页面...")
-                
-                WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.ID, "role_user")),
-                    message="登录页加载失败，未找到用户切换容器"
-                )
-                
-                switch_user_btn = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH, "//td[@id='role_user']/a[@class='user' and @onclick=\"goPage('user');\"]")),
-                    message="未找到普通用户切换按钮"
-                )
-                driver.execute_script("arguments[0].click();", switch_user_btn)
-                self.log(f"已切换到普通用户：{username}")
-                self.update_progress(40, "已切换用户类型")
-                
-                password_field = WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.NAME, "skypsd")),
-                    message="未找到密码输入框"
-                )
-                password_field.clear()
-                password_field.send_keys(password)
-                self.log("已填写密码")
-                self.update_progress(50, "已输入密码")
-                
-                login_button = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH, "//input[@type='submit' or @value='登录']")),
-                    message="未找到登录按钮"
-                )
-                login_button.click()
-                self.log("已提交登录请求")
-                self.update_progress(60, "登录中...")
-                
-                WebDriverWait(driver, 15).until(
-                    EC.url_contains(start_page_url),
-                    message="登录失败，未跳转到默认页面"
-                )
-                self.log(f"登录成功，当前页面：{driver.current_url}")
-                
-                driver.get(manage_url)
-                self.log(f"已进入重启页面：{manage_url}")
-                self.update_progress(70, "进入重启管理页面")
-                
-                WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.ID, "Submit1")),
-                    message="重启页面加载失败，未找到重启按钮"
-                )
-                
-                reboot_button = driver.find_element(By.ID, "Submit1")
-                driver.execute_script("arguments[0].click();", reboot_button)
-                self.log("已点击【设备重启】按钮")
-                self.update_progress(80, "已点击重启按钮")
-                
-                confirm_button = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.ID, "msgconfirmb")),
-                    message="未找到重启确认按钮"
-                )
-                confirm_button.click()
-                self.log("已点击【确定】按钮，重启指令已提交")
-                self.update_progress(90, "确认重启指令")
-                
-                time.sleep(3)
-                self.log("✅ 重启指令已发送，光猫将在5-15秒内重启")
-                self.update_progress(100, "重启指令已发送")
-                
+                    self.log(f"✅ 重启指令已发送（{label}），光猫将在5-15秒内重启")
+                    self.update_progress(100, "重启指令已发送")
+                return True
             except Exception as e:
                 self.log(f"❌ 操作失败：{str(e)}")
                 self.update_progress(0, f"操作失败: {str(e)}")
+                return False
             finally:
-                if driver:
-                    driver.quit()
-                self.log("* 浏览器已关闭")
+                if timer.records:
+                    self.log(f"阶段耗时：{timer.describe()}")
                 
         finally:
             # 恢复按钮状态
@@ -887,52 +1108,17 @@ class RouterRebootApp:
             # 5秒后重置进度条
             self.root.after(5000, lambda: self.update_progress(0, "准备就绪"))
             
-    def connect_wifi(self):
-        """连接WiFi的逻辑，返回连接状态"""
+    async def connect_wifi_async(self):
+        """连接WiFi的逻辑（在编排器的事件循环中运行），返回连接状态"""
+        self.root.after(0, lambda: self.connect_wifi_btn.config(state="disabled"))
         try:
-            if not self.config["wifi_list"]:
-                self.log("❌ 未配置任何WiFi，请先在WiFi设置中添加")
-                self.update_progress(0, "未配置WiFi")
-                return False  # 返回连接失败状态
-                
-            self.log("开始连接WiFi...")
-            self.update_progress(10, "开始连接WiFi...")
-            total_wifi = len(self.config["wifi_list"])
-            progress_step = 80 / total_wifi if total_wifi > 0 else 80
-            connected = False  # 连接状态标记
-            
-            # 尝试连接每个WiFi
-            for i, wifi in enumerate(self.config["wifi_list"]):
-                current_progress = 10 + (i * progress_step)
-                self.update_progress(current_progress, f"尝试连接: {wifi}")
-                self.log(f"尝试连接WiFi: {wifi}")
-                
-                # 执行netsh命令
-                result = subprocess.run(
-                    f'netsh wlan connect name="{wifi}"',
-                    shell=True,
-                    capture_output=True,
-                    text=True,
-                    encoding='utf-8'
-                )
-                
-                # 检查结果
-                if result.returncode == 0:
-                    self.log(f"✅ 成功连接到WiFi: {wifi}")
-                    self.update_progress(100, f"已连接: {wifi}")
-                    connected = True
-                    break  # 连接成功则退出循环
-                else:
-                    error_msg = result.stderr.strip() or "连接失败"
-                    self.log(f"❌ 连接WiFi {wifi} 失败: {error_msg}")
-            
-            # 所有WiFi都连接失败
-            if not connected:
-                self.log("❌ 所有配置的WiFi都连接失败")
-                self.update_progress(0, "WiFi连接失败")
-                
-            return connected  # 返回最终连接状态
-            
+            return await self.orchestrator.connect_wifi(self.config["wifi_list"], log=self.log,
+                                                        progress=self.update_progress,
+                                                        timeout=self.config["wifi_timeout"],
+                                                        profile=self.config_name,
+                                                        backend=self.config["network_backend"],
+                                                        scan_ttl=self.config["wifi_scan_ttl"],
+                                                        retry=RetryPolicy.from_config(self.config))
         finally:
             # 恢复按钮状态
             self.root.after(0, lambda: self.connect_wifi_btn.config(state="normal"))
@@ -957,89 +1143,154 @@ class RouterRebootApp:
         self.config["auto_interval"] = interval
         self.config["interval_unit"] = unit
         
-        self.stop_event.clear()
-        self.scheduled_task_running = True
-        self.scheduled_task_thread = threading.Thread(target=self.scheduled_task_loop, daemon=True)
-        self.scheduled_task_thread.start()
-        
-        # 更新UI状态
-        self.start_schedule_btn.config(state="disabled")
-        self.stop_schedule_btn.config(state="normal")
-        self.status_var.set("运行中")
-        self.status_label.config(foreground="green")
+        # 配置了 schedules 时按其中的规则执行，否则按界面上的间隔执行
+        try:
+            jobs = scheduler.jobs_from_config(self.config)
+        except ValueError as e:
+            messagebox.showerror("错误", f"定时规则有误: {str(e)}")
+            return
         
-        # 计算下次运行时间（转换为秒）
-        seconds = self.convert_to_seconds(interval, unit)
-        next_run = datetime.now() + timedelta(seconds=seconds)
-        self.next_run_var.set(next_run.strftime("%Y-%m-%d %H:%M:%S"))
+        if self.daemon:
+            try:
+                self.daemon.schedule(self.config_name, True, config=self.config)
+            except DaemonError as e:
+                messagebox.showerror("错误", f"后台服务启动定时任务失败: {str(e)}")
+                return
+            self.set_schedule_ui(True)
+            self.log("定时任务已交给后台服务，关闭窗口后继续运行")
+            return
         
-        self.log(f"定时任务已启动，间隔 {interval} {unit}")
+        self.scheduled_task_running = True
+        self.scheduler = scheduler.Scheduler(self.run_scheduled_job,
+                                             state_path=os.path.join(self.log_dir, f"schedule_{self.config_name}.json"),
+                                             log=self.log, on_change=self.on_schedule_change)
+        for job in jobs:
+            self.scheduler.add(job)
+            self.log(f"定时任务：{job.describe()}，下次执行 {scheduler.format_time(job.due)}")
+        self.scheduler.start()
+        
+        # 启用常驻浏览器时提前在后台启动Chrome
+        pool = self.get_driver_pool()
+        if pool and self.config["engine"] == "selenium":
+            threading.Thread(target=pool.warm, daemon=True).start()
+        
+        self.set_schedule_ui(True)
+        self.log(f"定时任务已启动，共 {len(jobs)} 个任务")
+    
+    def set_schedule_ui(self, running):
+        """更新定时任务的按钮和状态显示"""
+        self.scheduled_task_running = running
+        self.start_schedule_btn.config(state="disabled" if running else "normal")
+        self.stop_schedule_btn.config(state="normal" if running else "disabled")
+        self.status_var.set("运行中" if running else "已停止")
+        self.status_label.config(foreground="green" if running else "red")
+        if not running:
+            self.next_run_var.set("--")
+    
+    def on_schedule_change(self, job):
+        """调度器计划变化时更新下次执行时间（在调度线程中回调）"""
+        if job is None:
+            self.root.after(0, lambda: self.next_run_var.set("--"))
+            METRICS.next_run.set(0)
+            return
+        text = f"{scheduler.format_time(job.due)}（{job.name}）"
+        self.root.after(0, lambda: self.next_run_var.set(text))
+        METRICS.next_run.set(job.due)
     
     def stop_scheduled_task(self):
         """停止定时任务"""
         if not self.scheduled_task_running:
             return
             
-        self.stop_event.set()
+        if self.daemon:
+            try:
+                self.daemon.schedule(self.config_name, False)
+            except DaemonError as e:
+                self.log(f"❌ 后台服务停止定时任务失败：{str(e)}")
+                return
+            self.set_schedule_ui(False)
+            self.log("已停止后台服务中的定时任务")
+            return
+            
         self.scheduled_task_running = False
+        if self.scheduler:
+            self.scheduler.stop()
+        # 取消执行中的定时任务（没有其他请求在等同一个作业时，WiFi连接或重启会立即中止）
+        future = self.scheduled_future
+        if future and future.cancel():
+            self.log("已取消正在执行的定时任务")
         
-        # 更新UI状态
-        self.start_schedule_btn.config(state="normal")
-        self.stop_schedule_btn.config(state="disabled")
-        self.status_var.set("已停止")
-        self.status_label.config(foreground="red")
-        self.next_run_var.set("--")
+        self.set_schedule_ui(False)
+        METRICS.next_run.set(0)
         
         self.log("定时任务已停止")
     
     def convert_to_seconds(self, value, unit):
         """将时间值转换为秒"""
-        if unit == "秒":
-            return value
-        elif unit == "分":
-            return value * 60
-        elif unit == "时":
-            return value * 3600
-        return value * 3600  # 默认小时
+        return profiles.convert_to_seconds(value, unit)
     
-    def scheduled_task_loop(self):
-        """定时任务循环"""
+    async def wait_network_ready_async(self):
+        """等待光猫管理页端口可以连接（代替固定等待网络稳定）"""
+        limit = self.config["network_ready_timeout"]
+        waited = await self.orchestrator.wait_router_ready(self.config, timeout=limit)
+        if waited is None:
+            self.log(f"⚠️ {limit}秒内未能连接光猫管理页，仍尝试重启")
+        else:
+            self.log(f"网络已就绪（等待{waited:.1f}秒）")
+        return waited is not None
+
+    def start_link_monitor(self):
+        """启动链路监控"""
+        if self.link_monitor and self.link_monitor.running:
+            return
+        self.link_monitor = LinkMonitor(self.orchestrator, self.config, self.monitor_reboot, log=self.log,
+                                        on_sample=self.on_link_sample).start()
+        self.start_monitor_btn.config(state="disabled")
+        self.stop_monitor_btn.config(state="normal")
+        
+    def stop_link_monitor(self):
+        """停止链路监控"""
+        if self.link_monitor:
+            self.link_monitor.stop()
+            self.link_monitor = None
+        self.start_monitor_btn.config(state="normal")
+        self.stop_monitor_btn.config(state="disabled")
+        self.monitor_status_var.set("未运行")
+        
+    def on_link_sample(self, stats):
+        """每次采样后更新监控状态（在编排器线程中回调）"""
+        text = f"运行中：{stats.describe()}"
+        self.root.after(0, lambda: self.monitor_status_var.set(text))
+        
+    async def monitor_reboot(self, reason):
+        """链路监控触发的重启（经由作业队列，光猫已在重启时跳过）"""
         try:
-            while not self.stop_event.is_set():
-                # 执行任务：先连接WiFi，再重启光猫
-                self.log("===== 定时任务开始执行 =====")
-                
-                # 检查WiFi连接状态
-                if self.connect_wifi():
-                    self.log("WiFi连接成功，准备重启光猫...")
-                    time.sleep(5)  # 等待网络稳定
-                    self.reboot_router()
-                else:
-                    self.log("WiFi连接失败，取消本次重启操作")
-                
-                self.log("===== 定时任务执行完毕 =====")
-                
-                # 获取时间间隔（转换为秒）
-                interval = self.config["auto_interval"]
-                unit = self.config["interval_unit"]
-                seconds = self.convert_to_seconds(interval, unit)
-                
-                # 计算下次运行时间
-                next_run = datetime.now() + timedelta(seconds=seconds)
-                self.root.after(0, lambda: self.next_run_var.set(next_run.strftime("%Y-%m-%d %H:%M:%S")))
-                
-                # 等待下一个周期
-                self.log(f"等待{interval}{unit}后执行下一次任务...")
-                self.stop_event.wait(seconds)
-                
+            await self.orchestrator.jobs.run(self.config["router_ip"], "reboot",
+                                             lambda: self.run_job_async("reboot"))
+        except JobRejected as e:
+            self.log(f"⚠️ {str(e)}")
+        
+    def run_scheduled_job(self, job):
+        """执行一次定时任务（在调度线程中运行，等待作业队列执行完毕）"""
+        self.log(f"===== 定时任务【{job.name}】开始执行 =====")
+        self.scheduled_future = self.orchestrator.jobs.submit(self.config["router_ip"], job.action,
+                                                              lambda: self.run_job_async(job.action))
+        try:
+            self.scheduled_future.result()
+        except JobRejected as e:
+            self.log(f"跳过本次定时任务：{str(e)}")
+        except concurrent.futures.CancelledError:
+            self.log("===== 定时任务已取消 =====")
+            return
         finally:
-            # 更新任务状态
-            self.root.after(0, lambda: self.status_var.set("未运行"))
-            self.root.after(0, lambda: self.start_schedule_btn.config(state="normal"))
-            self.root.after(0, lambda: self.stop_schedule_btn.config(state="disabled"))
+            self.scheduled_future = None
+        self.log("===== 定时任务执行完毕 =====")
 
 if __name__ == "__main__":
     # 确保中文显示正常
     root = tk.Tk()
     app = RouterRebootApp(root)
+    if STARTUP_PROBE:
+        root.after(0, lambda: (print(f"FIRST_WINDOW_MS {(time.perf_counter() - _STARTED) * 1000:.1f}", flush=True),
+                               root.destroy()))
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""浏览器模式对比基准：在本地模拟光猫上分别用标准模式和精简模式运行浏览器模拟重启，
+输出各阶段耗时中位数和每次加载的静态资源数
+
+    python bench_browser.py --runs 5 --asset-latency 0.2
+    python bench_browser.py --runs 10 --keep-browser   # 复用浏览器，只比较页面操作部分
+"""
+import argparse
+import statistics
+import sys
+import time
+
+import reboot_engine
+from driver_pool import DriverPool
+from phase_timer import PHASES, PhaseTimer
+from stand_in_router import StandInRouter
+
+MODES = [("标准", False), ("精简", True)]
+
+
+def run_mode(router, lean, runs, keep_browser):
+    """返回 (每次总耗时列表, {阶段: 耗时列表}, 平均每次的静态资源请求数)"""
+    pool = None
+    if keep_browser:
+        pool = DriverPool(lambda: reboot_engine.create_chrome_driver(lean=lean), max_age=0, max_uses=0)
+    totals, phases = [], {}
+    assets_before = router.asset_count
+    try:
+        for _ in range(runs):
+            timer = PhaseTimer()
+            start = time.perf_counter()
+            reboot_engine.SeleniumRebootEngine(router.profile(browser_lean=lean), driver_pool=pool,
+                                               timer=timer).run()
+            totals.append(time.perf_counter() - start)
+            for record in timer.records:
+                phases.setdefault(record.phase, []).append(record.duration)
+    finally:
+        if pool:
+            pool.close()
+    return totals, phases, (router.asset_count - assets_before) / max(len(totals), 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="对比标准/精简浏览器模式的重启耗时")
+    parser.add_argument("--runs", type=int, default=5, help="每种模式运行的次数")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟光猫每个请求的额外延迟（秒）")
+    parser.add_argument("--asset-latency", type=float, default=0.1, help="模拟光猫静态资源的额外延迟（秒）")
+    parser.add_argument("--keep-browser", action="store_true", help="每种模式复用同一个浏览器（不计冷启动）")
+    args = parser.parse_args(argv)
+
+    router = StandInRouter(latency=args.latency, asset_latency=args.asset_latency).start()
+    results = {}
+    try:
+        for label, lean in MODES:
+            try:
+                results[label] = run_mode(router, lean, args.runs, args.keep_browser)
+            except (ImportError, FileNotFoundError) as e:
+                print(f"无法启动Chrome，跳过：{str(e)}")
+                return 0
+            except Exception as e:
+                print(f"❌ {label}模式运行失败：{str(e)}")
+                return 1
+    finally:
+        router.stop()
+
+    print(f"{'阶段':<10}" + "".join(f"{label + '模式':>12}" for label, _ in MODES))
+    for phase, phase_label in PHASES:
+        if any(phase in phases for _, phases, _ in results.values()):
+            cells = "".join(f"{statistics.median(phases[phase]) * 1000 if phase in phases else 0:>12.0f}"
+                            for _, phases, _ in results.values())
+            print(f"{phase_label:<10}{cells}  ms")
+    print(f"{'合计':<10}" + "".join(f"{statistics.median(totals) * 1000:>12.0f}" for totals, _, _ in results.values())
+          + "  ms")
+    print(f"{'静态资源':<10}" + "".join(f"{assets:>12.1f}" for _, _, assets in results.values()) + "  个/次")
+
+    standard, lean = (statistics.median(results[label][0]) for label, _ in MODES)
+    print(f"精简模式耗时为标准模式的 {lean / standard:.0%}（中位数 {standard:.2f}s → {lean:.2f}s）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""启动性能基准：测量 1.py 的导入耗时和首个窗口出现的时间，超过阈值时返回非零退出码
+
+    python bench_startup.py --runs 5 --max-import-ms 400 --max-window-ms 1500
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(HERE, "1.py")
+
+# 在子进程中加载 1.py（不进入 __main__），输出导入耗时和是否提前加载了 selenium
+IMPORT_PROBE = (
+    "import runpy, sys, time\n"
+    "t = time.perf_counter()\n"
+    f"runpy.run_path({APP!r}, run_name='startup_bench')\n"
+    "print('IMPORT_MS', (time.perf_counter() - t) * 1000)\n"
+    "print('SELENIUM_LOADED', any(m == 'selenium' or m.startswith('selenium.') for m in sys.modules))\n"
+)
+
+
+def measure_import():
+    """返回 (导入耗时ms, 是否加载了selenium, [(模块, 累计耗时us)])"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", IMPORT_PROBE],
+                          cwd=HERE, capture_output=True, text=True, encoding="utf-8")
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    import_ms = float(re.search(r"IMPORT_MS ([\d.]+)", proc.stdout).group(1))
+    selenium_loaded = "SELENIUM_LOADED True" in proc.stdout
+
+    modules = []
+    for line in proc.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)", line)
+        if match and not match.group(2).strip() and len(match.group(2)) == 1:
+            modules.append((match.group(3), int(match.group(1))))  # 只统计顶层导入
+    modules.sort(key=lambda m: m[1], reverse=True)
+    return import_ms, selenium_loaded, modules
+
+
+def measure_window():
+    """启动图形界面直到首个窗口出现，返回 (进程外耗时ms, 进程内耗时ms)；无图形环境时返回 None"""
+    env = dict(os.environ, ROUTER_APP_STARTUP_PROBE="1")
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, APP], cwd=HERE, env=env, capture_output=True,
+                          text=True, encoding="utf-8", timeout=60)
+    elapsed = (time.perf_counter() - start) * 1000
+    match = re.search(r"FIRST_WINDOW_MS ([\d.]+)", proc.stdout)
+    if not match:
+        return None
+    return elapsed, float(match.group(1))
+
+
+def summarize(values):
+    return f"中位 {statistics.median(values):.1f}ms，最小 {min(values):.1f}ms，最大 {max(values):.1f}ms"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="启动性能基准")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, help="导入耗时中位数上限")
+    parser.add_argument("--max-window-ms", type=float, help="首个窗口出现耗时中位数上限")
+    parser.add_argument("--top", type=int, default=8, help="列出最耗时的顶层导入个数")
+    args = parser.parse_args(argv)
+
+    failed = False
+    import_runs = [measure_import() for _ in range(args.runs)]
+    import_ms = [r[0] for r in import_runs]
+    print(f"导入 1.py：{summarize(import_ms)}")
+    if any(r[1] for r in import_runs):
+        print("❌ 启动时已加载 selenium（应在首次使用时才导入）")
+        failed = True
+    print("最耗时的顶层导入：")
+    for name, us in import_runs[-1][2][:args.top]:
+        print(f"  {name:<30}{us / 1000:>8.1f}ms")
+    if args.max_import_ms and statistics.median(import_ms) > args.max_import_ms:
+        print(f"❌ 导入耗时超过 {args.max_import_ms:g}ms")
+        failed = True
+
+    window_runs = [measure_window() for _ in range(args.runs)]
+    if any(r is None for r in window_runs):
+        print("首个窗口：无法启动图形界面（无显示环境），跳过")
+    else:
+        window_ms = [r[0] for r in window_runs]
+        print(f"首个窗口（含解释器启动）：{summarize(window_ms)}")
+        print(f"首个窗口（进程内）：{summarize([r[1] for r in window_runs])}")
+        if args.max_window_ms and statistics.median(window_ms) > args.max_window_ms:
+            print(f"❌ 首个窗口耗时超过 {args.max_window_ms:g}ms")
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""离线基准套件：在本地模拟光猫上按“引擎 + 选项”组合反复执行重启，
+输出端到端和各阶段耗时、浏览器内存峰值、每分钟可完成的次数，并把结果追加到结果文件，便于不同版本之间对比
+
+    python bench_suite.py --runs 10 --latency 0.05
+    python bench_suite.py --scenarios http,selenium-lean --label v2.3
+    python bench_suite.py --history            # 只查看已保存的结果对比
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import reboot_engine
+from driver_pool import DriverPool
+from phase_timer import PHASES, PhaseTimer, percentile
+from stand_in_router import StandInRouter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS = os.path.join(HERE, "logs", "bench_results.jsonl")
+
+# 场景：名称 -> (引擎, 配置覆盖, 是否复用浏览器)
+SCENARIOS = {
+    "http": ("http", {}, False),
+    "selenium": ("selenium", {}, False),
+    "selenium-lean": ("selenium", {"browser_lean": True}, False),
+    "selenium-pool": ("selenium", {}, True),
+    "selenium-lean-pool": ("selenium", {"browser_lean": True}, True),
+}
+
+
+def _children_rss_proc(root):
+    """没有 psutil 时通过 /proc 统计 root 的所有子孙进程的常驻内存（字节），不支持时返回 None"""
+    if not os.path.isdir("/proc"):
+        return None
+    parents = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", "rb") as f:
+                # 进程名可能含空格，从最后一个右括号之后取字段
+                fields = f.read().rsplit(b")", 1)[1].split()
+            parents[int(name)] = int(fields[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    total, stack = 0, [root]
+    page = os.sysconf("SC_PAGE_SIZE")
+    while stack:
+        pid = stack.pop()
+        for child, parent in parents.items():
+            if parent == pid:
+                stack.append(child)
+                try:
+                    with open(f"/proc/{child}/statm", "rb") as f:
+                        total += int(f.read().split()[1]) * page
+                except (OSError, IndexError, ValueError):
+                    pass
+    return total
+
+
+def children_rss(root):
+    """root 的所有子孙进程（chromedriver 和 Chrome）的常驻内存之和（字节）"""
+    try:
+        import psutil
+    except ImportError:
+        return _children_rss_proc(root)
+    total = 0
+    for child in psutil.Process(root).children(recursive=True):
+        try:
+            total += child.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
+
+
+class MemorySampler:
+    """后台线程定期采样子进程内存，记录峰值"""
+
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.peak = 0
+        self.supported = True
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = children_rss(os.getpid())
+            if rss is None:
+                self.supported = False
+                return
+            self.peak = max(self.peak, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_scenario(router, name, runs, warmup):
+    """返回场景结果 dict；浏览器无法启动时记录 skipped"""
+    engine, overrides, keep_browser = SCENARIOS[name]
+    cls = reboot_engine.ENGINE_CLASSES[engine]
+    config = router.profile(engine=engine, reuse_session=False, **overrides)
+    pool = None
+    if keep_browser:
+        pool = DriverPool(lambda: reboot_engine.create_chrome_driver(lean=config.get("browser_lean", False)),
+                          max_age=0, max_uses=0)
+    totals, steps, failures, error = [], {}, 0, ""
+    try:
+        with MemorySampler() as memory:
+            start = time.perf_counter()
+            for i in range(warmup + runs):
+                if i == warmup:
+                    start = time.perf_counter()  # 预热不计入吞吐
+                measured = i >= warmup
+                timer = PhaseTimer()
+                run_start = time.perf_counter()
+                try:
+                    cls(config, driver_pool=pool, timer=timer).run()
+                except (ImportError, FileNotFoundError) as e:
+                    return {"scenario": name, "skipped": " ".join(str(e).split())}
+                except Exception as e:
+                    failures += measured
+                    error = str(e)
+                    continue
+                if measured:
+                    totals.append(time.perf_counter() - run_start)
+                    for record in timer.records:
+                        steps.setdefault(record.phase, []).append(record.duration)
+            elapsed = time.perf_counter() - start
+    finally:
+        if pool:
+            pool.close()
+
+    totals.sort()
+    return {
+        "scenario": name,
+        "runs": len(totals),
+        "failures": failures,
+        "error": error,
+        "p50": round(percentile(totals, 50), 4),
+        "p95": round(percentile(totals, 95), 4),
+        "runs_per_min": round((len(totals) + failures) / elapsed * 60, 1) if elapsed else 0.0,
+        "memory_peak_mb": round(memory.peak / 1048576, 1) if memory.supported and engine == "selenium" else None,
+        "steps": {phase: round(statistics.median(values), 4) for phase, values in steps.items()},
+    }
+
+
+def git_version():
+    try:
+        proc = subprocess.run(["git", "describe", "--always", "--dirty"], cwd=HERE, capture_output=True,
+                              text=True, timeout=5)
+        return proc.stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def print_results(results):
+    done = [r for r in results if "skipped" not in r]
+    print(f"{'场景':<20}{'次数':>6}{'失败':>6}{'p50':>10}{'p95':>10}{'次/分':>9}{'内存峰值':>10}")
+    for r in done:
+        memory = f"{r['memory_peak_mb']:.0f}MB" if r["memory_peak_mb"] is not None else "-"
+        print(f"{r['scenario']:<20}{r['runs']:>6}{r['failures']:>6}{r['p50']:>9.3f}s{r['p95']:>9.3f}s"
+              f"{r['runs_per_min']:>9.1f}{memory:>10}")
+        if r["error"]:
+            print(f"  最近一次失败：{r['error']}")
+    for r in results:
+        if "skipped" in r:
+            print(f"{r['scenario']:<20}跳过：{r['skipped']}")
+    if not done:
+        return
+    print("\n各阶段耗时中位数（ms）")
+    print(f"{'阶段':<12}" + "".join(f"{r['scenario']:>20}" for r in done))
+    for phase, label in PHASES:
+        if any(phase in r["steps"] for r in done):
+            print(f"{label:<12}" + "".join(
+                f"{r['steps'][phase] * 1000:>20.1f}" if phase in r["steps"] else f"{'-':>20}" for r in done))
+
+
+def load_results(path):
+    entries = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entries.append(json.loads(line))
+    except (OSError, ValueError):
+        pass
+    return entries
+
+
+def print_comparison(entries, limit=5):
+    """最近几次保存的结果中各场景 p50 的对比"""
+    entries = entries[-limit:]
+    if len(entries) < 2:
+        print("保存的结果少于两次，暂无对比")
+        return
+    names = [n for n in SCENARIOS if any(n == r["scenario"] and "p50" in r for e in entries for r in e["results"])]
+    print(f"{'版本':<24}{'时间':<18}" + "".join(f"{n:>20}" for n in names))
+    for entry in entries:
+        p50 = {r["scenario"]: r.get("p50") for r in entry["results"]}
+        cells = "".join(f"{p50[n] * 1000:>18.0f}ms" if p50.get(n) is not None else f"{'-':>20}" for n in names)
+        stamp = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["timestamp"]))
+        print(f"{entry['label'][:23]:<24}{stamp:<18}{cells}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="在本地模拟光猫上对比各重启引擎和选项的性能")
+    parser.add_argument("--runs", type=int, default=5, help="每个场景计入统计的次数")
+    parser.add_argument("--warmup", type=int, default=1, help="每个场景预热的次数（不计入统计）")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟光猫每个请求的额外延迟（秒）")
+    parser.add_argument("--asset-latency", type=float, default=0.0, help="模拟光猫静态资源的额外延迟（秒）")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"逗号分隔，可选 {','.join(SCENARIOS)}")
+    parser.add_argument("--label", help="本次结果的版本标签（默认为 git describe）")
+    parser.add_argument("--results", default=DEFAULT_RESULTS, help="结果文件（JSON Lines，每次运行追加一行）")
+    parser.add_argument("--no-save", action="store_true", help="不保存本次结果")
+    parser.add_argument("--history", action="store_true", help="只显示已保存结果的对比")
+    args = parser.parse_args(argv)
+
+    if args.history:
+        print_comparison(load_results(args.results), limit=20)
+        return 0
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知的场景：{', '.join(unknown)}")
+
+    results = []
+    with StandInRouter(latency=args.latency, asset_latency=args.asset_latency) as router:
+        for name in names:
+            print(f"运行场景 {name} ...", flush=True)
+            results.append(run_scenario(router, name, args.runs, args.warmup))
+    print()
+    print_results(results)
+
+    if not args.no_save:
+        entry = {
+            "label": args.label or git_version(),
+            "timestamp": time.time(),
+            "python": sys.version.split()[0],
+            "settings": {"runs": args.runs, "warmup": args.warmup, "latency": args.latency,
+                         "asset_latency": args.asset_latency},
+            "results": results,
+        }
+        os.makedirs(os.path.dirname(args.results) or ".", exist_ok=True)
+        with open(args.results, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        print(f"\n结果已追加到 {args.results}")
+        print_comparison([e for e in load_results(args.results) if e.get("settings") == entry["settings"]])
+    return 1 if any(r.get("failures") for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""协作式取消：在线程中运行的操作（浏览器模拟、同步HTTP直连）在步骤之间和等待中检查取消令牌，
+被取消时尽快结束；登记的清理（关闭浏览器、断开连接）在取消时立即执行，打断正在阻塞的调用
+"""
+import threading
+
+
+def _noop():
+    pass
+
+
+class OperationCancelled(Exception):
+    """操作已被取消（不是失败，不应重试或回退到其他引擎）"""
+
+
+class CancelToken:
+    """线程安全的取消令牌，可在任意线程中 cancel()"""
+
+    def __init__(self):
+        self.reason = ""
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason="操作已取消"):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass  # 清理失败不影响取消本身
+
+    def check(self):
+        """已取消时抛出 OperationCancelled"""
+        if self._event.is_set():
+            raise OperationCancelled(self.reason)
+
+    def wait(self, timeout):
+        """等待最多 timeout 秒，期间被取消时提前返回 True"""
+        return self._event.wait(timeout)
+
+    def on_cancel(self, callback):
+        """登记取消时执行的清理（已取消时立即执行），返回撤销登记的函数"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._discard(callback)
+        callback()
+        return _noop
+
+    def _discard(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
@@ -0,0 +1,293 @@
+"""命令行入口：无需图形界面（不导入 tkinter），适合无桌面的 Linux 服务器、cron 和 systemd
+
+    python cli.py reboot   --config configs/联通.json
+    python cli.py wifi     --config configs/联通.json
+    python cli.py schedule --config configs/联通.json [--interval 24 --unit 时 | --at 04:00 | --cron "0 4 * * *"]
+    python cli.py fleet    configs/a.json configs/b.json --workers 8
+    python cli.py monitor  --config configs/联通.json
+    python cli.py history  --config configs/联通.json
+    python cli.py check    [configs/]
+
+退出码：0 成功，1 操作失败，2 参数或配置错误，130 被中断
+"""
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_CONFIG = 2
+EXIT_INTERRUPTED = 130
+
+
+def log(message):
+    timestamp = time.strftime("%H:%M:%S")
+    print(f"[{timestamp}] {message}", flush=True)
+
+
+def load_config(args):
+    import profiles
+
+    config = profiles.load_profile(args.config)
+    if getattr(args, "engine", None):
+        config["engine"] = args.engine
+    return config
+
+
+def cmd_reboot(args, orchestrator):
+    import profiles
+    from phase_timer import PhaseTimer
+
+    config = load_config(args)
+    timer = PhaseTimer(config_name=profiles.profile_name(args.config))
+    log("开始重启光猫流程...")
+    try:
+        engine = orchestrator.run(orchestrator.reboot(config, log=log, timeout=args.timeout or config["reboot_timeout"],
+                                                      timer=timer))
+    except Exception as e:
+        log(f"❌ 操作失败：{str(e)}")
+        return EXIT_FAILED
+    finally:
+        if timer.records:
+            log(f"阶段耗时：{timer.describe()}")
+    if config["verify_reboot"]:
+        log(f"✅ 重启完成（{engine}），停机{timer.duration('recovery'):.1f}秒")
+    else:
+        log(f"✅ 重启指令已发送（{engine}），光猫将在5-15秒内重启")
+    return EXIT_OK
+
+
+def cmd_wifi(args, orchestrator):
+    import profiles
+    from retry_policy import RetryPolicy
+
+    config = load_config(args)
+    connected = orchestrator.run(orchestrator.connect_wifi(config["wifi_list"], log=log,
+                                                           timeout=args.timeout or config["wifi_timeout"],
+                                                           profile=profiles.profile_name(args.config),
+                                                           backend=config["network_backend"],
+                                                                   scan_ttl=config["wifi_scan_ttl"],
+                                                           retry=RetryPolicy.from_config(config)))
+    return EXIT_OK if connected else EXIT_FAILED
+
+
+def cmd_schedule(args, orchestrator):
+    import profiles
+    import scheduler
+    from retry_policy import RetryPolicy
+    from phase_timer import PhaseTimer
+
+    config = load_config(args)
+    name = profiles.profile_name(args.config)
+    if args.cron:
+        jobs = [scheduler.Job(args.cron, scheduler.CronTrigger(args.cron), jitter=args.jitter)]
+    elif args.at:
+        jobs = [scheduler.Job(f"每天{args.at}", scheduler.daily_trigger(args.at), jitter=args.jitter)]
+    else:
+        jobs = scheduler.jobs_from_config(config, args.interval, args.unit)
+
+    def run_job(job):
+        log(f"===== 定时任务【{job.name}】开始执行 =====")
+        if job.action != "reboot" and not args.skip_wifi:
+            connected = orchestrator.run(orchestrator.connect_wifi(config["wifi_list"], log=log,
+                                                                   timeout=config["wifi_timeout"], profile=name,
+                                                                   backend=config["network_backend"],
+                                                                   scan_ttl=config["wifi_scan_ttl"],
+                                                                   retry=RetryPolicy.from_config(config)))
+            if not connected:
+                log("WiFi连接失败，取消本次重启操作")
+                return
+            if job.action == "wifi":
+                return
+            log("WiFi连接成功，准备重启光猫...")
+            limit = config["network_ready_timeout"]
+            waited = orchestrator.run(orchestrator.wait_router_ready(config, timeout=limit))
+            if waited is None:
+                log(f"⚠️ {limit}秒内未能连接光猫管理页，仍尝试重启")
+            else:
+                log(f"网络已就绪（等待{waited:.1f}秒）")
+        try:
+            orchestrator.run(orchestrator.reboot(config, log=log, timeout=config["reboot_timeout"],
+                                                 timer=PhaseTimer(config_name=name)))
+            log("✅ 重启完成" if config["verify_reboot"] else "✅ 重启指令已发送，光猫将在5-15秒内重启")
+        except Exception as e:
+            log(f"❌ 操作失败：{str(e)}")
+        finally:
+            log("===== 定时任务执行完毕 =====")
+
+    def on_change(job):
+        if job:
+            orchestrator.metrics.next_run.set(job.due)
+            log(f"下次执行：{scheduler.format_time(job.due)}（{job.name}）")
+
+    stop_event = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop_event.set())
+
+    metrics_server = None
+    metrics_port = args.metrics_port if args.metrics_port is not None else config["metrics_port"]
+    if metrics_port:
+        from metrics import MetricsServer
+
+        metrics_server = MetricsServer(metrics_port).start()
+        log(f"指标服务已启动：http://127.0.0.1:{metrics_server.port}/metrics")
+
+    state_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", f"schedule_{name}.json")
+    runner = scheduler.Scheduler(run_job, state_path=state_path, log=log, on_change=on_change)
+    for job in jobs:
+        runner.add(job)
+        log(f"定时任务：{job.describe()}")
+    runner.start()
+    log(f"定时任务已启动，共 {len(jobs)} 个任务")
+    while not stop_event.wait(1):
+        pass  # 主线程只等待信号
+
+    runner.stop()
+    if metrics_server:
+        metrics_server.stop()
+    log("定时任务已停止")
+    return EXIT_OK
+
+
+def cmd_monitor(args, orchestrator):
+    import profiles
+    from link_monitor import LinkMonitor
+    from phase_timer import PhaseTimer
+
+    config = load_config(args)
+    name = profiles.profile_name(args.config)
+
+    async def trigger(reason):
+        await orchestrator.reboot(config, log=log, timeout=config["reboot_timeout"], timer=PhaseTimer(config_name=name))
+        log("✅ 重启完成" if config["verify_reboot"] else "✅ 重启指令已发送，光猫将在5-15秒内重启")
+
+    stop_event = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop_event.set())
+
+    monitor = LinkMonitor(orchestrator, config, trigger, log=log).start()
+    while not stop_event.wait(1):
+        if not monitor.running:
+            break  # 监控任务意外结束
+    monitor.stop()
+    return EXIT_OK
+
+
+def cmd_check(args, orchestrator):
+    import profiles
+
+    paths = args.paths or [os.path.join(os.path.dirname(os.path.abspath(__file__)), "configs")]
+    repo = profiles.ProfileRepository()
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += [os.path.join(path, name) for name in profiles.ProfileRepository(path).list()]
+        else:
+            files.append(path)
+    bad = 0
+    for path in files:
+        errors = repo.errors(path)
+        if errors:
+            bad += 1
+            log(f"❌ {path}：{'；'.join(errors)}")
+    log(f"共检查 {len(files)} 个配置文件，{bad} 个有误")
+    return EXIT_CONFIG if bad else EXIT_OK
+
+
+def cmd_history(args, orchestrator):
+    import profiles
+
+    name = profiles.profile_name(args.config) if args.config else args.profile
+    print(orchestrator.history.format_summary(name, args.kind), flush=True)
+    return EXIT_OK
+
+
+def cmd_fleet(args, orchestrator):
+    import fleet
+
+    results = fleet.run_fleet(args.profiles, workers=args.workers, timeout=args.timeout,
+                              log=None if args.quiet else log, orchestrator=orchestrator)
+    print(fleet.format_results(results), flush=True)
+    return EXIT_OK if all(r.ok for r in results) else EXIT_FAILED
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="光猫重启助手（命令行版）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("reboot", help="重启光猫")
+    p.add_argument("--config", required=True, help="配置文件路径")
+    p.add_argument("--engine", choices=["http", "selenium"], help="覆盖配置中的重启引擎")
+    p.add_argument("--timeout", type=float, help="超时（秒），默认取配置中的 reboot_timeout")
+    p.set_defaults(func=cmd_reboot)
+
+    p = sub.add_parser("wifi", help="依次尝试连接配置中的WiFi")
+    p.add_argument("--config", required=True, help="配置文件路径")
+    p.add_argument("--timeout", type=float, help="单个WiFi的连接超时（秒）")
+    p.set_defaults(func=cmd_wifi)
+
+    p = sub.add_parser("schedule", help="按间隔循环执行：连接WiFi后重启光猫")
+    p.add_argument("--config", required=True, help="配置文件路径")
+    p.add_argument("--engine", choices=["http", "selenium"], help="覆盖配置中的重启引擎")
+    p.add_argument("--interval", type=int, help="执行间隔，默认取配置中的 auto_interval")
+    p.add_argument("--unit", choices=["秒", "分", "时"], help="间隔单位，默认取配置中的 interval_unit")
+    p.add_argument("--cron", help="cron 表达式（分 时 日 月 周），如 \"0 4 * * *\"")
+    p.add_argument("--at", help="每天固定时刻执行，如 04:00")
+    p.add_argument("--jitter", type=float, default=0, help="每次随机推迟的最大秒数（配合 --cron/--at）")
+    p.add_argument("--skip-wifi", action="store_true", help="不连接WiFi，直接重启")
+    p.add_argument("--metrics-port", type=int, help="本地指标服务端口，0为不启动，默认取配置中的 metrics_port")
+    p.set_defaults(func=cmd_schedule)
+
+    p = sub.add_parser("fleet", help="按多个配置文件并发重启")
+    p.add_argument("profiles", nargs="+", help="配置文件路径")
+    p.add_argument("--workers", type=int, default=4, help="并发数")
+    p.add_argument("--timeout", type=float, default=120, help="单台设备超时（秒）")
+    p.add_argument("--quiet", action="store_true", help="只输出结果表")
+    p.set_defaults(func=cmd_fleet)
+
+    p = sub.add_parser("monitor", help="监控链路质量，持续变差时才重启光猫")
+    p.add_argument("--config", required=True, help="配置文件路径")
+    p.add_argument("--engine", choices=["http", "selenium"], help="覆盖配置中的重启引擎")
+    p.set_defaults(func=cmd_monitor)
+
+    p = sub.add_parser("check", help="校验配置文件格式")
+    p.add_argument("paths", nargs="*", help="配置文件或目录，默认为 configs 目录")
+    p.set_defaults(func=cmd_check)
+
+    p = sub.add_parser("history", help="查看运行历史的成功率和耗时（近1天/7天/30天/全部）")
+    p.add_argument("--config", help="按配置文件统计")
+    p.add_argument("--profile", help="按配置名称统计（不指定则统计全部）")
+    p.add_argument("--kind", choices=["reboot", "wifi"], default="reboot")
+    p.set_defaults(func=cmd_history)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    for path in [getattr(args, "config", None)] + (getattr(args, "profiles", None) or []):
+        if path and not os.path.isfile(path):
+            log(f"❌ 配置文件不存在：{path}")
+            return EXIT_CONFIG
+
+    from orchestrator import Orchestrator
+    from run_history import RunHistory
+
+    orchestrator = Orchestrator(history=RunHistory())
+    try:
+        return args.func(args, orchestrator)
+    except KeyboardInterrupt:
+        log("已中断")
+        return EXIT_INTERRUPTED
+    except (ValueError, KeyError) as e:
+        log(f"❌ 配置错误：{str(e)}")
+        return EXIT_CONFIG
+    finally:
+        orchestrator.stop()
+        orchestrator.history.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,523 @@
+"""后台服务：常驻运行定时任务、重启/WiFi引擎和运行历史，通过本机 HTTP 接口接受控制
+
+图形界面（1.py）和 daemon_client.py 都只是它的客户端，关闭界面不影响定时任务。服务不导入 tkinter，
+selenium 也只在第一次用到浏览器时才加载，只跑定时任务时常驻内存很小。
+
+    python daemon.py [--port 8765] [--schedule 联通 --schedule 电信]
+
+只监听 127.0.0.1；端口和访问令牌写入 logs/daemon.json（仅当前用户可读），请求需带 X-Auth-Token 头。
+接口的请求和响应都是 JSON：
+    GET  /status                                   作业队列、定时任务、各配置的进度和熔断状态
+    POST /trigger   {"profile", "action", "config", "wait"}   action 为 reboot/wifi/wifi_reboot
+    POST /cancel    {"profile"}                    取消该配置提交的作业
+    GET  /history?profile=&kind=reboot&limit=20    最近的运行记录和成功率统计
+    GET  /config?profile=                          读取配置
+    PUT  /config    {"profile", "config"}          校验后保存配置
+    POST /schedule  {"profile", "enabled", "config"}   启动/停止该配置的定时任务
+    GET  /logs?after=序号                          该序号之后的日志
+config 省略时读取 configs 目录中的同名配置文件；界面会带上当前（可能尚未保存的）配置。
+"""
+import argparse
+import concurrent.futures
+import functools
+import hmac
+import json
+import os
+import secrets
+import signal
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import profiles
+import reboot_engine
+import scheduler
+from daemon_client import DEFAULT_PORT, DaemonClient
+from driver_pool import DriverPool
+from job_queue import JobRejected
+from log_pipeline import LogPipeline
+from metrics import METRICS
+from orchestrator import Orchestrator
+from phase_timer import PhaseRecorder, PhaseTimer
+from retry_policy import RetryPolicy
+from run_history import RunHistory
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = "daemon.json"  # 端口、令牌和进程号，客户端据此连接
+ACTIVE_FILE = "daemon_schedules.json"  # 已启动定时任务的配置（含界面带来的未保存修改），服务重启后恢复
+LOG_KEEP = 2000  # 供客户端读取的最近日志条数
+
+
+class RequestError(Exception):
+    """请求有误：status 为返回的 HTTP 状态码"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class RebootDaemon:
+    """持有编排器、定时任务和运行历史；api_* 方法对应控制接口，可在任意线程调用"""
+
+    def __init__(self, config_dir=None, log_dir=None):
+        self.config_dir = config_dir or os.path.join(HERE, "configs")
+        self.log_dir = log_dir or os.path.join(HERE, "logs")
+        self.repo = profiles.ProfileRepository(self.config_dir)
+        self.logs = LogPipeline(file_path=os.path.join(self.log_dir, "daemon.log"), max_pending=0, keep=LOG_KEEP)
+        self.phase_recorder = PhaseRecorder(jsonl_path=os.path.join(self.log_dir, "phases.jsonl"))
+        self.history = RunHistory(os.path.join(self.log_dir, "history.db"))
+        self.orchestrator = Orchestrator(history=self.history)
+        self.token = secrets.token_urlsafe(24)
+        self.started_at = time.time()
+        self.echo = False  # 同时把日志输出到标准输出（前台运行或由 systemd 收集时）
+        self.driver_pool = None
+        self.schedules = {}  # 配置名 -> Scheduler
+        self.progress = {}  # 配置名 -> {"value", "message", "time"}
+        self._futures = {}  # 配置名 -> {concurrent.futures.Future}，用于取消
+        self._scheduled = {}  # 配置名 -> 执行中的定时任务作业
+        self._schedule_configs = {}  # 配置名 -> 定时任务实际使用的配置
+        self._lock = threading.Lock()
+        self._schedule_lock = threading.RLock()  # 保护 schedules、_scheduled 和 _schedule_configs
+        self._server = None
+
+    # ---- 日志与进度 ----
+    def log(self, message):
+        line = self.logs.emit(message)
+        if self.echo:
+            print(line, flush=True)
+
+    def profile_log(self, name):
+        return lambda message: self.log(f"[{name}] {message}")
+
+    def profile_progress(self, name):
+        def progress(value, message):
+            self.progress[name] = {"value": value, "message": message, "time": time.time()}
+        return progress
+
+    # ---- 配置 ----
+    def profile_path(self, name):
+        if not isinstance(name, str) or not name or os.path.basename(name) != name or name.startswith("."):
+            raise RequestError(400, f"配置名无效：{name}")
+        return os.path.join(self.config_dir, name + ".json")
+
+    def load_config(self, name, config=None):
+        """请求中带了 config 时校验并补全它，否则读取同名配置文件"""
+        path = self.profile_path(name)
+        if config is not None:
+            errors = profiles.validate_profile(config)
+            if errors:
+                raise RequestError(400, "；".join(errors))
+            return dict(profiles.get_default_config(), **config)
+        if not os.path.isfile(path):
+            raise RequestError(404, f"配置不存在：{name}")
+        try:
+            return self.repo.load(path)
+        except profiles.ProfileError as e:
+            raise RequestError(400, str(e))
+
+    def get_driver_pool(self, config):
+        """按配置获取常驻浏览器池，未启用时关闭已有的池"""
+        with self._lock:
+            if not config.get("keep_browser"):
+                if self.driver_pool:
+                    self.driver_pool.close()
+                    self.driver_pool = None
+                return None
+            lean = config.get("browser_lean", False)
+            if self.driver_pool is not None and self.driver_pool.factory.keywords["lean"] != lean:
+                self.driver_pool.close()
+                self.driver_pool = None
+            if self.driver_pool is None:
+                self.driver_pool = DriverPool(functools.partial(reboot_engine.create_chrome_driver, lean=lean),
+                                              max_age=config["browser_max_age"],
+                                              max_uses=config["browser_max_uses"], log=self.log)
+            return self.driver_pool
+
+    # ---- 作业 ----
+    async def run_action(self, name, config, action):
+        """执行一个作业（在编排器的事件循环中运行），返回是否成功"""
+        log = self.profile_log(name)
+        progress = self.profile_progress(name)
+        if action in ("wifi", "wifi_reboot"):
+            connected = await self.orchestrator.connect_wifi(config["wifi_list"], log=log, progress=progress,
+                                                             timeout=config["wifi_timeout"], profile=name,
+                                                             backend=config["network_backend"],
+                                                             scan_ttl=config["wifi_scan_ttl"],
+                                                             retry=RetryPolicy.from_config(config))
+            if action == "wifi":
+                return connected
+            if not connected:
+                log("WiFi连接失败，取消本次重启操作")
+                return False
+            log("WiFi连接成功，准备重启光猫...")
+            limit = config["network_ready_timeout"]
+            waited = await self.orchestrator.wait_router_ready(config, timeout=limit)
+            if waited is None:
+                log(f"⚠️ {limit}秒内未能连接光猫管理页，仍尝试重启")
+            else:
+                log(f"网络已就绪（等待{waited:.1f}秒）")
+
+        log("开始重启光猫流程...")
+        progress(10, "初始化重启引擎...")
+        timer = PhaseTimer(self.phase_recorder, name)
+        try:
+            engine = await self.orchestrator.reboot(config, log=log, progress=progress,
+                                                    timeout=config["reboot_timeout"],
+                                                    driver_pool=self.get_driver_pool(config), timer=timer)
+        except Exception as e:
+            log(f"❌ 操作失败：{str(e)}")
+            progress(0, f"操作失败: {str(e)}")
+            return False
+        finally:
+            if timer.records:
+                log(f"阶段耗时：{timer.describe()}")
+        label = reboot_engine.ENGINE_CLASSES[engine].label
+        if config.get("verify_reboot"):
+            log(f"✅ 重启完成（{label}）")
+            progress(100, "光猫已重启并恢复")
+        else:
+            log(f"✅ 重启指令已发送（{label}），光猫将在5-15秒内重启")
+            progress(100, "重启指令已发送")
+        return True
+
+    def submit(self, name, config, action):
+        """把作业加入设备队列，返回 concurrent.futures.Future；与进行中的重启冲突时抛出 JobRejected"""
+        future = self.orchestrator.jobs.accept(config["router_ip"], action,
+                                               lambda: self.run_action(name, config, action))
+        with self._lock:
+            self._futures.setdefault(name, set()).add(future)
+
+        def done(f):
+            with self._lock:
+                self._futures.get(name, set()).discard(f)
+        future.add_done_callback(done)
+        return future
+
+    # ---- 定时任务 ----
+    def run_scheduled_job(self, name, config, job, runner=None):
+        """执行一次定时任务（在该配置的调度线程中运行）；runner 已被停止或替换时不再提交"""
+        log = self.profile_log(name)
+        with self._schedule_lock:
+            if runner is not None and self.schedules.get(name) is not runner:
+                return
+            log(f"===== 定时任务【{job.name}】开始执行 =====")
+            try:
+                future = self._scheduled[name] = self.submit(name, config, job.action)
+            except JobRejected as e:
+                log(f"跳过本次定时任务：{str(e)}")
+                return
+        try:
+            future.result()
+        except concurrent.futures.CancelledError:
+            log("===== 定时任务已取消 =====")
+            return
+        finally:
+            # 重新启动定时任务时，新的调度线程可能已登记了自己的作业，只移除本次的
+            with self._schedule_lock:
+                if self._scheduled.get(name) is future:
+                    del self._scheduled[name]
+        log("===== 定时任务执行完毕 =====")
+
+    def start_schedule(self, name, config, resume=False):
+        """启动定时任务；resume 为真时（服务重启后恢复）不立即执行，由状态文件和错过处理方式决定何时执行"""
+        try:
+            jobs = scheduler.jobs_from_config(config)
+        except ValueError as e:
+            raise RequestError(400, f"定时规则有误: {str(e)}")
+        if resume:
+            for job in jobs:
+                job.run_now = False
+        with self._schedule_lock:
+            self._start_schedule(name, config, jobs)
+
+    def _start_schedule(self, name, config, jobs):
+        self.stop_schedule(name, persist=False)  # 配置可能变了，按新配置重新开始
+
+        def on_change(job):
+            METRICS.next_run.set(job.due if job else 0, profile=name)
+
+        def run_job(job):
+            self.run_scheduled_job(name, config, job, runner)
+
+        log = self.profile_log(name)
+        runner = scheduler.Scheduler(run_job, state_path=os.path.join(self.log_dir, f"schedule_{name}.json"),
+                                     log=log, on_change=on_change)
+        for job in jobs:
+            runner.add(job)
+            log(f"定时任务：{job.describe()}，下次执行 {scheduler.format_time(job.due)}")
+        self.schedules[name] = runner.start()
+        self._schedule_configs[name] = config
+        self.save_active()
+        log(f"定时任务已启动，共 {len(jobs)} 个任务")
+
+    def stop_schedule(self, name, persist=True):
+        with self._schedule_lock:
+            runner = self.schedules.pop(name, None)
+            if runner is None:
+                return False
+            runner.stop()
+            self._schedule_configs.pop(name, None)
+            if persist:
+                self.save_active()
+            future = self._scheduled.pop(name, None)
+            cancelled = future is not None and future.cancel()
+        if cancelled:
+            self.log(f"[{name}] 已取消正在执行的定时任务")
+        METRICS.next_run.set(0, profile=name)
+        if persist:
+            self.log(f"[{name}] 定时任务已停止")
+        return True
+
+    def save_active(self):
+        """保存已启动的定时任务及其配置（配置含密码，仅当前用户可读写）"""
+        path = os.path.join(self.log_dir, ACTIVE_FILE)
+        tmp = path + ".tmp"
+        os.makedirs(self.log_dir, exist_ok=True)
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self._schedule_configs, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def resume_schedules(self, names=()):
+        """按保存的配置恢复上次运行时已启动的定时任务（界面启动时带来的未保存修改也一并恢复），
+        并启动 names 中的配置（读取配置文件）"""
+        try:
+            with open(os.path.join(self.log_dir, ACTIVE_FILE), "r", encoding="utf-8") as f:
+                active = json.load(f)
+        except (OSError, ValueError):
+            active = {}
+        if isinstance(active, list):  # 旧版本只保存了配置名
+            active = dict.fromkeys(active)
+        for name in names:
+            active.setdefault(name, None)
+        for name, config in active.items():
+            try:
+                self.start_schedule(name, self.load_config(name, config), resume=True)
+            except RequestError as e:
+                self.log(f"❌ [{name}] 无法启动定时任务：{str(e)}")
+
+    # ---- 控制接口 ----
+    def api_status(self, query, body):
+        schedules = {}
+        with self._schedule_lock:
+            runners = list(self.schedules.items())
+        for name, runner in runners:
+            job = runner.next_job()
+            schedules[name] = {"running": runner.running, "next": job.due if job else None,
+                               "next_name": job.name if job else ""}
+        return {
+            "pid": os.getpid(),
+            "uptime": round(time.time() - self.started_at),
+            "jobs": self.orchestrator.run(self.orchestrator.jobs.status()),
+            "schedules": schedules,
+            "progress": dict(self.progress),
+            "breakers": self.orchestrator.breaker_states(),
+        }
+
+    def api_trigger(self, query, body):
+        name = body.get("profile")
+        action = body.get("action", "reboot")
+        if action not in scheduler.ACTIONS:
+            raise RequestError(400, f"未知的操作：{action}")
+        config = self.load_config(name, body.get("config"))
+        future = self.submit(name, config, action)
+        if not body.get("wait"):
+            return {"accepted": True}
+        try:
+            return {"accepted": True, "ok": bool(future.result())}
+        except concurrent.futures.CancelledError:
+            return {"accepted": True, "ok": False, "cancelled": True}
+
+    def api_cancel(self, query, body):
+        name = body.get("profile")
+        with self._lock:
+            futures = list(self._futures.get(name, ()))
+        cancelled = sum(1 for future in futures if future.cancel())
+        if cancelled:
+            self.log(f"[{name}] 已取消 {cancelled} 个作业")
+        return {"cancelled": cancelled}
+
+    def api_history(self, query, body):
+        name = query.get("profile") or None
+        kind = query.get("kind", "reboot")
+        if kind not in ("reboot", "wifi"):
+            raise RequestError(400, "kind 应为 reboot/wifi 之一")
+        try:
+            limit = int(query.get("limit", 20))
+        except ValueError:
+            raise RequestError(400, "limit 应为数字")
+        return {"recent": self.history.recent(name, kind, limit), "summary": self.history.format_summary(name, kind)}
+
+    def api_get_config(self, query, body):
+        return {"config": self.load_config(query.get("profile"))}
+
+    def api_put_config(self, query, body):
+        name = body.get("profile")
+        config = self.load_config(name, body.get("config"))
+        self.repo.save(self.profile_path(name), config)
+        self.log(f"[{name}] 配置已保存")
+        return {"saved": True}
+
+    def api_schedule(self, query, body):
+        name = body.get("profile")
+        if body.get("enabled", True):
+            self.start_schedule(name, self.load_config(name, body.get("config")))
+            return {"running": True}
+        self.profile_path(name)
+        return {"running": False, "stopped": self.stop_schedule(name)}
+
+    def api_logs(self, query, body):
+        try:
+            after = int(query.get("after", 0))
+        except ValueError:
+            raise RequestError(400, "after 应为数字")
+        return {"logs": [{"seq": seq, "time": ts, "message": message}
+                         for seq, ts, message in self.logs.since(after)]}
+
+    # ---- 服务生命周期 ----
+    def serve(self, port=DEFAULT_PORT):
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), functools.partial(ControlHandler, service=self))
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True, name="control").start()
+        # 令牌文件仅当前用户可读写
+        path = os.path.join(self.log_dir, STATE_FILE)
+        os.makedirs(self.log_dir, exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"port": self._server.server_address[1], "token": self.token, "pid": os.getpid()}, f)
+        self.log(f"后台服务已启动：http://127.0.0.1:{self._server.server_address[1]}（进程 {os.getpid()}）")
+        return self
+
+    @property
+    def port(self):
+        return self._server.server_address[1] if self._server else None
+
+    def close(self):
+        """停止定时任务和进行中的操作（有时间上限），关闭控制接口"""
+        with self._schedule_lock:
+            names = list(self.schedules)
+        for name in names:
+            self.stop_schedule(name, persist=False)
+        self.orchestrator.stop(log=self.log)
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            try:
+                os.remove(os.path.join(self.log_dir, STATE_FILE))
+            except OSError:
+                pass
+        if self.driver_pool:
+            self.driver_pool.close()
+        self.log("后台服务已停止")
+        self.history.close()
+        self.logs.close()
+
+
+# (方法, 路径) -> RebootDaemon 的方法名
+ROUTES = {
+    ("GET", "/status"): "api_status",
+    ("POST", "/trigger"): "api_trigger",
+    ("POST", "/cancel"): "api_cancel",
+    ("GET", "/history"): "api_history",
+    ("GET", "/config"): "api_get_config",
+    ("PUT", "/config"): "api_put_config",
+    ("POST", "/schedule"): "api_schedule",
+    ("GET", "/logs"): "api_logs",
+}
+
+
+class ControlHandler(BaseHTTPRequestHandler):
+    """控制接口的请求处理；service 为所属的 RebootDaemon（serve() 中用 functools.partial 绑定）"""
+
+    def __init__(self, *args, service=None, **kwargs):
+        self.service = service
+        super().__init__(*args, **kwargs)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_PUT(self):
+        self.dispatch("PUT")
+
+    def dispatch(self, method):
+        service = self.service
+        parts = urlsplit(self.path)
+        if not hmac.compare_digest(self.headers.get("X-Auth-Token", ""), service.token):
+            self.reply(401, {"error": "访问令牌无效"})
+            return
+        route = ROUTES.get((method, parts.path))
+        if route is None:
+            self.reply(404, {"error": f"未知的接口：{method} {parts.path}"})
+            return
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        try:
+            body = {}
+            if method in ("POST", "PUT"):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(body, dict):
+                    raise ValueError("请求内容应为JSON对象")
+            self.reply(200, getattr(service, route)(query, body))
+        except RequestError as e:
+            self.reply(e.status, {"error": str(e)})
+        except JobRejected as e:
+            self.reply(409, {"error": str(e)})
+        except ValueError as e:
+            self.reply(400, {"error": f"请求格式有误：{str(e)}"})
+        except Exception as e:
+            self.reply(500, {"error": str(e) or type(e).__name__})
+
+    def reply(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="光猫重启助手后台服务")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="控制接口端口（只监听127.0.0.1），0为随机端口")
+    parser.add_argument("--schedule", action="append", default=[], metavar="配置名",
+                        help="启动时运行该配置的定时任务（可重复指定）")
+    parser.add_argument("--config-dir", help="配置目录，默认为 configs")
+    args = parser.parse_args(argv)
+
+    if DaemonClient.connect():
+        print("后台服务已在运行", flush=True)
+        return 1
+    daemon = RebootDaemon(config_dir=args.config_dir)
+    daemon.echo = True
+    try:
+        daemon.serve(args.port)
+    except OSError as e:
+        print(f"❌ 控制接口启动失败：{str(e)}", flush=True)
+        daemon.close()
+        return 1
+
+    stop_event = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop_event.set())
+    daemon.resume_schedules(args.schedule)
+    while not stop_event.wait(1):
+        pass  # 主线程只等待信号
+    daemon.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""后台服务（daemon.py）的客户端：读取 logs/daemon.json 中的端口和令牌，通过本机 HTTP 接口控制服务
+
+    python daemon_client.py status
+    python daemon_client.py trigger 联通 [--action wifi_reboot] [--wait]
+    python daemon_client.py cancel 联通
+    python daemon_client.py history [联通] [--kind wifi]
+    python daemon_client.py schedule 联通 on|off
+    python daemon_client.py logs [--follow]
+
+只依赖标准库，图形界面作为客户端时不会因此多加载任何模块。
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import time
+from urllib.parse import urlencode
+
+DEFAULT_PORT = 8765
+DEFAULT_STATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "daemon.json")
+
+
+class DaemonError(Exception):
+    """无法连接后台服务或请求失败；status 为 HTTP 状态码（连接失败时为0，409 表示与进行中的重启冲突）"""
+
+    def __init__(self, message, status=0):
+        super().__init__(message)
+        self.status = status
+
+
+class DaemonClient:
+    def __init__(self, port, token, host="127.0.0.1", timeout=10):
+        self.host = host
+        self.port = port
+        self.token = token
+        self.timeout = timeout
+
+    @classmethod
+    def connect(cls, state_path=DEFAULT_STATE, timeout=10):
+        """读取服务的状态文件并确认服务在运行，未运行时返回 None"""
+        try:
+            with open(state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            client = cls(state["port"], state["token"], timeout=timeout)
+            client.request("GET", "/status", timeout=2)
+            return client
+        except (OSError, ValueError, KeyError, TypeError, DaemonError):
+            return None
+
+    def request(self, method, path, query=None, body=None, timeout=None):
+        """发送请求并返回解析后的 JSON；timeout 为 0 时不限时（等待作业执行完毕）"""
+        if query:
+            path += "?" + urlencode({k: v for k, v in query.items() if v is not None})
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8") if body is not None else None
+        headers = {"X-Auth-Token": self.token}
+        if data is not None:
+            headers["Content-Type"] = "application/json; charset=utf-8"
+        timeout = self.timeout if timeout is None else (timeout or None)
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+        try:
+            conn.request(method, path, body=data, headers=headers)
+            resp = conn.getresponse()
+            result = json.loads(resp.read() or b"{}")
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            raise DaemonError(f"无法连接后台服务：{str(e)}")
+        finally:
+            conn.close()
+        if resp.status >= 400:
+            raise DaemonError(result.get("error") or f"HTTP {resp.status}", resp.status)
+        return result
+
+    def status(self):
+        return self.request("GET", "/status")
+
+    def trigger(self, profile, action="reboot", config=None, wait=False):
+        """提交作业；wait 为真时等待执行完毕，返回 {"ok": 是否成功}"""
+        body = {"profile": profile, "action": action, "wait": wait}
+        if config is not None:
+            body["config"] = config
+        return self.request("POST", "/trigger", body=body, timeout=0 if wait else None)
+
+    def cancel(self, profile):
+        return self.request("POST", "/cancel", body={"profile": profile})["cancelled"]
+
+    def history(self, profile=None, kind="reboot", limit=20):
+        return self.request("GET", "/history", query={"profile": profile, "kind": kind, "limit": limit})
+
+    def get_config(self, profile):
+        return self.request("GET", "/config", query={"profile": profile})["config"]
+
+    def put_config(self, profile, config):
+        return self.request("PUT", "/config", body={"profile": profile, "config": config})
+
+    def schedule(self, profile, enabled=True, config=None):
+        body = {"profile": profile, "enabled": enabled}
+        if config is not None:
+            body["config"] = config
+        return self.request("POST", "/schedule", body=body)
+
+    def logs(self, after=0):
+        """序号 after 之后的日志：[{"seq", "time", "message"}]"""
+        return self.request("GET", "/logs", query={"after": after})["logs"]
+
+
+def print_logs(entries):
+    for entry in entries:
+        print(f"[{time.strftime('%H:%M:%S', time.localtime(entry['time']))}] {entry['message']}", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="控制光猫重启助手后台服务")
+    parser.add_argument("--state", default=DEFAULT_STATE, help="服务的状态文件（端口和令牌）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="作业队列、定时任务和熔断状态")
+    p = sub.add_parser("trigger", help="立即执行一次操作")
+    p.add_argument("profile", help="配置名（configs 目录中的文件名，不含 .json）")
+    p.add_argument("--action", choices=["reboot", "wifi", "wifi_reboot"], default="reboot")
+    p.add_argument("--wait", action="store_true", help="等待执行完毕")
+    p = sub.add_parser("cancel", help="取消该配置的作业")
+    p.add_argument("profile")
+    p = sub.add_parser("history", help="运行统计")
+    p.add_argument("profile", nargs="?")
+    p.add_argument("--kind", choices=["reboot", "wifi"], default="reboot")
+    p = sub.add_parser("schedule", help="启动或停止该配置的定时任务")
+    p.add_argument("profile")
+    p.add_argument("state", choices=["on", "off"])
+    p = sub.add_parser("logs", help="查看服务日志")
+    p.add_argument("--follow", action="store_true", help="持续输出新的日志")
+    args = parser.parse_args(argv)
+
+    client = DaemonClient.connect(args.state)
+    if client is None:
+        print("后台服务未运行（python daemon.py 启动）", flush=True)
+        return 2
+    try:
+        if args.command == "status":
+            print(json.dumps(client.status(), ensure_ascii=False, indent=2), flush=True)
+        elif args.command == "trigger":
+            result = client.trigger(args.profile, args.action, wait=args.wait)
+            print("已提交" if not args.wait else ("✅ 成功" if result.get("ok") else "❌ 失败"), flush=True)
+            return 0 if result.get("ok", True) else 1
+        elif args.command == "cancel":
+            print(f"已取消 {client.cancel(args.profile)} 个作业", flush=True)
+        elif args.command == "history":
+            print(client.history(args.profile, args.kind)["summary"], flush=True)
+        elif args.command == "schedule":
+            client.schedule(args.profile, args.state == "on")
+            print("定时任务已启动" if args.state == "on" else "定时任务已停止", flush=True)
+        elif args.command == "logs":
+            entries = client.logs()
+            print_logs(entries)
+            seq = entries[-1]["seq"] if entries else 0
+            while args.follow:
+                time.sleep(1)
+                entries = client.logs(seq)
+                print_logs(entries)
+                if entries:
+                    seq = entries[-1]["seq"]
+    except DaemonError as e:
+        print(f"❌ {str(e)}", flush=True)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
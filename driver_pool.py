@@ -0,0 +1,154 @@
+"""常驻浏览器会话池：在多次重启之间复用已启动的无头Chrome，避免每次冷启动"""
+import threading
+import time
+
+
+class PooledDriver:
+    """池中的一个浏览器及其使用记录"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.created_at = time.monotonic()
+        self.uses = 0
+
+    @property
+    def age(self):
+        return time.monotonic() - self.created_at
+
+
+class DriverPool:
+    """健康检查 + 按存活时间/使用次数回收的 WebDriver 池
+
+    acquire() 取出一个可用的浏览器（已失效或超期的会被关闭并按需重建），
+    release() 清理会话状态后放回池中，清理失败的浏览器直接丢弃。
+    """
+
+    def __init__(self, factory, max_size=1, max_age=3600, max_uses=20, log=None):
+        self.factory = factory
+        self.max_size = max_size
+        self.max_age = max_age  # 秒，超过后回收
+        self.max_uses = max_uses  # 使用次数上限，超过后回收
+        self.log = log or (lambda message: None)
+        self._idle = []
+        self._leased = {}  # id(driver) -> PooledDriver
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def _expired(self, item):
+        return (self.max_age and item.age >= self.max_age) or (self.max_uses and item.uses >= self.max_uses)
+
+    @staticmethod
+    def _alive(item):
+        try:
+            item.driver.window_handles
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _quit(item):
+        try:
+            item.driver.quit()
+        except Exception:
+            pass
+
+    def acquire(self, timeout=None):
+        """取出一个健康的浏览器，池满时最多等待 timeout 秒"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("浏览器会话池已关闭")
+                if self._idle:
+                    item = self._idle.pop()
+                    break
+                if len(self._leased) < self.max_size:
+                    item = None
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("等待空闲浏览器超时")
+                self._cond.wait(remaining)
+            # 先占位，避免创建浏览器期间其他线程超额创建
+            placeholder = object()
+            self._leased[id(placeholder)] = placeholder
+
+        try:
+            if item is not None and self._expired(item):
+                self.log(f"* 浏览器已使用{item.uses}次/{item.age:.0f}秒，回收重建")
+                self._quit(item)
+                item = None
+            elif item is not None and not self._alive(item):
+                self.log("* 常驻浏览器已失效，重新启动")
+                self._quit(item)
+                item = None
+            if item is None:
+                item = PooledDriver(self.factory())
+        except BaseException:
+            with self._cond:
+                del self._leased[id(placeholder)]
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            del self._leased[id(placeholder)]
+            item.uses += 1
+            self._leased[id(item.driver)] = item
+        return item.driver
+
+    def _reset(self, driver):
+        """清除Cookie、关闭多余窗口并回到空白页"""
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        try:
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        except Exception:
+            driver.delete_all_cookies()
+        driver.get("about:blank")
+
+    def release(self, driver, discard=False):
+        """归还浏览器；discard=True 或状态清理失败时直接关闭"""
+        with self._cond:
+            item = self._leased.pop(id(driver), None)
+            self._cond.notify()
+        if item is None:
+            return
+        if not discard and not self._closed and not self._expired(item):
+            try:
+                self._reset(driver)
+            except Exception:
+                discard = True
+        else:
+            discard = True
+
+        with self._cond:
+            if discard or self._closed:
+                self._quit(item)
+            else:
+                self._idle.append(item)
+            self._cond.notify()
+
+    def warm(self):
+        """预先启动一个空闲浏览器（在后台线程中调用）"""
+        with self._cond:
+            if self._closed or self._idle or len(self._leased) >= self.max_size:
+                return
+        driver = self.acquire()
+        self.release(driver)
+
+    def close(self):
+        """关闭池中所有空闲浏览器，借出的浏览器在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for item in idle:
+            self._quit(item)
+
+    @property
+    def size(self):
+        with self._cond:
+            return len(self._idle) + len(self._leased)
@@ -0,0 +1,214 @@
+"""故障注入：让本地模拟光猫按规则变慢、断开连接、返回500、卡住跳转或中途消失，
+统计在不同超时设置下故障多久才暴露、白白等待了多少时间，用数据来选超时值
+
+    python fault_injection.py --timeouts 2,5,10 --runs 3
+    python fault_injection.py --scenarios stall-redirect,vanish --engine selenium
+"""
+import argparse
+import random
+import statistics
+import sys
+import threading
+import time
+
+import reboot_engine
+import reboot_flow
+from stand_in_router import StandInRouter
+
+FAULT_ACTIONS = ("delay", "drop", "error", "stall", "vanish")
+
+
+def parse_distribution(text):
+    """延迟分布 -> 返回秒数的函数：fixed:0.2、uniform:0.1-2、exp:0.3（均值）、normal:0.5,0.2（均值,标准差）"""
+    kind, _, args = text.partition(":")
+    try:
+        if kind == "fixed":
+            value = float(args)
+            return lambda rng: value
+        if kind == "uniform":
+            low, high = (float(x) for x in args.split("-"))
+            return lambda rng: rng.uniform(low, high)
+        if kind == "exp":
+            mean = float(args)
+            return lambda rng: rng.expovariate(1 / mean)
+        if kind == "normal":
+            mean, sd = (float(x) for x in args.split(","))
+            return lambda rng: max(0.0, rng.gauss(mean, sd))
+    except ValueError:
+        pass
+    raise ValueError(f"无法识别的延迟分布：{text}")
+
+
+class FaultRule:
+    """一条注入规则：匹配 method 和路径前缀的请求，按 probability 触发，最多 times 次"""
+
+    def __init__(self, action, method=None, path=None, probability=1.0, times=None, delay=None):
+        if action not in FAULT_ACTIONS:
+            raise ValueError(f"未知的故障类型：{action}")
+        self.action = action
+        self.method = method
+        self.path = path
+        self.probability = probability
+        self.times = times
+        self.delay = parse_distribution(delay) if isinstance(delay, str) else delay
+        self.hits = 0
+
+    def matches(self, method, path):
+        return (self.method is None or self.method == method) and (self.path is None or path.startswith(self.path))
+
+
+class FaultPlan:
+    """一组规则；模拟光猫在处理每个请求前调用 decide()，并记录注入的时间"""
+
+    def __init__(self, rules, seed=None, stall=60):
+        self.rules = rules
+        self.stall = stall  # stall 类故障卡住的时长（秒）
+        self.rng = random.Random(seed)
+        self.vanished = False  # 光猫已“消失”：之后的请求都不再应答
+        self.first_fault = None  # 第一次注入故障（含延迟）的时间（time.monotonic）
+        self.injected = []  # [(时间, 故障类型, method, 路径)]
+        self._lock = threading.Lock()
+
+    def decide(self, method, path):
+        """返回 (延迟秒数, 终止动作或 None)"""
+        delay, action = 0.0, None
+        with self._lock:
+            if self.vanished:
+                return 0.0, "vanish"
+            for rule in self.rules:
+                if not rule.matches(method, path) or (rule.times is not None and rule.hits >= rule.times):
+                    continue
+                if self.rng.random() >= rule.probability:
+                    continue
+                rule.hits += 1
+                now = time.monotonic()
+                self.injected.append((now, rule.action, method, path))
+                if self.first_fault is None:
+                    self.first_fault = now
+                if rule.action == "delay":
+                    delay += rule.delay(self.rng)
+                    continue
+                if rule.action == "vanish":
+                    self.vanished = True
+                action = rule.action
+                break
+        return delay, action
+
+
+LOGIN_POST = ("POST", "/")
+MANAGE_GET = ("GET", "/getpage.gch")
+
+# 故障场景：名称 -> (说明, 生成规则的函数)
+SCENARIOS = {
+    "baseline": ("无故障", lambda: []),
+    "jitter": ("每个请求指数分布延迟，均值0.3秒", lambda: [FaultRule("delay", delay="exp:0.3")]),
+    "slow-tail": ("10%的请求慢3~8秒", lambda: [FaultRule("delay", probability=0.1, delay="uniform:3-8")]),
+    "drop-login": ("登录请求的连接被断开一次", lambda: [FaultRule("drop", *LOGIN_POST, times=1)]),
+    "error-manage": ("重启页返回500", lambda: [FaultRule("error", *MANAGE_GET)]),
+    "stall-redirect": ("登录后的跳转卡住不返回", lambda: [FaultRule("stall", *LOGIN_POST)]),
+    "vanish": ("登录成功后光猫消失（之后的请求都无应答）", lambda: [FaultRule("vanish", *MANAGE_GET)]),
+}
+
+
+def scaled_flow(timeout, settle_timeout=3):
+    """内置流程的每一步都使用同一个超时（确认框关闭的等待除外）"""
+    steps = reboot_flow.zte_flow(settle_timeout)
+    return [dict(step, timeout=timeout) if not step.get("optional") else step for step in steps]
+
+
+def run_once(router, engine, timeout):
+    """执行一次重启，返回 (是否成功, 耗时, 故障暴露耗时或 None, 错误)"""
+    config = router.profile(reuse_session=False)
+    if engine == "http":
+        runner = reboot_engine.HttpRebootEngine(config, timeout=timeout)
+    else:
+        config["reboot_flow"] = scaled_flow(timeout)
+        runner = reboot_engine.SeleniumRebootEngine(config)
+    start = time.monotonic()
+    try:
+        runner.run()
+        ok, error = True, ""
+    except (ImportError, FileNotFoundError):
+        raise
+    except Exception as e:
+        ok, error = False, " ".join(str(e).split()) or type(e).__name__
+    end = time.monotonic()
+    fault = router.faults.first_fault
+    surface = end - fault if not ok and fault is not None else None
+    return ok, end - start, surface, error
+
+
+def run_matrix(names, timeouts, runs, engine, latency, seed):
+    """返回 [(场景, 超时, [(是否成功, 耗时, 暴露耗时, 错误)])]"""
+    results = []
+    for name in names:
+        for timeout in timeouts:
+            print(f"场景 {name}，超时 {timeout:g}s ...", flush=True)
+            outcomes = []
+            for i in range(runs):
+                plan = FaultPlan(SCENARIOS[name][1](), seed=None if seed is None else seed + i, stall=timeout * 3)
+                with StandInRouter(latency=latency, faults=plan) as router:
+                    outcomes.append(run_once(router, engine, timeout))
+            results.append((name, timeout, outcomes))
+    return results
+
+
+def print_report(results):
+    print(f"{'场景':<16}{'超时':>6}{'成功':>8}{'耗时p50':>10}{'暴露p50':>10}{'暴露max':>10}{'浪费合计':>10}")
+    waste_by_timeout = {}
+    for name, timeout, outcomes in results:
+        ok = sum(1 for o in outcomes if o[0])
+        durations = sorted(o[1] for o in outcomes)
+        surfaces = sorted(o[2] for o in outcomes if o[2] is not None)
+        waste = sum(surfaces)
+        total = waste_by_timeout.setdefault(timeout, [0.0, 0, 0])
+        total[0] += waste
+        total[1] += ok
+        total[2] += len(outcomes)
+        surface_p50 = f"{statistics.median(surfaces):.2f}s" if surfaces else "-"
+        surface_max = f"{surfaces[-1]:.2f}s" if surfaces else "-"
+        print(f"{name:<16}{timeout:>5g}s{ok:>5}/{len(outcomes):<2}{statistics.median(durations):>9.2f}s"
+              f"{surface_p50:>10}{surface_max:>10}{waste:>9.1f}s")
+        errors = {o[3] for o in outcomes if o[3]}
+        for error in sorted(errors)[:2]:
+            print(f"    {error[:90]}")
+
+    print("\n按超时汇总（浪费 = 第一次注入故障到报错之间的等待）")
+    for timeout, (waste, ok, count) in sorted(waste_by_timeout.items()):
+        print(f"  超时 {timeout:>4g}s：成功 {ok}/{count}，浪费共 {waste:.1f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="在模拟光猫上注入故障，对比不同超时设置")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"逗号分隔，可选 {','.join(SCENARIOS)}")
+    parser.add_argument("--timeouts", default="2,5,10", help="逗号分隔的超时设置（秒）：HTTP为单个请求的超时，"
+                                                            "浏览器为流程每一步的超时")
+    parser.add_argument("--runs", type=int, default=3, help="每个组合运行的次数")
+    parser.add_argument("--engine", choices=reboot_engine.ENGINE_CHOICES, default="http")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟光猫每个请求的基础延迟（秒）")
+    parser.add_argument("--seed", type=int, help="随机种子，便于复现")
+    parser.add_argument("--list", action="store_true", help="列出故障场景")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, (description, _) in SCENARIOS.items():
+            print(f"{name:<16}{description}")
+        return 0
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知的场景：{', '.join(unknown)}")
+    timeouts = [float(t) for t in args.timeouts.split(",")]
+
+    try:
+        results = run_matrix(names, timeouts, args.runs, args.engine, args.latency, args.seed)
+    except (ImportError, FileNotFoundError) as e:
+        print(f"无法启动Chrome，跳过：{str(e)}")
+        return 0
+    print()
+    print_report(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
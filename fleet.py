@@ -0,0 +1,114 @@
+"""批量模式：按多个配置文件并发重启多台光猫
+
+    python fleet.py configs/*.json --workers 8 --timeout 120
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+import profiles
+from orchestrator import Orchestrator
+from phase_timer import PhaseTimer
+from run_history import RunHistory
+
+
+class FleetResult:
+    """单台设备的执行结果"""
+
+    def __init__(self, name, path, router_ip="", ok=False, engine="", duration=0.0, error="", downtime=None):
+        self.name = name
+        self.path = path
+        self.router_ip = router_ip
+        self.ok = ok
+        self.engine = engine
+        self.duration = duration
+        self.error = error
+        self.downtime = downtime  # 确认重启时测得的停机时长（秒）
+
+    @property
+    def status(self):
+        return "成功" if self.ok else "失败"
+
+
+async def reboot_device(orchestrator, path, timeout=120, log=None, recorder=None):
+    """重启单个配置文件对应的光猫，返回 FleetResult"""
+    name = profiles.profile_name(path)
+    result = FleetResult(name, path)
+    prefix_log = (lambda message: log(f"[{name}] {message}")) if log else None
+    start = time.monotonic()
+    timer = None
+    try:
+        config = profiles.load_profile(path)
+        result.router_ip = config["router_ip"]
+        timer = PhaseTimer(recorder, name)
+        # 经由作业队列执行：同一台光猫正在被界面或定时任务重启时直接报错，不重复重启
+        # timeout 是单台设备的总时限（含重试和重启确认），超时后作业随之取消
+        result.engine = await asyncio.wait_for(orchestrator.jobs.run(
+            config["router_ip"], "reboot",
+            lambda: orchestrator.reboot(config, log=prefix_log, timeout=timeout, timer=timer)), timeout)
+        result.ok = True
+    except asyncio.TimeoutError:
+        result.error = f"超过{timeout:g}秒未完成"
+    except Exception as e:
+        result.error = str(e)
+    finally:
+        result.downtime = timer.duration("recovery") if timer else None
+    result.duration = time.monotonic() - start
+    if log:
+        log(f"[{name}] {'✅' if result.ok else '❌'} {result.status}（{result.duration:.1f}s）{result.error}")
+    return result
+
+
+async def reboot_fleet(orchestrator, paths, workers=4, timeout=120, log=None, recorder=None):
+    """最多 workers 台设备同时进行，结果按输入顺序返回"""
+    slots = asyncio.Semaphore(max(1, workers))
+
+    async def one(path):
+        async with slots:
+            return await reboot_device(orchestrator, path, timeout, log, recorder)
+
+    return await asyncio.gather(*(one(path) for path in paths))
+
+
+def run_fleet(paths, workers=4, timeout=120, log=None, orchestrator=None, recorder=None):
+    """同步执行批量重启；未传入 orchestrator 时临时创建一个"""
+    own = orchestrator is None
+    if own:
+        orchestrator = Orchestrator(max_browsers=max(1, workers), history=RunHistory())
+    try:
+        return orchestrator.run(reboot_fleet(orchestrator, paths, workers, timeout, log, recorder))
+    finally:
+        if own:
+            orchestrator.stop()
+            orchestrator.history.close()
+
+
+def format_results(results):
+    """生成汇总结果表"""
+    lines = [f"{'配置':<16}{'地址':<20}{'结果':<6}{'引擎':<10}{'耗时':>8}{'停机':>8}  错误"]
+    for r in results:
+        downtime = "-" if r.downtime is None else f"{r.downtime:.1f}s"
+        lines.append(f"{r.name:<16}{r.router_ip:<20}{r.status:<6}{r.engine:<10}{r.duration:>7.1f}s{downtime:>8}  "
+                     f"{' '.join(r.error.split())}")
+    ok = sum(1 for r in results if r.ok)
+    lines.append(f"共 {len(results)} 台，成功 {ok} 台，失败 {len(results) - ok} 台")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="按多个配置文件并发重启光猫")
+    parser.add_argument("profiles", nargs="+", help="配置文件路径")
+    parser.add_argument("--workers", type=int, default=4, help="并发数")
+    parser.add_argument("--timeout", type=float, default=120, help="单台设备的总时限（秒），含重试和重启确认")
+    parser.add_argument("--quiet", action="store_true", help="只输出结果表")
+    args = parser.parse_args(argv)
+
+    log = None if args.quiet else print
+    results = run_fleet(args.profiles, workers=args.workers, timeout=args.timeout, log=log)
+    print(format_results(results))
+    return 0 if all(r.ok for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
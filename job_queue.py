@@ -0,0 +1,159 @@
+"""设备作业队列：界面按钮、定时任务、链路监控和批量重启的操作都经由这里提交到编排器的事件循环
+
+每台设备（按光猫地址区分）一个队列，同一设备的作业依次执行，不同设备之间并发。
+队列中已有同类作业在排队时直接合并（共享同一个结果）；同一台光猫已有重启在执行或排队时，
+新的重启请求被拒绝，不会再启动一个浏览器去重启同一台光猫。
+等待结果的请求全部取消后（例如停止定时任务），作业本身也随之取消：排队中的直接移出队列，
+执行中的取消其任务。队列的状态只在事件循环线程中修改，因此不需要加锁。
+"""
+import asyncio
+import time
+from collections import deque
+
+from reboot_engine import PermanentError
+
+REBOOT_KINDS = ("reboot", "wifi_reboot")  # 会重启光猫的作业
+
+
+class JobRejected(PermanentError):
+    """与同一设备上已有的作业冲突，未加入队列（重试也会被拒绝）"""
+
+
+class Job:
+    """排队中或正在执行的一个作业"""
+
+    def __init__(self, kind, factory, future):
+        self.kind = kind
+        self.factory = factory  # 无参函数，返回要执行的协程
+        self.future = future
+        self.enqueued = time.monotonic()
+        self.started = None
+        self.task = None  # 执行中的任务
+        self.requests = 1  # 仍在等待结果的请求数（含合并进来的）
+
+
+class DeviceQueue:
+    """单台设备的队列"""
+
+    def __init__(self):
+        self.pending = deque()
+        self.running = None
+        self.worker = None  # 正在处理队列的任务，队列清空后为 None
+
+    def depth(self):
+        return len(self.pending) + (self.running is not None)
+
+    def jobs(self):
+        return ([self.running] if self.running else []) + list(self.pending)
+
+
+class JobQueue:
+    """按设备排队执行作业，并通过 metrics 输出队列长度和等待时间"""
+
+    def __init__(self, orchestrator, metrics=None):
+        self.orchestrator = orchestrator
+        self.metrics = metrics or orchestrator.metrics
+        self._devices = {}  # 设备 -> DeviceQueue
+
+    def submit(self, device, kind, factory):
+        """从任意线程提交作业，返回 concurrent.futures.Future"""
+        return self.orchestrator.submit(self.run(device, kind, factory))
+
+    def accept(self, device, kind, factory):
+        """从任意线程提交作业：冲突时直接抛出 JobRejected，否则返回等待结果的 concurrent.futures.Future"""
+        async def enqueue():
+            return self.enqueue(device, kind, factory)
+
+        queue, job = self.orchestrator.run(enqueue())
+        return self.orchestrator.submit(self._wait(device, queue, job))
+
+    async def run(self, device, kind, factory):
+        """在事件循环中提交作业并等待其结果；与排队中的同类作业合并，与进行中的重启冲突时抛出 JobRejected"""
+        queue, job = self.enqueue(device, kind, factory)
+        return await self._wait(device, queue, job)
+
+    def enqueue(self, device, kind, factory):
+        """把作业加入设备队列（或合并到排队中的同类作业），返回 (队列, 作业)；需在事件循环线程中调用"""
+        queue = self._devices.get(device)
+        if queue is None:
+            queue = self._devices[device] = DeviceQueue()
+        for job in queue.pending:
+            if job.kind == kind:
+                job.requests += 1
+                self.metrics.jobs_coalesced.inc(kind=kind)
+                return queue, job
+        if kind in REBOOT_KINDS:
+            for job in queue.jobs():
+                if job.kind in REBOOT_KINDS:
+                    self.metrics.jobs_rejected.inc(kind=kind)
+                    state = f"已执行{time.monotonic() - job.started:.0f}秒" if job.started else "排队中"
+                    raise JobRejected(f"光猫 {device} 已有重启作业（{state}），忽略重复的重启请求")
+
+        job = Job(kind, factory, asyncio.get_running_loop().create_future())
+        queue.pending.append(job)
+        self.metrics.queue_depth.set(queue.depth(), device=device)
+        if queue.worker is None:
+            queue.worker = asyncio.ensure_future(self._work(device, queue))
+        return queue, job
+
+    async def _wait(self, device, queue, job):
+        # shield：某个等待者被取消时不影响其他合并进来的等待者，最后一个等待者取消时才取消作业
+        try:
+            return await asyncio.shield(job.future)
+        except asyncio.CancelledError:
+            job.requests -= 1
+            if job.requests == 0 and not job.future.done():
+                if job.task is not None:
+                    job.task.cancel()
+                else:
+                    queue.pending.remove(job)
+                    job.future.cancel()
+                    self.metrics.queue_depth.set(queue.depth(), device=device)
+            raise
+
+    async def _work(self, device, queue):
+        try:
+            while queue.pending:
+                job = queue.running = queue.pending.popleft()
+                job.started = time.monotonic()
+                self.metrics.queue_wait.observe(job.started - job.enqueued, kind=job.kind)
+                job.task = asyncio.ensure_future(job.factory())
+                try:
+                    # 用 wait 而不是直接 await：作业被取消时队列继续处理后面的作业
+                    await asyncio.wait({job.task})
+                except asyncio.CancelledError:
+                    job.task.cancel()
+                    job.future.cancel()
+                    raise
+                finally:
+                    queue.running = None
+                    self.metrics.queue_depth.set(queue.depth(), device=device)
+                if job.task.cancelled():
+                    job.future.cancel()
+                elif job.task.exception() is not None:
+                    job.future.set_exception(job.task.exception())
+                else:
+                    job.future.set_result(job.task.result())
+        finally:
+            # 事件循环关闭时取消剩余的排队作业
+            for job in queue.pending:
+                job.future.cancel()
+            queue.pending.clear()
+            queue.worker = None
+            self.metrics.queue_depth.set(0, device=device)
+
+    async def status(self):
+        """各设备的作业快照（需在事件循环中调用，例如 orchestrator.run(jobs.status())）"""
+        now = time.monotonic()
+        result = []
+        for device, queue in self._devices.items():
+            if not queue.depth():
+                continue
+            result.append({
+                "device": device,
+                "running": queue.running.kind if queue.running else None,
+                "running_for": round(now - queue.running.started, 1) if queue.running else 0.0,
+                "pending": [job.kind for job in queue.pending],
+                "oldest_wait": round(now - queue.pending[0].enqueued, 1) if queue.pending else 0.0,
+            })
+        return result
@@ -0,0 +1,202 @@
+"""链路质量监控：定期测量到网关和上游目标的TCP连接延迟、丢失率以及网关Web页面可达性，
+在一个时间窗口内持续超过阈值时才触发重启，并保证两次重启之间的最小间隔
+
+上游丢失按“所有目标同时失败”的采样计算，单个目标被防火墙拦截不算链路故障；
+每次采样都按最近一个窗口判断，连续判断为异常满一个窗口才算持续异常，窗口开头的一次突发不会触发重启。
+
+每次采样只是几个并发的TCP连接（在编排器的事件循环中运行），结果存放在定长的 array 环形缓冲中，
+长时间运行内存占用不变。
+"""
+import asyncio
+import math
+import time
+from array import array
+from urllib.parse import urlsplit
+
+import reboot_engine
+from phase_timer import percentile
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+def parse_target(text, default_port=80):
+    """"host:port" 或 "host" -> (host, port)"""
+    host, sep, port = text.rpartition(":")
+    if sep and port.isdigit():
+        return host, int(port)
+    return text, default_port
+
+
+class RingBuffer:
+    """定长环形缓冲：时间戳和延迟（毫秒，失败记为 NaN）存放在 array 中"""
+
+    def __init__(self, size):
+        self.size = size
+        self.times = array("d", [0.0]) * size
+        self.values = array("f", [0.0]) * size
+        self.count = 0
+        self.pos = 0
+
+    def append(self, ts, value):
+        self.times[self.pos] = ts
+        self.values[self.pos] = math.nan if value is None else value
+        self.pos = (self.pos + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def since(self, ts):
+        """时间戳不早于 ts 的 (时间戳, 值) 列表，按时间顺序"""
+        start = (self.pos - self.count) % self.size
+        result = []
+        for i in range(self.count):
+            j = (start + i) % self.size
+            if self.times[j] >= ts:
+                result.append((self.times[j], self.values[j]))
+        return result
+
+    def clear(self):
+        self.count = 0
+        self.pos = 0
+
+
+class LinkStats:
+    """一个窗口内的统计"""
+
+    def __init__(self, samples=0, loss=0.0, latency=0.0, http_fail=0.0):
+        self.samples = samples
+        self.loss = loss  # 上游目标全部连接失败的采样比例
+        self.latency = latency  # 上游目标连接延迟中位数（毫秒）
+        self.http_fail = http_fail  # 网关Web页面不可达比例
+
+    def describe(self):
+        return f"延迟{self.latency:.0f}ms，丢失{self.loss:.0%}，网关页面失败{self.http_fail:.0%}"
+
+
+class LinkMonitor:
+    """在编排器的事件循环中运行的链路质量监控；on_trigger(reason) 为触发重启的协程函数"""
+
+    def __init__(self, orchestrator, config, on_trigger, log=None, on_sample=None):
+        self.orchestrator = orchestrator
+        self.config = config
+        self.on_trigger = on_trigger
+        self.log = log or _noop
+        self.on_sample = on_sample  # 每次采样后回调 on_sample(LinkStats)
+        self.interval = config["monitor_interval"]
+        self.window = config["monitor_window"]
+        self.latency_limit = config["monitor_latency_ms"]
+        self.loss_limit = config["monitor_loss"]
+        self.min_gap = config["monitor_min_gap"]
+        self.probe_timeout = min(2, self.interval)
+
+        gateway = urlsplit(reboot_engine.resolve_urls(config)["login_url"])
+        self.gateway = (gateway.hostname, gateway.port or 80)
+        self.targets = [parse_target(t) for t in config["monitor_targets"]]
+        size = max(60, int(self.window / self.interval * 2))
+        self.upstream = {target: RingBuffer(size) for target in self.targets}
+        self.http = RingBuffer(size)  # 1.0 可达，NaN 不可达
+
+        self.last_reboot = 0.0
+        self.breached = False
+        self.breached_since = None  # 本次连续异常开始的时间
+        self._future = None
+
+    # ---- 采样 ----
+    async def measure(self, host, port):
+        """TCP连接耗时（毫秒），失败返回 None"""
+        start = time.monotonic()
+        if await self.orchestrator.probe(host, port, self.probe_timeout):
+            return (time.monotonic() - start) * 1000
+        return None
+
+    async def sample(self):
+        now = time.time()
+        results = await asyncio.gather(*(self.measure(host, port) for host, port in self.targets),
+                                       self.orchestrator.probe_http(self.config, self.probe_timeout))
+        for target, rtt in zip(self.targets, results):
+            self.upstream[target].append(now, rtt)
+            if rtt is not None:
+                self.orchestrator.metrics.link_latency.set(rtt / 1000, target=f"{target[0]}:{target[1]}")
+        self.http.append(now, 1.0 if results[-1] else None)
+
+    def stats(self, now=None):
+        now = now or time.time()
+        since = now - self.window
+        values = []
+        failed = {}  # 采样时间 -> 该次采样中所有目标是否都失败
+        for buf in self.upstream.values():
+            for ts, v in buf.since(since):
+                values.append(v)
+                failed[ts] = failed.get(ts, True) and math.isnan(v)
+        ok = sorted(v for v in values if not math.isnan(v))
+        http = [v for _, v in self.http.since(since)]
+        return LinkStats(
+            samples=len(http),
+            loss=sum(failed.values()) / len(failed) if failed else 0.0,
+            latency=percentile(ok, 50),
+            http_fail=sum(1 for v in http if math.isnan(v)) / len(http) if http else 0.0,
+        )
+
+    def evaluate(self, stats):
+        """返回超过阈值的原因，未超过返回空字符串（恰好等于阈值不算超过）"""
+        reasons = []
+        if self.targets and stats.loss > self.loss_limit:
+            reasons.append(f"上游丢失{stats.loss:.0%}")
+        if self.targets and stats.latency > self.latency_limit:
+            reasons.append(f"上游延迟{stats.latency:.0f}ms")
+        if stats.http_fail > self.loss_limit:
+            reasons.append(f"网关页面失败{stats.http_fail:.0%}")
+        return "，".join(reasons)
+
+    # ---- 运行 ----
+    async def run(self):
+        targets = "、".join(f"{host}:{port}" for host, port in self.targets) or "无"
+        self.log(f"链路监控已启动：每{self.interval:g}秒探测网关 {self.gateway[0]}:{self.gateway[1]}，"
+                 f"上游目标 {targets}，{self.window:g}秒窗口内超过阈值时重启")
+        while True:
+            tick = time.monotonic()
+            await self.sample()
+            now = time.time()
+            stats = self.stats(now)
+            self.orchestrator.metrics.link_loss.set(stats.loss)
+            if self.on_sample:
+                self.on_sample(stats)
+
+            reason = self.evaluate(stats)
+            if reason and not self.breached:
+                self.log(f"⚠️ 链路质量下降：{reason}")
+                self.breached_since = now
+            elif not reason and self.breached:
+                self.log("链路质量已恢复正常")
+                self.breached_since = None
+            self.breached = bool(reason)
+
+            # 连续一个窗口的判断都异常（持续超过阈值）且距上次重启足够久才触发
+            if reason and now - self.breached_since >= self.window and now - self.last_reboot >= self.min_gap:
+                self.log(f"⚠️ 链路质量持续{self.window:g}秒异常（{reason}），触发重启")
+                self.orchestrator.metrics.monitor_reboots.inc()
+                self.last_reboot = now
+                try:
+                    await self.on_trigger(reason)
+                except Exception as e:
+                    self.log(f"❌ 触发的重启失败：{str(e)}")
+                # 重启前的样本不再代表当前链路，重新开始观测
+                for buf in list(self.upstream.values()) + [self.http]:
+                    buf.clear()
+                self.breached = False
+                self.breached_since = None
+            await asyncio.sleep(max(0, self.interval - (time.monotonic() - tick)))
+
+    def start(self):
+        self._future = self.orchestrator.submit(self.run())
+        return self
+
+    def stop(self):
+        if self._future:
+            self._future.cancel()  # 会取消事件循环中对应的任务
+            self._future = None
+            self.log("链路监控已停止")
+
+    @property
+    def running(self):
+        return self._future is not None and not self._future.done()
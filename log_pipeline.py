@@ -0,0 +1,65 @@
+"""日志管道：任意线程写入，界面线程按批取出；界面只保留最近若干行，完整日志按大小轮转写入文件。
+keep 大于0时另外按序号保留最近的若干条，供多个客户端各自按序号增量读取（后台服务使用）"""
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+MAX_SCREEN_LINES = 2000  # 日志区域最多保留的行数
+MAX_PENDING = 5000  # 等待界面取出的记录上限，界面卡住时丢弃最早的记录
+FILE_MAX_BYTES = 1024 * 1024
+FILE_BACKUP_COUNT = 5
+
+
+class LogPipeline:
+    """线程安全的日志管道，内存占用与运行时长无关"""
+
+    def __init__(self, file_path=None, max_pending=MAX_PENDING, max_bytes=FILE_MAX_BYTES,
+                 backup_count=FILE_BACKUP_COUNT, keep=0):
+        self._pending = deque(maxlen=max_pending)  # deque 的 append/popleft 本身是线程安全的
+        self._recent = deque(maxlen=keep)  # (序号, 时间戳, 消息)
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+        self._handler = None
+        if file_path:
+            os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+            self._handler = RotatingFileHandler(file_path, maxBytes=max_bytes, backupCount=backup_count,
+                                                encoding="utf-8")
+            self._handler.setFormatter(logging.Formatter("%(message)s"))
+
+    def emit(self, message):
+        """写入一条日志（可在任意线程调用），返回带时间戳的显示文本"""
+        now = time.time()
+        line = f"[{time.strftime('%H:%M:%S', time.localtime(now))}] {message}"
+        self._pending.append(line)
+        if self._recent.maxlen:
+            with self._lock:  # 序号与写入顺序一致，客户端按序号读取时不会漏掉
+                self._recent.append((next(self._seq), now, message))
+        if self._handler:
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+            self._handler.handle(logging.makeLogRecord({"msg": f"[{stamp}] {message}"}))
+        return line
+
+    def drain(self, limit=500):
+        """取出最多 limit 条待显示的日志"""
+        lines = []
+        try:
+            while len(lines) < limit:
+                lines.append(self._pending.popleft())
+        except IndexError:
+            pass
+        return lines
+
+    def since(self, seq=0, limit=500):
+        """序号大于 seq 的最近日志，返回 [(序号, 时间戳, 消息)]"""
+        with self._lock:
+            entries = list(self._recent)
+        return [entry for entry in entries if entry[0] > seq][:limit]
+
+    def close(self):
+        if self._handler:
+            self._handler.close()
+            self._handler = None
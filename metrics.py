@@ -0,0 +1,220 @@
+"""本地指标：计数器/直方图/仪表，通过轻量后台 HTTP 服务以 Prometheus 文本或 JSON 格式输出
+
+    GET http://127.0.0.1:<metrics_port>/metrics       Prometheus 文本格式
+    GET http://127.0.0.1:<metrics_port>/metrics.json  JSON
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=None):
+    items = list(key) + list((extra or {}).items())
+    if not items:
+        return ""
+    inner = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in items)
+    return "{" + inner + "}"
+
+
+def _format_value(value):
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def get(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(labels))
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._values = {}  # key -> [各桶计数..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def samples(self):
+        result = []
+        with self._lock:
+            for key, data in self._values.items():
+                for i, bound in enumerate(self.buckets):
+                    result.append((self.name + "_bucket", key + (("le", f"{bound:g}"),), data[i]))
+                result.append((self.name + "_bucket", key + (("le", "+Inf"),), data[-1]))
+                result.append((self.name + "_sum", key, data[-2]))
+                result.append((self.name + "_count", key, data[-1]))
+        return result
+
+
+class Metrics:
+    """应用指标集合"""
+
+    def __init__(self):
+        self.reboot_attempts = Counter("router_reboot_attempts_total", "重启尝试次数")
+        self.reboot_successes = Counter("router_reboot_success_total", "重启成功次数")
+        self.reboot_failures = Counter("router_reboot_failure_total", "重启失败次数")
+        self.wifi_attempts = Counter("router_wifi_connect_attempts_total", "WiFi连接尝试次数（按SSID）")
+        self.wifi_successes = Counter("router_wifi_connect_success_total", "WiFi连接成功次数（按SSID）")
+        self.run_duration = Histogram("router_run_duration_seconds", "操作耗时（秒）")
+        self.last_success = Gauge("router_last_successful_reboot_timestamp_seconds", "最近一次重启成功的时间戳")
+        self.next_run = Gauge("router_scheduler_next_run_timestamp_seconds", "定时任务下次执行的时间戳")
+        self.downtime = Histogram("router_reboot_downtime_seconds", "重启时光猫断开到恢复的时长（秒）")
+        self.recovery = Histogram("router_reboot_recovery_seconds", "从发出重启指令到光猫恢复的时长（秒）")
+        self.link_latency = Gauge("router_link_latency_seconds", "链路监控最近一次测得的连接延迟（秒）")
+        self.link_loss = Gauge("router_link_loss_ratio", "链路监控窗口内上游目标全部连接失败的采样比例")
+        self.monitor_reboots = Counter("router_monitor_reboots_total", "链路监控触发的重启次数")
+        self.retries = Counter("router_retries_total", "失败后重试的次数（按操作）")
+        self.circuit_open = Gauge("router_circuit_open", "光猫熔断状态（1为熔断中）")
+        self.queue_depth = Gauge("router_job_queue_depth", "设备作业队列中排队和执行中的作业数")
+        self.queue_wait = Histogram("router_job_queue_wait_seconds", "作业从提交到开始执行的等待时间（秒）")
+        self.jobs_coalesced = Counter("router_jobs_coalesced_total", "与排队中的同类作业合并的请求数")
+        self.jobs_rejected = Counter("router_jobs_rejected_total", "因同一光猫已在重启而被拒绝的请求数")
+        self.started_at = time.time()
+
+    def collectors(self):
+        return [self.reboot_attempts, self.reboot_successes, self.reboot_failures, self.wifi_attempts,
+                self.wifi_successes, self.run_duration, self.last_success, self.next_run, self.downtime,
+                self.recovery, self.link_latency, self.link_loss, self.monitor_reboots, self.retries,
+                self.circuit_open, self.queue_depth, self.queue_wait, self.jobs_coalesced, self.jobs_rejected]
+
+    def record_reboot(self, router, ok, duration):
+        self.reboot_attempts.inc(router=router)
+        (self.reboot_successes if ok else self.reboot_failures).inc(router=router)
+        self.run_duration.observe(duration, operation="reboot")
+        if ok:
+            self.last_success.set(time.time(), router=router)
+
+    def record_recovery(self, router, downtime, total):
+        self.downtime.observe(downtime, router=router)
+        self.recovery.observe(total, router=router)
+
+    def record_wifi(self, ssid, ok):
+        self.wifi_attempts.inc(ssid=ssid)
+        if ok:
+            self.wifi_successes.inc(ssid=ssid)
+
+    def _since_last_success(self):
+        now = time.time()
+        return [("router_seconds_since_last_successful_reboot", key, now - ts)
+                for _, key, ts in self.last_success.samples()]
+
+    def render_prometheus(self):
+        lines = []
+        for c in self.collectors():
+            lines.append(f"# HELP {c.name} {c.help}")
+            lines.append(f"# TYPE {c.name} {c.kind}")
+            for name, key, value in c.samples():
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+        lines.append("# HELP router_seconds_since_last_successful_reboot 距离最近一次重启成功的秒数")
+        lines.append("# TYPE router_seconds_since_last_successful_reboot gauge")
+        for name, key, value in self._since_last_success():
+            lines.append(f"{name}{_format_labels(key)} {value:.0f}")
+        lines.append("# TYPE router_process_uptime_seconds gauge")
+        lines.append(f"router_process_uptime_seconds {time.time() - self.started_at:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def render_json(self):
+        data = {}
+        for c in self.collectors():
+            data[c.name] = [{"name": name, "labels": dict(key), "value": value} for name, key, value in c.samples()]
+        data["router_seconds_since_last_successful_reboot"] = [
+            {"labels": dict(key), "value": round(value)} for _, key, value in self._since_last_success()]
+        data["router_process_uptime_seconds"] = round(time.time() - self.started_at)
+        return json.dumps(data, ensure_ascii=False, indent=2)
+
+
+# 进程内共享的指标
+METRICS = Metrics()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        metrics = self.server.metrics
+        if self.path.startswith("/metrics.json"):
+            body, ctype = metrics.render_json(), "application/json; charset=utf-8"
+        elif self.path.startswith("/metrics") or self.path == "/":
+            body, ctype = metrics.render_prometheus(), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MetricsServer:
+    """在后台守护线程中提供指标，只有被抓取时才产生开销"""
+
+    def __init__(self, port, host="127.0.0.1", metrics=None):
+        self.host = host
+        self.port = port
+        self.metrics = metrics or METRICS
+        self._server = None
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), MetricsHandler)
+        self._server.daemon_threads = True
+        self._server.metrics = self.metrics
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True, name="metrics").start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
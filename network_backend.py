@@ -0,0 +1,183 @@
+"""WiFi网络后端：Windows netsh、Linux nmcli，以及用于测试的内存模拟
+
+连接前先扫描一次（结果按 TTL 缓存），把配置的 SSID 按是否可见和信号强度排序，
+优先连接信号最好的一个，而不是按配置顺序逐个等待超时。
+"""
+import asyncio
+import locale
+import re
+import shutil
+import subprocess
+import sys
+import time
+
+BACKEND_CHOICES = ["auto", "netsh", "nmcli", "mock"]
+KILL_TIMEOUT = 5  # 结束子进程后等待其退出的上限（秒）
+
+
+class Network:
+    """扫描到的一个WiFi"""
+
+    def __init__(self, ssid, signal=0):
+        self.ssid = ssid
+        self.signal = signal  # 信号强度 0-100
+
+    def __repr__(self):
+        return f"Network({self.ssid!r}, {self.signal})"
+
+
+def rank_networks(wifi_list, networks):
+    """可见的配置SSID按信号从强到弱排在前面，扫描不到的按配置顺序排在后面（可能是隐藏网络）"""
+    signals = {}
+    for network in networks:
+        signals[network.ssid] = max(signals.get(network.ssid, 0), network.signal)
+    visible = sorted((ssid for ssid in wifi_list if ssid in signals), key=lambda ssid: -signals[ssid])
+    return visible + [ssid for ssid in wifi_list if ssid not in signals], signals
+
+
+def kill_process(proc):
+    """结束子进程；Windows 上连同经由 shell 启动的 netsh 等子进程一起结束"""
+    try:
+        if sys.platform == "win32":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)], capture_output=True,
+                           timeout=KILL_TIMEOUT)
+        else:
+            proc.kill()
+    except (OSError, subprocess.SubprocessError):
+        pass  # 进程已经退出
+
+
+async def run_command(args, timeout):
+    """运行命令（args 为参数列表，不经由 shell）并返回 (退出码, 输出文本)；超时或被取消时结束子进程"""
+    proc = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.PIPE,
+                                                stderr=asyncio.subprocess.STDOUT)
+    try:
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout)
+    except BaseException:
+        kill_process(proc)
+        try:
+            await asyncio.wait_for(proc.wait(), KILL_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+        raise
+    return proc.returncode, stdout.decode(locale.getpreferredencoding(False), errors="replace").strip()
+
+
+class NetworkBackend:
+    """网络后端基类：子类实现 _scan() 和 connect()"""
+
+    name = ""
+
+    def __init__(self, scan_ttl=30):
+        self.scan_ttl = scan_ttl
+        self._scan_cache = None  # (时间, [Network])
+
+    async def _scan(self, timeout):
+        raise NotImplementedError
+
+    async def scan(self, timeout=15):
+        """扫描附近的WiFi，TTL 内重复调用直接返回缓存"""
+        if self._scan_cache and time.monotonic() - self._scan_cache[0] < self.scan_ttl:
+            return self._scan_cache[1]
+        networks = await self._scan(timeout)
+        self._scan_cache = (time.monotonic(), networks)
+        return networks
+
+    def invalidate(self):
+        self._scan_cache = None
+
+    async def connect(self, ssid, timeout):
+        """连接指定SSID，返回 (是否成功, 错误信息)"""
+        raise NotImplementedError
+
+
+class NetshBackend(NetworkBackend):
+    """Windows：netsh wlan"""
+
+    name = "netsh"
+
+    async def _scan(self, timeout):
+        code, output = await run_command(["netsh", "wlan", "show", "networks", "mode=bssid"], timeout)
+        if code != 0:
+            raise OSError(output or "扫描WiFi失败")
+        networks = []
+        for line in output.splitlines():
+            match = re.match(r"\s*SSID \d+\s*:\s*(.*)$", line)
+            if match:
+                networks.append(Network(match.group(1).strip()))
+                continue
+            # 英文系统为 Signal，中文系统为 信号
+            match = re.match(r"\s*(?:Signal|信号)\s*:\s*(\d+)%", line)
+            if match and networks:
+                networks[-1].signal = max(networks[-1].signal, int(match.group(1)))
+        return networks
+
+    async def connect(self, ssid, timeout):
+        # 以参数列表传入，不经过 shell：SSID 中的引号、& 等字符不会破坏命令
+        code, output = await run_command(["netsh", "wlan", "connect", f"name={ssid}"], timeout)
+        return code == 0, output
+
+
+class NmcliBackend(NetworkBackend):
+    """Linux：NetworkManager 的 nmcli"""
+
+    name = "nmcli"
+
+    async def _scan(self, timeout):
+        code, output = await run_command(["nmcli", "-t", "-f", "SSID,SIGNAL", "device", "wifi", "list",
+                                          "--rescan", "auto"], timeout)
+        if code != 0:
+            raise OSError(output or "扫描WiFi失败")
+        networks = []
+        for line in output.splitlines():
+            # -t 输出中 SSID 里的冒号会被转义为 \:
+            ssid, _, signal = line.replace("\\:", "\0").rpartition(":")
+            ssid = ssid.replace("\0", ":")
+            if ssid and signal.isdigit():
+                networks.append(Network(ssid, int(signal)))
+        return networks
+
+    async def connect(self, ssid, timeout):
+        code, output = await run_command(["nmcli", "device", "wifi", "connect", ssid], timeout)
+        return code == 0, output
+
+
+class MockBackend(NetworkBackend):
+    """内存模拟：networks 为 {SSID: 信号}，fail 中的SSID连接失败，记录扫描和连接次数"""
+
+    name = "mock"
+
+    def __init__(self, networks=None, fail=(), delay=0.0, scan_ttl=30):
+        super().__init__(scan_ttl)
+        self.networks = dict(networks or {})
+        self.fail = set(fail)
+        self.delay = delay
+        self.scans = 0
+        self.attempts = []
+
+    async def _scan(self, timeout):
+        self.scans += 1
+        await asyncio.sleep(self.delay)
+        return [Network(ssid, signal) for ssid, signal in self.networks.items()]
+
+    async def connect(self, ssid, timeout):
+        self.attempts.append(ssid)
+        await asyncio.sleep(self.delay)
+        if ssid in self.networks and ssid not in self.fail:
+            return True, ""
+        return False, "找不到网络" if ssid not in self.networks else "连接失败"
+
+
+def create_backend(name="auto", scan_ttl=30):
+    """按名称创建网络后端；auto 时 Windows 用 netsh，其他系统有 nmcli 时用 nmcli"""
+    if name == "auto":
+        if sys.platform == "win32":
+            name = "netsh"
+        elif shutil.which("nmcli"):
+            name = "nmcli"
+        else:
+            raise OSError("未找到可用的WiFi管理工具（Windows需要netsh，Linux需要nmcli）")
+    backends = {"netsh": NetshBackend, "nmcli": NmcliBackend, "mock": MockBackend}
+    if name not in backends:
+        raise ValueError(f"未知的网络后端：{name}")
+    return backends[name](scan_ttl=scan_ttl)
@@ -0,0 +1,534 @@
+"""基于 asyncio 的设备操作编排：登录、重启、可达性探测和WiFi连接都是可取消、带超时的协程
+
+所有协程运行在同一个后台事件循环线程中，数百台设备的操作可以在一个循环里并发，
+而不是每台设备占用一个系统线程（和一个浏览器）。Tk界面通过 submit() 拿到
+concurrent.futures.Future，在回调里用 root.after 切回主线程，不会阻塞 mainloop。
+"""
+import asyncio
+import http.client
+import ssl
+import threading
+import time
+from email.parser import BytesParser
+from urllib.parse import urlsplit
+
+import reboot_engine
+from cancel_token import CancelToken
+from job_queue import JobQueue
+from metrics import METRICS
+from network_backend import create_backend, rank_networks
+from phase_timer import PhaseTimer
+from retry_policy import CircuitBreaker, CircuitOpenError, RetryPolicy
+from reboot_engine import (HttpRebootEngine, HttpResponse, SeleniumRebootEngine, encode_form,
+                           request_target, request_headers, store_cookies, decode_body, redirect_request,
+                           throw_request_error)
+
+
+# 取消后等待浏览器线程退出的上限（秒）：超过后不再等待，浏览器已在取消时被关闭
+CANCEL_GRACE = 3
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+def _consume(future):
+    """取走已不再等待的线程结果中的异常，避免事件循环报告“未获取的异常”"""
+    if not future.cancelled():
+        future.exception()
+
+
+class AsyncHttpSession:
+    """基于 asyncio 流的简易 HTTP/1.1 会话：按主机复用长连接，并自动保存 Cookie"""
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+        self.cookies = {}
+        self._conns = {}  # (scheme, netloc) -> (reader, writer)
+
+    async def _open(self, scheme, netloc):
+        parts = urlsplit(f"{scheme}://{netloc}")
+        port = parts.port or (443 if scheme == "https" else 80)
+        context = ssl.create_default_context() if scheme == "https" else None
+        return await asyncio.open_connection(parts.hostname, port, ssl=context)
+
+    async def _read_response(self, reader, method):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("连接已被对端关闭")
+        status = int(status_line.split()[1])
+        header_lines = []
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            header_lines.append(line)
+        headers = BytesParser(_class=http.client.HTTPMessage).parsebytes(b"".join(header_lines))
+
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            data = b""
+        elif (headers.get("Transfer-Encoding") or "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            data = b"".join(chunks)
+        elif headers.get("Content-Length") is not None:
+            data = await reader.readexactly(int(headers["Content-Length"]))
+        else:
+            data = await reader.read()
+            headers["Connection"] = "close"
+        return status, headers, data
+
+    async def _send(self, method, url, body=None):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        headers = request_headers(self.cookies, body)
+        headers["Host"] = parts.netloc
+        if body is not None:
+            headers["Content-Length"] = str(len(body))
+        request = f"{method} {request_target(url)} HTTP/1.1\r\n"
+        request += "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+        payload = request.encode("latin-1") + (body or b"")
+
+        for attempt in range(2):
+            reused = key in self._conns
+            if not reused:
+                self._conns[key] = await self._open(parts.scheme, parts.netloc)
+            reader, writer = self._conns[key]
+            try:
+                writer.write(payload)
+                await writer.drain()
+                status, resp_headers, data = await self._read_response(reader, method)
+                break
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # 复用的长连接可能已被对端关闭，重建一次
+                self._close_conn(key)
+                if not reused or attempt:
+                    raise
+        store_cookies(self.cookies, resp_headers)
+        if (resp_headers.get("Connection") or "").lower() == "close":
+            self._close_conn(key)
+        return HttpResponse(status, url, resp_headers, decode_body(resp_headers, data))
+
+    async def request(self, method, url, fields=None, max_redirects=5):
+        """发送请求并跟随重定向，返回最终页面"""
+        body = encode_form(fields)
+        resp = await asyncio.wait_for(self._send(method, url, body), self.timeout)
+        for _ in range(max_redirects):
+            follow = redirect_request(method, url, resp, body)
+            if follow is None:
+                break
+            method, url, body = follow
+            resp = await asyncio.wait_for(self._send(method, url, body), self.timeout)
+        return resp
+
+    def _close_conn(self, key):
+        conn = self._conns.pop(key, None)
+        if conn:
+            conn[1].close()
+
+    def close(self):
+        for key in list(self._conns):
+            self._close_conn(key)
+
+
+class AsyncHttpRebootEngine(HttpRebootEngine):
+    """HTTP直连引擎的异步版本，复用同一套请求序列"""
+
+    def __init__(self, config, log=None, progress=None, timeout=None, driver_pool=None, timer=None):
+        super().__init__(config, log=log, progress=progress, timeout=timeout, timer=timer)
+        self.session = AsyncHttpSession(timeout=self.timeout)
+
+    async def drive(self, steps):
+        """用异步会话执行一个请求序列生成器"""
+        try:
+            request = next(steps)
+            while True:
+                try:
+                    response = await self.session.request(*request)
+                except Exception as e:
+                    throw_request_error(steps, e)
+                request = steps.send(response)
+        except StopIteration:
+            pass
+
+    async def run(self):
+        try:
+            await self.drive(self.flow())
+        finally:
+            self.session.close()
+
+
+class Orchestrator:
+    """在后台线程中持有一个事件循环，并提供设备操作协程"""
+
+    def __init__(self, max_browsers=2, metrics=None, history=None):
+        self.max_browsers = max_browsers  # 同时运行的浏览器上限（回退到selenium时）
+        self.metrics = metrics or METRICS
+        self.history = history  # RunHistory，为 None 时不记录运行历史
+        self.loop = None
+        self._thread = None
+        self._browser_slots = None
+        self._backends = {}
+        self._breakers = {}  # router_ip -> CircuitBreaker
+        self.jobs = JobQueue(self)  # 按设备排队的作业，界面和定时任务的操作都经由它提交
+        self._lock = threading.Lock()
+
+    # ---- 事件循环生命周期 ----
+    def start(self):
+        with self._lock:
+            if self.loop is not None:
+                return self
+            self.loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run_loop, args=(ready,), daemon=True,
+                                            name="orchestrator")
+            self._thread.start()
+            ready.wait()
+        return self
+
+    def _run_loop(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self._browser_slots = asyncio.Semaphore(self.max_browsers)
+        self.loop.call_soon(ready.set)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """从任意线程提交协程，返回 concurrent.futures.Future"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """提交协程并阻塞等待结果（供工作线程/命令行使用）"""
+        return self.submit(coro).result(timeout)
+
+    def stop(self, timeout=5, log=None):
+        """取消所有未完成的操作并结束事件循环；等待操作响应取消和线程退出各最多 timeout 秒"""
+        with self._lock:
+            if self.loop is None:
+                return
+            loop, self.loop = self.loop, None
+
+        async def shutdown():
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout)
+        except Exception:
+            pass  # 超时仍未结束的操作不再等待
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            # 仍有操作在退出中（例如阻塞在线程池中的浏览器调用），循环还在运行，不能关闭；后台线程随进程退出
+            (log or _noop)(f"⚠️ 事件循环在{timeout:g}秒内未能停止，跳过关闭")
+            return
+        loop.close()
+
+    # ---- 设备操作协程 ----
+    async def probe(self, host, port=80, timeout=3):
+        """TCP可达性探测：能在 timeout 秒内建立连接返回 True"""
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        return True
+
+    async def probe_router(self, config, timeout=3):
+        """探测配置中的光猫管理页端口"""
+        parts = urlsplit(reboot_engine.resolve_urls(config)["login_url"])
+        return await self.probe(parts.hostname, parts.port or 80, timeout)
+
+    async def probe_http(self, config, timeout=3):
+        """HTTP探测：登录页能正常返回（非5xx）即认为Web服务可用"""
+        session = AsyncHttpSession(timeout=timeout)
+        try:
+            resp = await session.request("GET", reboot_engine.resolve_urls(config)["login_url"])
+            return resp.status < 500
+        except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            return False
+        finally:
+            session.close()
+
+    async def poll_router(self, config, expect_up, timeout, check_http=False, interval=0.2, max_interval=0.5):
+        """反复探测光猫直到其可达状态等于 expect_up，间隔逐渐放大到 max_interval；超时返回 False"""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            up = await self.probe_router(config, timeout=min(1, remaining))
+            if up and check_http:
+                up = await self.probe_http(config, timeout=max(0.1, min(3, deadline - time.monotonic())))
+            if up == expect_up:
+                return True
+            await asyncio.sleep(min(interval, max(0, deadline - time.monotonic())))
+            interval = min(interval * 2, max_interval)
+
+    async def wait_router_ready(self, config, timeout=30):
+        """轮询光猫管理页端口直到可以建立连接，返回等待的秒数；超过 timeout 仍不可达返回 None"""
+        start = time.monotonic()
+        if await self.poll_router(config, expect_up=True, timeout=timeout):
+            return time.monotonic() - start
+        return None
+
+    async def verify_reboot(self, config, log=None, progress=None, timer=None):
+        """重启指令发出后确认光猫先断开（确实重启了）再恢复，返回 (停机秒数, 指令发出到恢复的秒数)"""
+        log = log or _noop
+        progress = progress or _noop
+        timer = timer or PhaseTimer()
+        down_timeout = config["recovery_down_timeout"]
+        up_timeout = config["recovery_up_timeout"]
+        start = time.monotonic()
+
+        progress(92, "等待光猫断开...")
+        with timer.phase("wait_down"):
+            if not await self.poll_router(config, expect_up=False, timeout=down_timeout):
+                raise reboot_engine.RebootError(f"光猫在{down_timeout:g}秒内没有断开，重启未生效")
+        down_at = time.monotonic()
+        log(f"光猫已断开（指令发出后{down_at - start:.1f}秒），等待恢复...")
+
+        progress(95, "等待光猫恢复...")
+        with timer.phase("recovery"):
+            if not await self.poll_router(config, expect_up=True, timeout=up_timeout, check_http=True):
+                raise reboot_engine.RebootError(f"光猫断开后{up_timeout:g}秒内没有恢复")
+        now = time.monotonic()
+        downtime, total = now - down_at, now - start
+        self.metrics.record_recovery(config["router_ip"], downtime, total)
+        log(f"✅ 光猫已恢复：停机{downtime:.1f}秒，指令发出到恢复共{total:.1f}秒")
+        return downtime, total
+
+    async def login(self, config, log=None, progress=None, timeout=30):
+        """仅执行HTTP登录，返回已登录的引擎（其 session 可继续使用）"""
+        engine = AsyncHttpRebootEngine(config, log=log, progress=progress)
+        urls = reboot_engine.resolve_urls(config)
+        try:
+            await asyncio.wait_for(engine.drive(engine.login(urls)), timeout)
+        except BaseException:
+            engine.session.close()
+            raise
+        return engine
+
+    async def _selenium_reboot(self, config, log, progress, driver_pool, timer):
+        async with self._browser_slots:
+            token = CancelToken()
+            engine = SeleniumRebootEngine(config, log=log, progress=progress, driver_pool=driver_pool, timer=timer,
+                                          cancel=token)
+            thread = asyncio.ensure_future(asyncio.to_thread(engine.run))
+            try:
+                await asyncio.shield(thread)
+            except asyncio.CancelledError:
+                # 线程无法直接取消：通过令牌通知它停止（同时关闭浏览器），最多等待 CANCEL_GRACE 秒
+                token.cancel()
+                thread.add_done_callback(_consume)
+                await asyncio.wait({thread}, timeout=CANCEL_GRACE)
+                raise
+
+    async def reboot(self, config, log=None, progress=None, timeout=120, driver_pool=None, timer=None, verify=None):
+        """按配置的引擎重启光猫（HTTP直连失败时回退到浏览器模拟），返回实际使用的引擎名
+
+        timeout 是发出重启指令的总时限，所有重试（含退避等待）共用；verify（默认取配置中的 verify_reboot）
+        为真时，还要确认光猫断开并恢复，这一步另有 recovery_down_timeout + recovery_up_timeout 的时限，
+        停机时长记入 timer。因此整个操作最长 timeout 加上确认的时限
+        """
+        log = log or _noop
+        timer = timer or PhaseTimer()
+        engine = reboot_engine.engine_order(config)[0]
+        if verify is None:
+            verify = config.get("verify_reboot", False)
+
+        async def attempt():
+            if engine == "http":
+                try:
+                    await AsyncHttpRebootEngine(config, log=log, progress=progress, timer=timer).run()
+                    return "http"
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    log(f"⚠️ {HttpRebootEngine.label}失败：{str(e)}，改用{SeleniumRebootEngine.label}重试")
+            await self._selenium_reboot(config, log, progress, driver_pool, timer)
+            return "selenium"
+
+        started = time.time()
+        start = time.monotonic()
+        sent = None
+        ok = False
+        error = ""
+        try:
+            result = await self._retry_reboot(config, attempt, timeout, log)
+            sent = time.monotonic()
+            if verify:
+                limit = config["recovery_down_timeout"] + config["recovery_up_timeout"]
+                try:
+                    await asyncio.wait_for(self.verify_reboot(config, log, progress, timer), limit)
+                except asyncio.TimeoutError:
+                    raise reboot_engine.RebootError(f"重启确认超过{limit:g}秒未完成") from None
+            ok = True
+            return result
+        except BaseException as e:
+            error = str(e) or type(e).__name__
+            raise
+        finally:
+            self.metrics.record_reboot(config["router_ip"], ok, (sent or time.monotonic()) - start)
+            if self.history:
+                self.history.record_timer("reboot", timer, started, time.monotonic() - start, ok, error=error)
+
+    def breaker(self, config):
+        """配置中的光猫对应的熔断器"""
+        router = config["router_ip"]
+        breaker = self._breakers.get(router)
+        if breaker is None:
+            breaker = self._breakers[router] = CircuitBreaker()
+        breaker.threshold = config.get("breaker_threshold", 3)
+        breaker.cooldown = config.get("breaker_cooldown", 300)
+        return breaker
+
+    def breaker_states(self):
+        """各光猫熔断器的状态快照"""
+        return {router: {"state": b.state, "failures": b.failures, "remaining": round(b.remaining())}
+                for router, b in list(self._breakers.items())}
+
+    async def check_breaker(self, config, log):
+        """熔断中且未到冷却时间时抛出 CircuitOpenError；冷却结束后先探测光猫Web服务，可用才放行一次试探"""
+        breaker = self.breaker(config)
+        if breaker.state != "open":
+            return breaker
+        if breaker.remaining() > 0:
+            raise CircuitOpenError(f"光猫连续{breaker.failures}次重启失败，已暂停尝试，{breaker.describe_retry_at()} 后再试")
+        if not await self.probe_http(config):
+            breaker.trip()
+            self.metrics.circuit_open.set(1, router=config["router_ip"])
+            raise CircuitOpenError(f"光猫仍无法访问，继续暂停尝试至 {breaker.describe_retry_at()}")
+        log("光猫已可访问，恢复重启尝试")
+        breaker.half_open()
+        return breaker
+
+    async def _retry_reboot(self, config, attempt, timeout, log):
+        """按重试策略执行 attempt()（发出重启指令的部分），所有尝试共用 timeout 秒；
+        确定性的失败（密码错误、缺少驱动等）不重试。熔断器按整次操作记一次成功或失败，而不是每次尝试"""
+        policy = RetryPolicy.from_config(config)
+        breaker = await self.check_breaker(config, log)
+        router = config["router_ip"]
+        deadline = time.monotonic() + timeout
+        try:
+            for n in range(1, policy.attempts + 1):
+                try:
+                    result = await asyncio.wait_for(attempt(), max(0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    raise reboot_engine.RebootError(f"重启超过{timeout:g}秒未完成") from None
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    if n == policy.attempts or not policy.retryable(e):
+                        raise
+                    delay = policy.delay(n)
+                    if time.monotonic() + delay >= deadline:
+                        log(f"⚠️ 第{n}次重启失败：{str(e)}，剩余时间不足以重试")
+                        raise
+                    log(f"⚠️ 第{n}次重启失败：{str(e)}，{delay:.1f}秒后重试")
+                    self.metrics.retries.inc(operation="reboot")
+                    await asyncio.sleep(delay)
+                    continue
+                breaker.record_success()
+                self.metrics.circuit_open.set(0, router=router)
+                return result
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            breaker.record_failure()
+            if breaker.state == "open":
+                self.metrics.circuit_open.set(1, router=router)
+                log(f"⚠️ 光猫连续{breaker.failures}次重启失败，暂停尝试至 {breaker.describe_retry_at()}")
+            raise
+
+    def network_backend(self, name="auto", scan_ttl=30):
+        """按名称取网络后端（同名后端复用，扫描缓存因此在多次连接之间有效）"""
+        if name not in self._backends:
+            self._backends[name] = create_backend(name, scan_ttl)
+        backend = self._backends[name]
+        backend.scan_ttl = scan_ttl
+        return backend
+
+    async def connect_wifi(self, wifi_list, log=None, progress=None, timeout=30, profile="", backend="auto",
+                           retry=None, scan_ttl=30):
+        """扫描后按信号强度连接配置的WiFi，返回连接是否成功；profile 为记入运行历史的配置名，
+        backend 为网络后端名称（按 scan_ttl 缓存扫描结果）或实例，retry 为 RetryPolicy（为空时不重试）。
+        后端不可用（没有 nmcli、名称有误）时记录日志并返回 False"""
+        log = log or _noop
+        progress = progress or _noop
+        if not wifi_list:
+            log("❌ 未配置任何WiFi，请先在WiFi设置中添加")
+            progress(0, "未配置WiFi")
+            return False
+
+        log("开始连接WiFi...")
+        progress(10, "开始连接WiFi...")
+        started = time.time()
+        start = time.monotonic()
+        connected = False
+        try:
+            if isinstance(backend, str):
+                backend = self.network_backend(backend, scan_ttl)
+            attempts = retry.attempts if retry else 1
+            for n in range(1, attempts + 1):
+                connected = await self._connect_wifi(backend, wifi_list, log, progress, timeout)
+                if connected or n == attempts:
+                    return connected
+                delay = retry.delay(n)
+                log(f"⚠️ 第{n}次连接WiFi失败，{delay:.1f}秒后重试")
+                self.metrics.retries.inc(operation="wifi")
+                await asyncio.sleep(delay)
+        except (OSError, ValueError) as e:
+            log(f"❌ 连接WiFi失败：{str(e)}")
+            progress(0, "WiFi连接失败")
+            return False
+        finally:
+            duration = time.monotonic() - start
+            self.metrics.run_duration.observe(duration, operation="wifi")
+            if self.history:
+                self.history.record("wifi", profile, started, duration, connected,
+                                    error="" if connected else "WiFi连接失败")
+
+    async def _connect_wifi(self, backend, wifi_list, log, progress, timeout):
+        progress(15, "扫描WiFi...")
+        try:
+            networks = await backend.scan(timeout)
+            candidates, signals = rank_networks(wifi_list, networks)
+            visible = [f"{ssid}({signals[ssid]}%)" for ssid in candidates if ssid in signals]
+            log(f"扫描到配置中的WiFi：{'、'.join(visible) if visible else '无'}")
+        except (OSError, asyncio.TimeoutError) as e:
+            # 扫描失败时按配置顺序尝试
+            log(f"⚠️ 扫描WiFi失败：{str(e) or '超时'}，按配置顺序连接")
+            candidates = list(wifi_list)
+        progress_step = 70 / len(candidates)
+
+        for i, wifi in enumerate(candidates):
+            progress(20 + i * progress_step, f"尝试连接: {wifi}")
+            log(f"尝试连接WiFi: {wifi}")
+            try:
+                ok, error_msg = await backend.connect(wifi, timeout)
+            except asyncio.TimeoutError:
+                self.metrics.record_wifi(wifi, False)
+                log(f"❌ 连接WiFi {wifi} 超时")
+                continue
+
+            self.metrics.record_wifi(wifi, ok)
+            if ok:
+                log(f"✅ 成功连接到WiFi: {wifi}")
+                progress(100, f"已连接: {wifi}")
+                return True
+            log(f"❌ 连接WiFi {wifi} 失败: {error_msg or '连接失败'}")
+
+        # 可能是扫描结果已过时，下次重新扫描
+        backend.invalidate()
+        log("❌ 所有配置的WiFi都连接失败")
+        progress(0, "WiFi连接失败")
+        return False
@@ -0,0 +1,150 @@
+"""重启流程的分阶段计时：每个阶段用单调时钟计时，产生结构化记录，并汇总 p50/p95/max"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# 重启流程的阶段（按执行顺序）及显示名称
+PHASES = [
+    ("driver_start", "启动浏览器"),
+    ("session_check", "检查会话"),
+    ("login_page", "加载登录页"),
+    ("switch_user", "切换普通用户"),
+    ("password", "输入密码"),
+    ("login_redirect", "登录跳转"),
+    ("manage_page", "加载重启页"),
+    ("reboot_click", "点击重启"),
+    ("confirm", "确认重启"),
+    ("wait_down", "等待断开"),
+    ("recovery", "停机恢复"),
+]
+PHASE_LABELS = dict(PHASES)
+
+
+def percentile(values, q):
+    """线性插值百分位数，values 需已排序"""
+    if not values:
+        return 0.0
+    pos = (len(values) - 1) * q / 100
+    low = int(pos)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (pos - low)
+
+
+class PhaseRecord:
+    """一个阶段的计时结果"""
+
+    def __init__(self, phase, duration, outcome, config_name="", engine="", error=""):
+        self.phase = phase
+        self.duration = duration
+        self.outcome = outcome  # "ok" 或 "error"
+        self.config_name = config_name
+        self.engine = engine
+        self.error = error
+        self.timestamp = time.time()
+
+    def to_dict(self):
+        return {
+            "timestamp": round(self.timestamp, 3),
+            "config": self.config_name,
+            "engine": self.engine,
+            "phase": self.phase,
+            "duration": round(self.duration, 4),
+            "outcome": self.outcome,
+            "error": self.error,
+        }
+
+
+class PhaseRecorder:
+    """收集阶段记录：保留每个阶段最近的样本用于汇总，可选追加写入 JSON Lines 文件"""
+
+    def __init__(self, jsonl_path=None, max_samples=1000):
+        self.jsonl_path = jsonl_path
+        self.max_samples = max_samples
+        self.listeners = []  # 每条记录都会回调 listener(record)
+        self._samples = {}  # (phase, engine) -> deque[duration]
+        self._errors = {}
+        self._lock = threading.Lock()
+        if jsonl_path:
+            os.makedirs(os.path.dirname(jsonl_path) or ".", exist_ok=True)
+
+    def record(self, rec):
+        with self._lock:
+            key = (rec.phase, rec.engine)
+            if rec.outcome == "ok":
+                self._samples.setdefault(key, deque(maxlen=self.max_samples)).append(rec.duration)
+            else:
+                self._errors[key] = self._errors.get(key, 0) + 1
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(rec.to_dict(), ensure_ascii=False) + "\n")
+        for listener in list(self.listeners):
+            listener(rec)
+
+    def summary(self):
+        """返回 [(phase, engine, count, errors, p50, p95, max)]，按阶段顺序排列"""
+        order = {name: i for i, (name, _) in enumerate(PHASES)}
+        with self._lock:
+            keys = set(self._samples) | set(self._errors)
+            rows = []
+            for phase, engine in keys:
+                values = sorted(self._samples.get((phase, engine), ()))
+                rows.append((phase, engine, len(values), self._errors.get((phase, engine), 0),
+                             percentile(values, 50), percentile(values, 95), values[-1] if values else 0.0))
+        rows.sort(key=lambda r: (r[1], order.get(r[0], len(order))))
+        return rows
+
+    def format_summary(self):
+        rows = self.summary()
+        if not rows:
+            return "暂无阶段耗时数据"
+        lines = [f"{'引擎':<10}{'阶段':<10}{'次数':>6}{'失败':>6}{'p50':>10}{'p95':>10}{'max':>10}"]
+        for phase, engine, count, errors, p50, p95, high in rows:
+            label = PHASE_LABELS.get(phase, phase)
+            lines.append(f"{engine:<10}{label:<10}{count:>6}{errors:>6}{p50:>9.3f}s{p95:>9.3f}s{high:>9.3f}s")
+        return "\n".join(lines)
+
+
+class PhaseTimer:
+    """单次重启的阶段计时器；未指定 recorder 时只在 self.records 中保留本次结果"""
+
+    def __init__(self, recorder=None, config_name=""):
+        self.recorder = recorder
+        self.config_name = config_name
+        self.engine = ""
+        self.records = []
+
+    @contextmanager
+    def phase(self, name):
+        start = time.monotonic()
+        outcome, error = "ok", ""
+        try:
+            yield
+        except BaseException as e:
+            outcome, error = "error", str(e)
+            raise
+        finally:
+            rec = PhaseRecord(name, time.monotonic() - start, outcome, self.config_name, self.engine, error)
+            self.records.append(rec)
+            if self.recorder:
+                self.recorder.record(rec)
+
+    def duration(self, name):
+        """某个阶段成功完成时的耗时，未执行或失败返回 None"""
+        for r in self.records:
+            if r.phase == name and r.outcome == "ok":
+                return r.duration
+        return None
+
+    def total(self):
+        return sum(r.duration for r in self.records)
+
+    def describe(self):
+        """本次运行各阶段耗时的一行摘要"""
+        parts = []
+        for r in self.records:
+            mark = "" if r.outcome == "ok" else "✗"
+            parts.append(f"{PHASE_LABELS.get(r.phase, r.phase)}{mark} {r.duration:.2f}s")
+        return "，".join(parts)
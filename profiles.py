@@ -0,0 +1,244 @@
+"""光猫配置文件（profile）的默认值与读取"""
+import copy
+import json
+import os
+import threading
+
+import network_backend
+import reboot_engine
+import reboot_flow
+
+
+def get_default_config():
+    """获取默认配置"""
+    return {
+        "router_ip": "192.168.1.1",
+        "login_url": "http://{router_ip}/",
+        "start_page_url": "http://{router_ip}/",
+        "manage_url": "http://{router_ip}/",
+        "username": "user",
+        "password": "",
+        "wifi_list": [],
+        "auto_interval": 24,
+        "interval_unit": "时",
+        "schedules": [],  # 定时规则（cron/每天固定时刻/间隔），为空时按 auto_interval 间隔执行，见 scheduler.py
+        "engine": reboot_engine.DEFAULT_ENGINE,
+        "router_model": "zte",  # 内置浏览器流程的光猫型号，见 reboot_flow.py
+        "reboot_flow": [],  # 自定义浏览器流程（步骤列表），为空时使用 router_model 的内置流程
+        "keep_browser": False,
+        "browser_max_age": 3600,
+        "browser_max_uses": 20,
+        "browser_lean": False,  # 精简浏览器模式：不加载图片/样式/字体，DOM 就绪即操作
+        "http_timeout": 10,  # HTTP直连单个请求的超时（秒），可用 fault_injection.py 按实测选择
+        "reuse_session": True,  # HTTP直连登录后保存会话，下次有效时跳过登录
+        "session_max_age": 600,  # 保存的会话超过多久不再尝试（秒）
+        "reboot_timeout": 120,
+        "retry_attempts": 3,  # 重启/连接WiFi失败后最多尝试的次数（含第一次）
+        "retry_base_delay": 5,  # 第一次重试前的等待（秒），之后每次翻倍并加随机抖动
+        "retry_max_delay": 120,  # 重试等待的上限（秒）
+        "breaker_threshold": 3,  # 同一光猫连续重启失败多少次后熔断
+        "breaker_cooldown": 300,  # 熔断后多久再探测光猫（秒）
+        "wifi_timeout": 30,
+        "network_backend": "auto",  # WiFi后端：auto（Windows用netsh，Linux用nmcli）/netsh/nmcli/mock
+        "wifi_scan_ttl": 30,  # WiFi扫描结果的缓存时间（秒）
+        "network_ready_timeout": 30,  # 连接WiFi后等待光猫管理页可达的上限（秒）
+        "confirm_settle_timeout": 3,  # 点击确定后等待确认框关闭的上限（秒）
+        "verify_reboot": True,  # 重启后探测光猫断开并恢复
+        "recovery_down_timeout": 60,  # 指令发出后等待光猫断开的上限（秒），未断开视为重启失败
+        "recovery_up_timeout": 180,  # 光猫断开后等待恢复的上限（秒）
+        "monitor_interval": 5,  # 链路监控采样间隔（秒）
+        "monitor_targets": ["223.5.5.5:53", "114.114.114.114:53"],  # 上游探测目标（host:port）
+        "monitor_latency_ms": 500,  # 窗口内上游延迟中位数超过该值视为异常
+        "monitor_loss": 0.5,  # 窗口内上游目标全部失败（或网关页面失败）的采样比例超过该值视为异常
+        "monitor_window": 120,  # 持续异常多久才触发重启（秒）
+        "monitor_min_gap": 1800,  # 两次触发重启的最小间隔（秒）
+        "prewarm_imports": True,
+        "metrics_port": 0,
+        "fleet_workers": 4,
+        "fleet_timeout": 120
+    }
+
+
+class ProfileError(ValueError):
+    """配置文件无法解析或不符合格式要求"""
+
+    def __init__(self, path, errors):
+        self.path = path
+        self.errors = errors
+        super().__init__(f"{os.path.basename(path)}：" + "；".join(errors))
+
+
+# 取值受限的键
+CHOICES = {
+    "engine": reboot_engine.ENGINE_CHOICES,
+    "router_model": reboot_flow.MODEL_CHOICES,
+    "interval_unit": ["秒", "分", "时"],
+    "network_backend": network_backend.BACKEND_CHOICES,
+}
+# 必须为正数的键
+POSITIVE = {"auto_interval", "browser_max_age", "browser_max_uses", "session_max_age", "http_timeout",
+            "reboot_timeout", "retry_attempts", "retry_max_delay", "breaker_threshold", "breaker_cooldown",
+            "wifi_timeout", "network_ready_timeout", "confirm_settle_timeout",
+            "recovery_down_timeout", "recovery_up_timeout", "monitor_interval", "monitor_latency_ms",
+            "monitor_window", "fleet_workers", "fleet_timeout"}
+
+
+def _type_name(value):
+    return {bool: "布尔值", int: "数字", float: "数字", str: "字符串", list: "列表", dict: "对象"}.get(type(value), "")
+
+
+def validate_profile(config):
+    """按默认配置的类型检查配置，返回错误列表（为空表示通过）"""
+    if not isinstance(config, dict):
+        return ["配置文件内容应为JSON对象"]
+    errors = []
+    for key, default in get_default_config().items():
+        if key not in config:
+            continue
+        value = config[key]
+        if isinstance(default, bool):
+            ok = isinstance(value, bool)
+        elif isinstance(default, (int, float)):
+            ok = isinstance(value, (int, float)) and not isinstance(value, bool)
+        else:
+            ok = isinstance(value, type(default))
+        if not ok:
+            errors.append(f"{key} 应为{_type_name(default)}")
+            continue
+        if key in CHOICES and value not in CHOICES[key]:
+            errors.append(f"{key} 应为 {'/'.join(CHOICES[key])} 之一")
+        elif key in POSITIVE and value <= 0:
+            errors.append(f"{key} 应大于0")
+        elif key in ("wifi_list", "monitor_targets") and not all(isinstance(v, str) for v in value):
+            errors.append(f"{key} 中的每一项应为字符串")
+        elif key == "retry_base_delay" and value < 0:
+            errors.append("retry_base_delay 不能为负数")
+        elif key == "monitor_loss" and not 0 < value <= 1:
+            errors.append("monitor_loss 应在0到1之间")
+        elif key == "metrics_port" and not 0 <= value <= 65535:
+            errors.append("metrics_port 应在0到65535之间")
+    if config.get("reboot_flow") and isinstance(config["reboot_flow"], list):
+        try:
+            reboot_flow.compile_flow(config["reboot_flow"])
+        except reboot_flow.FlowError as e:
+            errors.append(f"reboot_flow {str(e)}")
+    if isinstance(config.get("schedules"), list):
+        import scheduler
+
+        for i, item in enumerate(config["schedules"]):
+            try:
+                if not isinstance(item, dict):
+                    raise ValueError("应为对象")
+                scheduler.Job.from_dict(item, i)
+            except (ValueError, TypeError, KeyError) as e:
+                errors.append(f"schedules 第{i + 1}项：{str(e)}")
+    return errors
+
+
+class ProfileRepository:
+    """配置文件仓库：按路径缓存解析并校验过的配置，文件的修改时间或大小变化时才重新读取；
+    目录列表按目录的修改时间缓存"""
+
+    def __init__(self, config_dir=None):
+        self.config_dir = config_dir
+        self._entries = {}  # 绝对路径 -> ((mtime_ns, size), 补全后的配置, 错误列表)
+        self._listing = None  # (目录 mtime_ns, [文件名])
+        self._lock = threading.Lock()
+
+    def _read(self, path):
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[0] == stamp:
+                return entry
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            errors = validate_profile(config)
+        except ValueError as e:
+            config, errors = {}, [f"JSON格式错误：{str(e)}"]
+        if not errors:
+            # 补充缺失的键
+            default = get_default_config()
+            for key in default:
+                if key not in config:
+                    config[key] = default[key]
+        entry = (stamp, config, errors)
+        with self._lock:
+            self._entries[path] = entry
+        return entry
+
+    def load(self, path):
+        """读取配置（返回副本，可随意修改）；不合格时抛出 ProfileError"""
+        _, config, errors = self._read(os.path.abspath(path))
+        if errors:
+            raise ProfileError(path, errors)
+        return copy.deepcopy(config)
+
+    def errors(self, path):
+        """配置文件的格式错误（已缓存的文件不会重新解析）"""
+        try:
+            return self._read(os.path.abspath(path))[2]
+        except OSError as e:
+            return [str(e)]
+
+    def save(self, path, config):
+        """写入配置并更新缓存"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
+        with self._lock:
+            self._entries.pop(os.path.abspath(path), None)
+
+    def list(self):
+        """配置目录中的 .json 文件名（目录未变化时直接返回缓存）"""
+        if not self.config_dir or not os.path.isdir(self.config_dir):
+            return []
+        stamp = os.stat(self.config_dir).st_mtime_ns
+        with self._lock:
+            if self._listing and self._listing[0] == stamp:
+                return list(self._listing[1])
+        names = sorted(entry.name for entry in os.scandir(self.config_dir)
+                       if entry.name.endswith('.json') and entry.is_file())
+        with self._lock:
+            self._listing = (stamp, names)
+            # 已删除文件的缓存一并清理
+            paths = {os.path.abspath(os.path.join(self.config_dir, name)) for name in names}
+            for path in [p for p in self._entries if os.path.dirname(p) == os.path.abspath(self.config_dir)]:
+                if path not in paths:
+                    del self._entries[path]
+        return list(names)
+
+    def check(self):
+        """校验目录中的所有配置，返回 {文件名: 错误列表}（只含有错误的文件）"""
+        result = {}
+        for name in self.list():
+            errors = self.errors(os.path.join(self.config_dir, name))
+            if errors:
+                result[name] = errors
+        return result
+
+
+# 未指定目录的共享缓存，供 load_profile 使用
+_repository = ProfileRepository()
+
+
+def load_profile(file_path):
+    """读取配置文件并补充缺失的键（未修改的文件直接取缓存）；不合格时抛出 ProfileError"""
+    return _repository.load(file_path)
+
+
+def convert_to_seconds(value, unit):
+    """将时间值转换为秒"""
+    if unit == "秒":
+        return value
+    elif unit == "分":
+        return value * 60
+    elif unit == "时":
+        return value * 3600
+    return value * 3600  # 默认小时
+
+
+def profile_name(file_path):
+    """配置文件名（不含扩展名），用于日志和结果表"""
+    return os.path.splitext(os.path.basename(file_path))[0]
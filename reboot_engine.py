@@ -0,0 +1,606 @@
+"""光猫重启引擎：Selenium 模拟用户操作 与 直接 HTTP 请求 两种实现"""
+import os
+import socket
+import sys
+import threading
+import types
+import http.client
+from http.cookies import SimpleCookie
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit, urlencode
+
+import reboot_flow
+import session_store
+from cancel_token import CancelToken, OperationCancelled
+from phase_timer import PhaseTimer
+
+# 可选的重启引擎：http 失败时自动回退到 selenium
+ENGINE_CHOICES = ["http", "selenium"]
+DEFAULT_ENGINE = "http"
+
+# 中兴光猫重启页点击“确定”时由脚本写入的表单字段
+REBOOT_ACTION_FIELD = "IF_ACTION"
+REBOOT_ACTION_VALUE = "devrestart"
+
+
+_selenium = None
+_selenium_lock = threading.Lock()
+
+
+def load_selenium():
+    """按需导入selenium（导入耗时较长，只在第一次用到浏览器时加载）"""
+    global _selenium
+    if _selenium is None:
+        with _selenium_lock:
+            if _selenium is None:
+                from selenium import webdriver
+                from selenium.webdriver.common.by import By
+                from selenium.webdriver.support.ui import WebDriverWait
+                from selenium.webdriver.support import expected_conditions as EC
+                from selenium.webdriver.chrome.service import Service
+                from selenium.common.exceptions import TimeoutException
+                _selenium = types.SimpleNamespace(webdriver=webdriver, By=By, WebDriverWait=WebDriverWait,
+                                                  EC=EC, Service=Service, TimeoutException=TimeoutException)
+    return _selenium
+
+
+def prewarm():
+    """在后台线程中预先导入selenium，返回是否成功"""
+    try:
+        load_selenium()
+        return True
+    except ImportError:
+        return False
+
+
+class RebootError(Exception):
+    """重启流程中的可预期错误（页面元素缺失、登录失败等）"""
+
+
+class PermanentError(RebootError):
+    """重试也不会成功的错误（密码错误、配置冲突等），不再重试"""
+
+
+class LoginError(PermanentError):
+    """登录被光猫拒绝（用户名或密码错误）"""
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+def resolve_urls(config):
+    """替换配置中URL的 {router_ip} 占位符"""
+    router_ip = config["router_ip"]
+    return {
+        "router_ip": router_ip,
+        "login_url": config["login_url"].format(router_ip=router_ip),
+        "start_page_url": config["start_page_url"].format(router_ip=router_ip),
+        "manage_url": config["manage_url"].format(router_ip=router_ip),
+    }
+
+
+def get_chromedriver_path():
+    """获取chromedriver路径（兼容打包后的exe）"""
+    if getattr(sys, 'frozen', False):
+        return os.path.join(sys._MEIPASS, "chromedriver.exe")
+    return os.path.join(os.path.dirname(__file__), "chromedriver.exe")
+
+
+# 精简模式下屏蔽的静态资源（图片、样式表、字体），光猫管理页的按钮和表单不依赖它们
+LEAN_BLOCKED_URLS = ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.bmp", "*.ico", "*.svg", "*.webp",
+                     "*.css", "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"]
+LEAN_ARGUMENTS = ["--window-size=800,600", "--disable-extensions", "--disable-gpu",
+                  "--disable-background-networking", "--disable-component-update", "--disable-default-apps",
+                  "--disable-sync", "--no-first-run", "--mute-audio", "--blink-settings=imagesEnabled=false"]
+
+
+def create_chrome_driver(lean=False):
+    """启动一个无头Chrome
+
+    lean 为 True 时使用精简模式：DOM 就绪即返回（eager），屏蔽图片/样式/字体请求，
+    关闭扩展、GPU 和后台网络，窗口尺寸也更小。
+    """
+    sel = load_selenium()
+    chrome_options = sel.webdriver.ChromeOptions()
+    chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--log-level=0")
+    if lean:
+        chrome_options.page_load_strategy = "eager"
+        for argument in LEAN_ARGUMENTS:
+            chrome_options.add_argument(argument)
+        chrome_options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    else:
+        chrome_options.add_argument("--window-size=1920,1080")
+
+    chromedriver_path = get_chromedriver_path()
+    if not os.path.exists(chromedriver_path):
+        raise FileNotFoundError(f"未找到Chrome驱动，请将chromedriver.exe放在以下目录：\n{os.path.dirname(chromedriver_path)}")
+
+    service = sel.Service(executable_path=chromedriver_path)
+    driver = sel.webdriver.Chrome(service=service, options=chrome_options)
+    if lean:
+        # 通过 DevTools 拦截请求，屏蔽规则对该浏览器的整个会话生效（常驻浏览器清理Cookie后仍然有效）
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": LEAN_BLOCKED_URLS})
+        except Exception:
+            driver.quit()
+            raise
+    return driver
+
+
+class SeleniumRebootEngine:
+    """通过无头Chrome模拟用户点击完成登录和重启，操作步骤见 reboot_flow"""
+    name = "selenium"
+    label = "浏览器模拟"
+
+    def __init__(self, config, log=None, progress=None, driver_pool=None, timer=None, cancel=None):
+        self.config = config
+        self.log = log or _noop
+        self.progress = progress or _noop
+        self.driver_pool = driver_pool  # 常驻浏览器池，为空时每次新建浏览器
+        self.timer = timer or PhaseTimer()
+        self.cancel = cancel or CancelToken()
+
+    def run(self):
+        values = resolve_urls(self.config)
+        values.update(username=self.config["username"], password=self.config["password"])
+        steps = reboot_flow.flow_for(self.config)
+        sel = load_selenium()
+        self.timer.engine = self.name
+
+        self.progress(10, "初始化浏览器...")
+        self.cancel.check()
+        driver = None
+        forget = None
+        try:
+            with self.timer.phase("driver_start"):
+                if self.driver_pool:
+                    driver = self.driver_pool.acquire()
+                else:
+                    driver = create_chrome_driver(lean=self.config.get("browser_lean", False))
+            # 取消时立即关闭浏览器，正在阻塞的页面加载或元素等待会随之报错返回
+            forget = self.cancel.on_cancel(driver.quit)
+            self.progress(20, "浏览器已启动")
+
+            runner = reboot_flow.FlowRunner(driver, steps, values, self.timer, self.log, self.progress, self.cancel)
+            try:
+                runner.run(sel)
+            except Exception as e:
+                self.cancel.check()  # 浏览器被取消关闭后的报错按取消处理
+                step = runner.step
+                if (isinstance(e, sel.TimeoutException) and step and step.action == "expect_url"
+                        and step.phase == "login_redirect"):
+                    # 提交登录后没有跳转，多为密码错误，重试也不会成功
+                    raise LoginError(f"登录失败，请检查用户名和密码（{e.msg or '未跳转到默认页面'}）") from e
+                raise
+        finally:
+            if forget:
+                forget()
+            if driver and self.driver_pool:
+                self.driver_pool.release(driver, discard=self.cancel.cancelled)
+                self.log("* 浏览器已归还常驻会话池")
+            else:
+                if driver and not self.cancel.cancelled:
+                    driver.quit()
+                self.log("* 浏览器已关闭")
+
+
+class PageParser(HTMLParser):
+    """提取页面中的元素ID、表单及其字段"""
+
+    def __init__(self):
+        super().__init__()
+        self.elements = {}  # id -> (tag, attrs)
+        self.forms = []
+        self.links = []  # <a> 标签属性，用于查找用户切换按钮
+        self._form = None
+        self._select = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {k: (v or "") for k, v in attrs}
+        if attrs.get("id"):
+            self.elements.setdefault(attrs["id"], (tag, attrs))
+        if tag == "form":
+            self._form = {"attrs": attrs, "inputs": []}
+            self.forms.append(self._form)
+        elif tag in ("input", "button"):
+            attrs.setdefault("type", "submit" if tag == "button" else "text")
+            if self._form is not None:
+                self._form["inputs"].append(attrs)
+        elif tag == "select" and self._form is not None:
+            self._select = {"type": "select", "name": attrs.get("name", ""), "value": None}
+            self._form["inputs"].append(self._select)
+        elif tag == "option" and self._select is not None:
+            if self._select["value"] is None or "selected" in attrs:
+                self._select["value"] = attrs.get("value", "")
+        elif tag == "a":
+            self.links.append(attrs)
+
+    def handle_endtag(self, tag):
+        if tag == "form":
+            self._form = None
+        elif tag == "select":
+            self._select = None
+
+    def has_id(self, element_id):
+        return element_id in self.elements
+
+    def find_form(self, field_id=None, field_name=None):
+        """查找包含指定字段的表单"""
+        for form in self.forms:
+            for field in form["inputs"]:
+                if field_id and field.get("id") == field_id:
+                    return form
+                if field_name and field.get("name") == field_name:
+                    return form
+        return None
+
+
+def form_fields(form):
+    """按浏览器提交规则收集表单的默认字段（不含按钮）"""
+    fields = {}
+    for field in form["inputs"]:
+        name = field.get("name")
+        ftype = field.get("type", "text").lower()
+        if not name or ftype in ("submit", "button", "image", "reset", "file"):
+            continue
+        if ftype in ("checkbox", "radio") and "checked" not in field:
+            continue
+        fields[name] = field.get("value") or ""
+    return fields
+
+
+class HttpResponse:
+    def __init__(self, status, url, headers, text):
+        self.status = status
+        self.url = url
+        self.headers = headers
+        self.text = text
+
+    def parse(self):
+        parser = PageParser()
+        parser.feed(self.text)
+        parser.close()
+        return parser
+
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+def encode_form(fields):
+    return urlencode(fields).encode("utf-8") if fields is not None else None
+
+
+def request_target(url):
+    """URL 中发送给服务器的路径部分"""
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    return path
+
+
+def request_headers(cookies, body):
+    headers = {"Connection": "keep-alive", "User-Agent": "Mozilla/5.0"}
+    if cookies:
+        headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in cookies.items())
+    if body is not None:
+        headers["Content-Type"] = "application/x-www-form-urlencoded"
+    return headers
+
+
+def store_cookies(cookies, headers):
+    """保存响应中的 Set-Cookie"""
+    for header in headers.get_all("Set-Cookie") or []:
+        cookie = SimpleCookie()
+        cookie.load(header)
+        for name, morsel in cookie.items():
+            cookies[name] = morsel.value
+
+
+def decode_body(headers, data):
+    charset = headers.get_content_charset() or "utf-8"
+    return data.decode(charset, errors="replace")
+
+
+def redirect_request(method, url, resp, body):
+    """需要跟随重定向时返回下一个请求 (method, url, body)，否则返回 None"""
+    if resp.status not in REDIRECT_STATUSES or not resp.headers.get("Location"):
+        return None
+    url = urljoin(url, resp.headers["Location"])
+    if resp.status in (307, 308):
+        return method, url, body
+    return "GET", url, None
+
+
+def form_request(page_url, form, fields):
+    """按表单的 method/action 生成提交请求 (method, url, fields)"""
+    action = urljoin(page_url, form["attrs"].get("action") or page_url)
+    method = (form["attrs"].get("method") or "get").upper()
+    if method == "GET":
+        sep = "&" if "?" in action else "?"
+        return "GET", action + sep + urlencode(fields), None
+    return "POST", action, fields
+
+
+def throw_request_error(steps, error):
+    """把请求失败交给请求序列生成器，让出错的阶段立即记录真实的错误，然后抛出"""
+    try:
+        steps.throw(error)
+    except StopIteration:
+        pass
+    raise error
+
+
+class HttpSession:
+    """基于 http.client 的简易会话：按主机复用长连接，并自动保存 Cookie"""
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+        self.cookies = {}
+        self.aborted = False
+        self._conns = {}
+
+    def _connection(self, scheme, netloc):
+        key = (scheme, netloc)
+        conn = self._conns.get(key)
+        if conn is None:
+            cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            conn = cls(netloc, timeout=self.timeout)
+            self._conns[key] = conn
+        return conn
+
+    def _send(self, method, url, body=None):
+        if self.aborted:
+            raise ConnectionAbortedError("请求已中止")
+        parts = urlsplit(url)
+        path = request_target(url)
+        headers = request_headers(self.cookies, body)
+
+        key = (parts.scheme, parts.netloc)
+        reused = key in self._conns
+        conn = self._connection(parts.scheme, parts.netloc)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # 复用的长连接可能已被对端关闭，重建一次（已中止时不再重建）
+            conn.close()
+            self._conns.pop(key, None)
+            if not reused or self.aborted:
+                raise
+            conn = self._connection(parts.scheme, parts.netloc)
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+
+        data = resp.read()
+        store_cookies(self.cookies, resp.headers)
+        if resp.will_close:
+            conn.close()
+            self._conns.pop(key, None)
+        return HttpResponse(resp.status, url, resp.headers, decode_body(resp.headers, data))
+
+    def request(self, method, url, fields=None, max_redirects=5):
+        """发送请求并跟随重定向，返回最终页面"""
+        body = encode_form(fields)
+        resp = self._send(method, url, body)
+        for _ in range(max_redirects):
+            follow = redirect_request(method, url, resp, body)
+            if follow is None:
+                break
+            method, url, body = follow
+            resp = self._send(method, url, body)
+        return resp
+
+    def abort(self):
+        """从其他线程打断进行中的请求：关闭套接字的读写，阻塞中的读取立即返回"""
+        self.aborted = True
+        for conn in list(self._conns.values()):
+            if conn.sock is not None:
+                try:
+                    conn.sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def close(self):
+        for conn in self._conns.values():
+            conn.close()
+        self._conns.clear()
+
+
+class HttpRebootEngine:
+    """不启动浏览器，直接按页面表单发送登录和重启请求
+
+    login()/reboot() 是请求序列生成器：yield (method, url, fields) 并接收响应，
+    同一套流程既可由同步的 HttpSession 驱动，也可由 orchestrator 中的异步会话驱动。
+    """
+    name = "http"
+    label = "HTTP直连"
+
+    def __init__(self, config, log=None, progress=None, timeout=None, driver_pool=None, timer=None, cancel=None):
+        self.config = config
+        self.log = log or _noop
+        self.progress = progress or _noop
+        self.timeout = timeout or config.get("http_timeout", 10)  # 单个请求的超时（秒）
+        self.timer = timer or PhaseTimer()
+        self.cancel = cancel or CancelToken()
+        self.session = HttpSession(timeout=self.timeout)
+        # 保存登录会话，下次运行有效时跳过登录
+        self.sessions = session_store.STORE if config.get("reuse_session") else None
+
+    def login(self, urls):
+        username = self.config["username"]
+        login_url = urls["login_url"]
+        phase = self.timer.phase
+
+        self.log(f"已打开光猫登录页：{login_url}")
+        with phase("login_page"):
+            resp = yield "GET", login_url, None
+            page = resp.parse()
+            self.progress(30, "加载登录页面...")
+
+            if not page.has_id("role_user"):
+                raise RebootError("登录页加载失败，未找到用户切换容器")
+
+        with phase("switch_user"):
+            if not any(a.get("class") == "user" and "goPage('user')" in a.get("onclick", "") for a in page.links):
+                raise RebootError("未找到普通用户切换按钮")
+
+            form = page.find_form(field_name="skypsd")
+            if form is None:
+                raise RebootError("未找到密码输入框")
+            fields = form_fields(form)
+            # goPage('user') 在页面上做的就是把用户名字段切换为普通用户
+            for name in fields:
+                if name.lower() == "username":
+                    fields[name] = username
+        self.log(f"已切换到普通用户：{username}")
+        self.progress(40, "已切换用户类型")
+
+        with phase("password"):
+            fields["skypsd"] = self.config["password"]
+        self.log("已填写密码")
+        self.progress(50, "已输入密码")
+
+        with phase("login_redirect"):
+            submit = next((f for f in form["inputs"]
+                           if f.get("type", "").lower() == "submit" or f.get("value") == "登录"), None)
+            if submit is None:
+                raise RebootError("未找到登录按钮")
+            if submit.get("name"):
+                fields[submit["name"]] = submit.get("value", "")
+
+            resp = yield form_request(resp.url, form, fields)
+            self.log("已提交登录请求")
+            self.progress(60, "登录中...")
+
+            if urls["start_page_url"] not in resp.url:
+                raise LoginError("登录失败，未跳转到默认页面，请检查用户名和密码")
+        self.log(f"登录成功，当前页面：{resp.url}")
+        if self.sessions is not None:
+            try:
+                self.sessions.put(self.config, self.session.cookies)
+            except OSError as e:
+                self.log(f"⚠️ 保存登录会话失败：{str(e)}")
+
+    def reboot(self, urls, resp=None):
+        """resp 为已取得的重启页响应（复用会话时）"""
+        manage_url = urls["manage_url"]
+        phase = self.timer.phase
+
+        with phase("manage_page"):
+            if resp is None:
+                resp = yield "GET", manage_url, None
+            page = resp.parse()
+            self.log(f"已进入重启页面：{manage_url}")
+            self.progress(70, "进入重启管理页面")
+
+            form = page.find_form(field_id="Submit1")
+            if form is None:
+                raise RebootError("重启页面加载失败，未找到重启按钮")
+
+        with phase("reboot_click"):
+            if not page.has_id("msgconfirmb"):
+                raise RebootError("未找到重启确认按钮")
+            fields = form_fields(form)
+            if not fields.get(REBOOT_ACTION_FIELD):
+                fields[REBOOT_ACTION_FIELD] = REBOOT_ACTION_VALUE
+        self.progress(80, "已点击重启按钮")
+
+        with phase("confirm"):
+            resp = yield form_request(resp.url, form, fields)
+            if resp.status >= 400:
+                raise RebootError(f"重启请求被拒绝，HTTP状态码 {resp.status}")
+        if self.sessions is not None:
+            # 光猫重启后所有会话都会失效，保存的 Cookie 下次已无法使用（见 session_store 的说明）
+            self.sessions.drop(self.config)
+        self.log("已提交重启请求，重启指令已提交")
+        self.progress(90, "确认重启指令")
+
+    def resume(self, urls):
+        """用保存的 Cookie 打开重启页，会话仍有效时返回该响应，否则返回 None"""
+        cookies = self.sessions.get(self.config, self.config.get("session_max_age", 600))
+        if not cookies:
+            return None
+        self.session.cookies.update(cookies)
+        with self.timer.phase("session_check"):
+            resp = yield "GET", urls["manage_url"], None
+            valid = resp.status == 200 and resp.parse().find_form(field_id="Submit1") is not None
+        if valid:
+            self.log("已复用保存的登录会话，跳过登录")
+            self.progress(60, "已复用登录会话")
+            return resp
+        self.log("保存的登录会话已失效，重新登录")
+        self.session.cookies.clear()
+        self.sessions.drop(self.config)
+        return None
+
+    def flow(self):
+        """完整的登录+重启请求序列；保存的会话有效时跳过登录"""
+        urls = resolve_urls(self.config)
+        self.timer.engine = self.name
+        self.progress(20, "HTTP直连模式")
+        resp = None
+        if self.sessions is not None:
+            resp = yield from self.resume(urls)
+        if resp is None:
+            yield from self.login(urls)
+        yield from self.reboot(urls, resp)
+
+    def run(self):
+        flow = self.flow()
+        # 取消时中止连接，阻塞中的请求随之返回；每个请求之前检查是否已取消
+        forget = self.cancel.on_cancel(self.session.abort)
+        try:
+            request = next(flow)
+            while True:
+                self.cancel.check()
+                try:
+                    response = self.session.request(*request)
+                except (OSError, http.client.HTTPException) as e:
+                    try:
+                        self.cancel.check()  # 因取消而中断时按取消处理
+                    except OperationCancelled as cancelled:
+                        throw_request_error(flow, cancelled)
+                    throw_request_error(flow, e)
+                request = flow.send(response)
+        except StopIteration:
+            pass
+        finally:
+            forget()
+            self.session.close()
+
+
+ENGINE_CLASSES = {
+    "http": HttpRebootEngine,
+    "selenium": SeleniumRebootEngine,
+}
+
+
+def engine_order(config):
+    """依次尝试的引擎：HTTP直连只实现了中兴光猫的内置流程，自定义流程或其他型号只用浏览器模拟"""
+    if (config.get("engine", DEFAULT_ENGINE) == "http" and not config.get("reboot_flow")
+            and config.get("router_model", "zte") == "zte"):
+        return ["http", "selenium"]
+    return ["selenium"]
+
+
+def run_reboot(config, log=None, progress=None, driver_pool=None, timer=None, cancel=None):
+    """按配置的引擎执行重启，HTTP直连失败时回退到浏览器模拟，返回实际使用的引擎名"""
+    log = log or _noop
+    order = engine_order(config)
+
+    for i, name in enumerate(order):
+        cls = ENGINE_CLASSES[name]
+        try:
+            cls(config, log=log, progress=progress, driver_pool=driver_pool, timer=timer, cancel=cancel).run()
+            return name
+        except OperationCancelled:
+            raise
+        except Exception as e:
+            if i == len(order) - 1:
+                raise
+            fallback = ENGINE_CLASSES[order[i + 1]]
+            log(f"⚠️ {cls.label}失败：{str(e)}，改用{fallback.label}重试")
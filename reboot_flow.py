@@ -0,0 +1,265 @@
+"""浏览器重启流程的声明式定义与执行
+
+流程是按顺序执行的步骤列表，每一步是一个对象：
+    {"phase": "login_page", "action": "navigate", "url": "{login_url}"}
+    {"phase": "login_page", "action": "wait", "locator": "id:role_user", "timeout": 10}
+    {"phase": "password", "action": "type", "locator": "name:skypsd", "text": "{password}"}
+
+action：navigate（打开 url）、wait（等待元素，until 为 present/visible/clickable/invisible/gone）、
+click（等待可点击后点击，js 为 true 时用脚本点击）、type（输入 text）、expect_url（等待地址包含 contains）。
+locator 写作 "策略:值"，策略为 id/name/xpath/css/link；url、text、contains、log 中可使用
+{router_ip} {login_url} {start_page_url} {manage_url} {username} {password} 占位符。
+每一步有自己的 timeout（秒）；相邻且 phase 相同的步骤合并计时为一个阶段。
+optional 为 true 的 wait 超时只记录警告；log/status/progress 控制日志和进度显示。
+执行时每一步之前和等待元素的每次轮询中都会检查取消令牌，取消后不必等到超时。
+
+配置中 reboot_flow 为空时使用 router_model 对应的内置流程。流程在加载时编译一次（校验字段、解析定位方式），
+执行时不再解析。
+"""
+import json
+
+from cancel_token import CancelToken
+
+# 定位策略 -> selenium By 的取值（与 By.ID 等常量相同，编译时无需导入 selenium）
+LOCATOR_STRATEGIES = {"id": "id", "name": "name", "xpath": "xpath", "css": "css selector", "link": "link text"}
+ACTIONS = ("navigate", "wait", "click", "type", "expect_url")
+WAIT_CONDITIONS = ("present", "visible", "clickable", "invisible", "gone")
+DEFAULT_TIMEOUT = 10
+PLACEHOLDERS = ("router_ip", "login_url", "start_page_url", "manage_url", "username", "password", "current_url")
+TEMPLATE_KEYS = ("url", "text", "contains", "message", "log", "status")
+
+
+class FlowError(ValueError):
+    """流程定义有误"""
+
+
+def zte_flow(settle_timeout=3):
+    """中兴光猫（ZXHN 系列）：切换普通用户登录后在设备管理页点击重启并确认"""
+    return [
+        {"phase": "login_page", "action": "navigate", "url": "{login_url}",
+         "log": "已打开光猫登录页：{login_url}", "progress": 30, "status": "加载登录页面..."},
+        {"phase": "login_page", "action": "wait", "locator": "id:role_user",
+         "message": "登录页加载失败，未找到用户切换容器"},
+        {"phase": "switch_user", "action": "click", "js": True,
+         "locator": "xpath://td[@id='role_user']/a[@class='user' and @onclick=\"goPage('user');\"]",
+         "message": "未找到普通用户切换按钮", "log": "已切换到普通用户：{username}",
+         "progress": 40, "status": "已切换用户类型"},
+        {"phase": "password", "action": "type", "locator": "name:skypsd", "text": "{password}",
+         "message": "未找到密码输入框", "log": "已填写密码", "progress": 50, "status": "已输入密码"},
+        {"phase": "login_redirect", "action": "click", "locator": "xpath://input[@type='submit' or @value='登录']",
+         "message": "未找到登录按钮", "log": "已提交登录请求", "progress": 60, "status": "登录中..."},
+        {"phase": "login_redirect", "action": "expect_url", "contains": "{start_page_url}", "timeout": 15,
+         "message": "登录失败，未跳转到默认页面", "log": "登录成功，当前页面：{current_url}"},
+        {"phase": "manage_page", "action": "navigate", "url": "{manage_url}",
+         "log": "已进入重启页面：{manage_url}", "progress": 70, "status": "进入重启管理页面"},
+        {"phase": "manage_page", "action": "wait", "locator": "id:Submit1",
+         "message": "重启页面加载失败，未找到重启按钮"},
+        {"phase": "reboot_click", "action": "click", "locator": "id:Submit1", "js": True, "until": "present",
+         "log": "已点击【设备重启】按钮", "progress": 80, "status": "已点击重启按钮"},
+        {"phase": "confirm", "action": "click", "locator": "id:msgconfirmb", "message": "未找到重启确认按钮",
+         "log": "已点击【确定】按钮，重启指令已提交", "progress": 90, "status": "确认重启指令"},
+        # 等待确认框关闭或表单提交导致页面刷新，而不是固定等待
+        {"phase": "confirm", "action": "wait", "locator": "id:msgconfirmb", "until": "gone",
+         "timeout": settle_timeout, "poll": 0.1, "optional": True, "message": "确认框未在预期时间内关闭，继续"},
+    ]
+
+
+# 内置流程：router_model -> 生成流程的函数（参数为确认后等待的上限）
+FLOWS = {"zte": zte_flow}
+MODEL_CHOICES = list(FLOWS)
+
+
+def parse_locator(text):
+    """"id:Submit1" -> ("id", "Submit1")"""
+    if not isinstance(text, str):
+        raise FlowError("locator 应为字符串")
+    strategy, sep, value = text.partition(":")
+    if not sep or strategy not in LOCATOR_STRATEGIES or not value:
+        raise FlowError(f"定位方式应为 {'/'.join(LOCATOR_STRATEGIES)}:值 的形式：{text}")
+    return LOCATOR_STRATEGIES[strategy], value
+
+
+class FlowStep:
+    """编译后的一个步骤"""
+
+    def __init__(self, data):
+        if not isinstance(data, dict):
+            raise FlowError("应为对象")
+        self.action = data.get("action")
+        if self.action not in ACTIONS:
+            raise FlowError(f"action 应为 {'/'.join(ACTIONS)} 之一")
+        self.phase = data.get("phase") or self.action
+        self.timeout = data.get("timeout", DEFAULT_TIMEOUT)
+        self.poll = data.get("poll", 0.5)
+        for key in ("timeout", "poll"):
+            value = getattr(self, key)
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+                raise FlowError(f"{key} 应为正数")
+        self.optional = bool(data.get("optional", False))
+        self.js = bool(data.get("js", False))
+        self.clear = bool(data.get("clear", True))
+        self.message = data.get("message", "")
+        self.log = data.get("log", "")
+        self.status = data.get("status", "")
+        self.progress = data.get("progress")
+
+        self.locator = parse_locator(data["locator"]) if data.get("locator") else None
+        self.until = data.get("until", "clickable" if self.action == "click" else "present")
+        if self.until not in WAIT_CONDITIONS:
+            raise FlowError(f"until 应为 {'/'.join(WAIT_CONDITIONS)} 之一")
+        if self.action in ("wait", "click", "type") and not self.locator:
+            raise FlowError(f"{self.action} 步骤需要 locator")
+        self.url = data.get("url", "")
+        if self.action == "navigate" and not self.url:
+            raise FlowError("navigate 步骤需要 url")
+        self.text = data.get("text", "")
+        self.contains = data.get("contains", "")
+        if self.action == "expect_url" and not self.contains:
+            raise FlowError("expect_url 步骤需要 contains")
+        if self.progress is not None and (isinstance(self.progress, bool)
+                                          or not isinstance(self.progress, (int, float))):
+            raise FlowError("progress 应为数字")
+        dummy = dict.fromkeys(PLACEHOLDERS, "")
+        for key in TEMPLATE_KEYS:
+            if not isinstance(getattr(self, key), str):
+                raise FlowError(f"{key} 应为字符串")
+            try:
+                getattr(self, key).format(**dummy)
+            except (KeyError, IndexError, ValueError) as e:
+                raise FlowError(f"{key} 中的占位符无效：{str(e)}")
+        self.message = self.message or self.default_message()
+
+    def default_message(self):
+        if self.action == "navigate":
+            return f"打开页面失败：{self.url}"
+        if self.action == "expect_url":
+            return f"页面地址未跳转到 {self.contains}"
+        # 定位值中的花括号不是占位符
+        value = self.locator[1].replace("{", "{{").replace("}", "}}")
+        return f"等待元素超时：{self.locator[0]}={value}"
+
+
+def compile_flow(steps):
+    """校验并编译流程，返回 [FlowStep]；有误时抛出 FlowError（指明第几步）"""
+    if not isinstance(steps, list) or not steps:
+        raise FlowError("流程应为非空的步骤列表")
+    compiled = []
+    for i, data in enumerate(steps):
+        try:
+            compiled.append(FlowStep(data))
+        except (FlowError, TypeError) as e:
+            raise FlowError(f"第{i + 1}步：{str(e)}")
+    return compiled
+
+
+_compiled = {}  # 编译结果缓存：流程的 JSON 文本 -> [FlowStep]
+MAX_COMPILED = 32
+
+
+def flow_for(config):
+    """配置对应的已编译流程：reboot_flow 非空时使用它，否则使用 router_model 的内置流程"""
+    steps = config.get("reboot_flow")
+    if not steps:
+        model = config.get("router_model", "zte")
+        if model not in FLOWS:
+            raise FlowError(f"未知的光猫型号：{model}")
+        steps = FLOWS[model](config.get("confirm_settle_timeout", 3))
+    key = json.dumps(steps, ensure_ascii=False, sort_keys=True)
+    compiled = _compiled.get(key)
+    if compiled is None:
+        compiled = compile_flow(steps)
+        if len(_compiled) >= MAX_COMPILED:
+            _compiled.clear()
+        _compiled[key] = compiled
+    return compiled
+
+
+class FlowRunner:
+    """在一个已打开的浏览器上按顺序执行流程，每个阶段通过 timer 计时"""
+
+    def __init__(self, driver, steps, values, timer, log, progress, cancel=None):
+        self.driver = driver
+        self.steps = steps
+        self.values = values  # 占位符的取值
+        self.timer = timer
+        self.log = log
+        self.progress = progress
+        self.cancel = cancel or CancelToken()
+        self.last_element = None  # 最近一次点击/输入的元素，until=gone 时等待它失效
+        self.step = None  # 正在执行的步骤，出错时据此判断失败发生在哪一步
+
+    def run(self, sel):
+        group = []
+        for step in self.steps:
+            if group and step.phase != group[0].phase:
+                self.run_phase(sel, group)
+                group = []
+            group.append(step)
+        if group:
+            self.run_phase(sel, group)
+
+    def run_phase(self, sel, steps):
+        with self.timer.phase(steps[0].phase):
+            for step in steps:
+                self.cancel.check()
+                self.step = step
+                self.run_step(sel, step)
+
+    def format(self, template):
+        if "{current_url}" in template:
+            return template.format(current_url=self.driver.current_url, **self.values)
+        return template.format(**self.values)
+
+    def condition(self, sel, step):
+        EC = sel.EC
+        if step.until == "gone":
+            if self.last_element is not None:
+                return EC.any_of(EC.staleness_of(self.last_element), EC.invisibility_of_element_located(step.locator))
+            return EC.invisibility_of_element_located(step.locator)
+        return {
+            "present": EC.presence_of_element_located,
+            "visible": EC.visibility_of_element_located,
+            "clickable": EC.element_to_be_clickable,
+            "invisible": EC.invisibility_of_element_located,
+        }[step.until](step.locator)
+
+    def wait(self, sel, step, condition):
+        def check(driver):
+            self.cancel.check()  # 每次轮询都检查，取消后最多再等一个轮询间隔
+            return condition(driver)
+
+        return sel.WebDriverWait(self.driver, step.timeout, poll_frequency=step.poll).until(
+            check, message=self.format(step.message))
+
+    def run_step(self, sel, step):
+        driver = self.driver
+        if step.action == "navigate":
+            driver.set_page_load_timeout(step.timeout)
+            driver.get(self.format(step.url))
+        elif step.action == "wait":
+            try:
+                self.wait(sel, step, self.condition(sel, step))
+            except sel.TimeoutException:
+                if not step.optional:
+                    raise
+                self.log(f"⚠️ {self.format(step.message)}")
+        elif step.action == "click":
+            element = self.wait(sel, step, self.condition(sel, step))
+            if step.js:
+                driver.execute_script("arguments[0].click();", element)
+            else:
+                element.click()
+            self.last_element = element
+        elif step.action == "type":
+            element = self.wait(sel, step, self.condition(sel, step))
+            if step.clear:
+                element.clear()
+            element.send_keys(self.format(step.text))
+            self.last_element = element
+        elif step.action == "expect_url":
+            self.wait(sel, step, sel.EC.url_contains(self.format(step.contains)))
+
+        if step.log:
+            self.log(self.format(step.log))
+        if step.progress is not None:
+            self.progress(step.progress, self.format(step.status or step.log))
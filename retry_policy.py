@@ -0,0 +1,78 @@
+"""重试与熔断：失败后按指数退避（带随机抖动）重试；同一台光猫连续失败达到阈值后熔断，
+冷却期内直接拒绝，冷却结束后先做一次廉价的可达性探测，通过了才放行一次试探"""
+import random
+import time
+from datetime import datetime
+
+from reboot_engine import PermanentError, RebootError
+from reboot_flow import FlowError
+
+# 重试也不会成功的错误：密码错误和作业冲突（PermanentError）、缺少浏览器驱动或selenium、流程定义有误
+NON_RETRYABLE = (PermanentError, FileNotFoundError, ImportError, FlowError)
+
+
+class RetryPolicy:
+    """最多尝试 attempts 次，第 n 次重试前等待 min(max_delay, base * factor^(n-1))，再乘以 [1-jitter, 1] 的随机系数"""
+
+    def __init__(self, attempts=3, base_delay=5, max_delay=120, factor=2, jitter=0.5):
+        self.attempts = max(1, int(attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.jitter = jitter
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.get("retry_attempts", 3), config.get("retry_base_delay", 5),
+                   config.get("retry_max_delay", 120))
+
+    @staticmethod
+    def retryable(error):
+        """error 是否值得重试（确定性的失败直接放弃）"""
+        return not isinstance(error, NON_RETRYABLE)
+
+    def delay(self, retry):
+        """第 retry 次重试（从1开始）前的等待秒数"""
+        delay = min(self.max_delay, self.base_delay * self.factor ** (retry - 1))
+        return delay * random.uniform(1 - self.jitter, 1)
+
+
+class CircuitOpenError(RebootError):
+    """熔断中，本次不再尝试"""
+
+
+class CircuitBreaker:
+    """单台光猫的熔断器：closed（正常）-> open（熔断）-> half_open（探测通过，放行一次试探）"""
+
+    def __init__(self, threshold=3, cooldown=300):
+        self.threshold = threshold  # 连续失败多少次后熔断
+        self.cooldown = cooldown  # 熔断后多久再探测（秒）
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None  # time.monotonic()
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.threshold:
+            self.trip()
+
+    def trip(self):
+        self.state = "open"
+        self.opened_at = time.monotonic()
+
+    def remaining(self):
+        """熔断剩余的冷却秒数，未熔断时为0"""
+        if self.state != "open":
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def half_open(self):
+        self.state = "half_open"
+
+    def describe_retry_at(self):
+        return datetime.fromtimestamp(time.time() + self.remaining()).strftime("%H:%M:%S")
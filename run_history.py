@@ -0,0 +1,296 @@
+"""运行历史：每次重启/WiFi连接追加一条记录（SQLite，按配置和时间建索引），
+旧记录按天压缩为汇总行，库文件大小与运行年限基本无关
+
+写入和压缩都在专用的写入线程中进行：record() 只把记录放入队列，编排器的事件循环不会因
+提交或 VACUUM 而停顿。压缩在启动时和之后每天执行一次。
+
+    python run_history.py [--profile 联通]
+"""
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+from phase_timer import percentile
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "history.db")
+KEEP_DAYS = 35  # 保留逐条记录的天数，更早的记录压缩为每日汇总
+COMPACT_INTERVAL = 86400  # 两次压缩的间隔（秒）
+WINDOWS = [("近1天", 86400), ("近7天", 7 * 86400), ("近30天", 30 * 86400), ("全部", None)]
+
+# 汇总行的耗时直方图桶上限（秒），压缩后的百分位数按桶估算
+BUCKETS = (0.5, 1, 2, 3, 5, 7.5, 10, 15, 20, 30, 45, 60, 90, 120, 180, 240, 300, 600, float("inf"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    profile TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    started REAL NOT NULL,
+    duration REAL NOT NULL,
+    ok INTEGER NOT NULL,
+    engine TEXT NOT NULL DEFAULT '',
+    error TEXT NOT NULL DEFAULT '',
+    steps TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS runs_profile_started ON runs (profile, kind, started);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started);
+CREATE TABLE IF NOT EXISTS rollups (
+    profile TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    day TEXT NOT NULL,
+    day_start REAL NOT NULL,
+    count INTEGER NOT NULL,
+    ok_count INTEGER NOT NULL,
+    total_duration REAL NOT NULL,
+    buckets TEXT NOT NULL,
+    PRIMARY KEY (profile, kind, day)
+);
+CREATE INDEX IF NOT EXISTS rollups_day ON rollups (day_start);
+"""
+
+
+def bucket_index(duration):
+    for i, bound in enumerate(BUCKETS):
+        if duration <= bound:
+            return i
+    return len(BUCKETS) - 1
+
+
+def histogram_percentile(counts, q):
+    """按桶计数估算百分位数（在所在桶内线性插值，最后一个桶按前一个上限计）"""
+    total = sum(counts)
+    if not total:
+        return 0.0
+    rank = q / 100 * total
+    seen = 0
+    for i, n in enumerate(counts):
+        if n and seen + n >= rank:
+            if BUCKETS[i] == float("inf"):
+                return BUCKETS[-2]
+            lower = BUCKETS[i - 1] if i else 0.0
+            return lower + (BUCKETS[i] - lower) * (rank - seen) / n
+        seen += n
+    return BUCKETS[-2]
+
+
+class RunSummary:
+    """一个时间窗口内的统计"""
+
+    def __init__(self, count=0, ok=0, p50=0.0, p95=0.0, approximate=False):
+        self.count = count
+        self.ok = ok
+        self.p50 = p50
+        self.p95 = p95
+        self.approximate = approximate  # 包含压缩后的汇总行时百分位数为估算值
+
+    @property
+    def success_rate(self):
+        return self.ok / self.count if self.count else 0.0
+
+
+class RunHistory:
+    """线程安全的运行历史库：写入由后台线程完成，读取前会等待已提交的写入落库"""
+
+    def __init__(self, path=DEFAULT_PATH, keep_days=KEEP_DAYS):
+        self.path = path
+        self.keep_days = keep_days
+        self._lock = threading.Lock()
+        self._last_compact = 0.0
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._queue = queue.Queue()  # 待写入的记录，None 表示结束
+        self._writer = threading.Thread(target=self._write_loop, daemon=True, name="history-writer")
+        self._writer.start()
+
+    def record(self, kind, profile, started, duration, ok, engine="", error="", steps=None):
+        """追加一条记录（放入写入队列后立即返回）；steps 为 {阶段: 耗时}"""
+        self._queue.put((profile, kind, started, round(duration, 3), int(bool(ok)), engine, error,
+                         json.dumps(steps or {}, ensure_ascii=False, separators=(",", ":"))))
+
+    def flush(self):
+        """等待队列中的记录全部写入"""
+        self._queue.join()
+
+    def _write_loop(self):
+        self._compact_if_due()  # 启动时先压缩一次
+        while True:
+            try:
+                item = self._queue.get(timeout=COMPACT_INTERVAL)
+            except queue.Empty:
+                self._compact_if_due()
+                continue
+            batch = [item]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [row for row in batch if row is not None]
+            try:
+                if rows:
+                    with self._lock:
+                        self._db.executemany(
+                            "INSERT INTO runs (profile, kind, started, duration, ok, engine, error, steps) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                        self._db.commit()
+            except sqlite3.Error:
+                pass  # 历史记录写入失败不影响重启操作本身
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(rows) < len(batch):
+                return
+            self._compact_if_due()
+
+    def _compact_if_due(self):
+        if time.time() - self._last_compact > COMPACT_INTERVAL:
+            try:
+                self.compact()
+            except sqlite3.Error:
+                self._last_compact = time.time()  # 压缩失败（如库被占用）时等下一个周期再试
+
+    def record_timer(self, kind, timer, started, duration, ok, engine="", error=""):
+        """从 PhaseTimer 记录一次运行，各阶段耗时作为 steps"""
+        steps = {r.phase: round(r.duration, 3) for r in timer.records}
+        self.record(kind, timer.config_name, started, duration, ok, engine or timer.engine, error, steps)
+
+    def recent(self, profile=None, kind="reboot", limit=20):
+        """最近的记录（新的在前），返回 dict 列表"""
+        sql = "SELECT profile, kind, started, duration, ok, engine, error, steps FROM runs WHERE kind = ?"
+        args = [kind]
+        if profile is not None:
+            sql += " AND profile = ?"
+            args.append(profile)
+        sql += " ORDER BY started DESC LIMIT ?"
+        args.append(limit)
+        self.flush()
+        with self._lock:
+            rows = self._db.execute(sql, args).fetchall()
+        keys = ("profile", "kind", "started", "duration", "ok", "engine", "error", "steps")
+        result = []
+        for row in rows:
+            item = dict(zip(keys, row))
+            item["ok"] = bool(item["ok"])
+            item["steps"] = json.loads(item["steps"])
+            result.append(item)
+        return result
+
+    def summary(self, profile=None, kind="reboot", since=None):
+        """since（时间戳）之后的运行统计；profile 为 None 时统计所有配置"""
+        where, args = ["kind = ?"], [kind]
+        if profile is not None:
+            where.append("profile = ?")
+            args.append(profile)
+        raw_where, rollup_where = list(where), list(where)
+        raw_args, rollup_args = list(args), list(args)
+        if since is not None:
+            raw_where.append("started >= ?")
+            raw_args.append(since)
+            rollup_where.append("day_start >= ?")
+            rollup_args.append(since - 86400)  # 与窗口起点有重叠的那一天也计入
+        self.flush()
+        with self._lock:
+            rows = self._db.execute(f"SELECT duration, ok FROM runs WHERE {' AND '.join(raw_where)}",
+                                    raw_args).fetchall()
+            rollups = self._db.execute(f"SELECT count, ok_count, buckets FROM rollups "
+                                       f"WHERE {' AND '.join(rollup_where)}", rollup_args).fetchall()
+        durations = sorted(d for d, _ in rows)
+        result = RunSummary(len(rows), sum(ok for _, ok in rows))
+        if not rollups:
+            result.p50, result.p95 = percentile(durations, 50), percentile(durations, 95)
+            return result
+
+        counts = [0] * len(BUCKETS)
+        for d in durations:
+            counts[bucket_index(d)] += 1
+        for count, ok_count, buckets in rollups:
+            result.count += count
+            result.ok += ok_count
+            for i, n in enumerate(json.loads(buckets)):
+                counts[i] += n
+        result.p50, result.p95 = histogram_percentile(counts, 50), histogram_percentile(counts, 95)
+        result.approximate = True
+        return result
+
+    def compact(self, now=None):
+        """把 keep_days 之前的逐条记录合并为每日汇总行，返回压缩的记录数"""
+        now = now or time.time()
+        cutoff = time.mktime(time.localtime(now - self.keep_days * 86400)[:3] + (0, 0, 0, 0, 0, -1))
+        with self._lock:
+            rows = self._db.execute("SELECT profile, kind, started, duration, ok FROM runs WHERE started < ?",
+                                    (cutoff,)).fetchall()
+            days = {}
+            for profile, kind, started, duration, ok in rows:
+                local = time.localtime(started)
+                key = (profile, kind, time.strftime("%Y-%m-%d", local))
+                day = days.get(key)
+                if day is None:
+                    day_start = time.mktime(local[:3] + (0, 0, 0, 0, 0, -1))
+                    day = days[key] = [day_start, 0, 0, 0.0, [0] * len(BUCKETS)]
+                day[1] += 1
+                day[2] += ok
+                day[3] += duration
+                day[4][bucket_index(duration)] += 1
+            for (profile, kind, day_name), (day_start, count, ok_count, total, counts) in days.items():
+                existing = self._db.execute("SELECT count, ok_count, total_duration, buckets FROM rollups "
+                                            "WHERE profile = ? AND kind = ? AND day = ?",
+                                            (profile, kind, day_name)).fetchone()
+                if existing:
+                    count += existing[0]
+                    ok_count += existing[1]
+                    total += existing[2]
+                    counts = [a + b for a, b in zip(counts, json.loads(existing[3]))]
+                self._db.execute("INSERT OR REPLACE INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                 (profile, kind, day_name, day_start, count, ok_count, total, json.dumps(counts)))
+            self._db.execute("DELETE FROM runs WHERE started < ?", (cutoff,))
+            self._db.commit()
+            self._last_compact = now
+        if rows:
+            with self._lock:
+                self._db.execute("VACUUM")
+        return len(rows)
+
+    def format_summary(self, profile=None, kind="reboot"):
+        """各时间窗口的成功率和 p50/p95 耗时表"""
+        now = time.time()
+        lines = [f"{'范围':<8}{'次数':>6}{'成功率':>9}{'p50':>10}{'p95':>10}"]
+        for label, seconds in WINDOWS:
+            s = self.summary(profile, kind, None if seconds is None else now - seconds)
+            mark = "≈" if s.approximate else ""
+            lines.append(f"{label:<8}{s.count:>6}{s.success_rate:>9.1%}{mark:>3}{s.p50:>6.1f}s{mark:>3}{s.p95:>6.1f}s")
+        return "\n".join(lines)
+
+    def close(self):
+        """写完队列中的记录后关闭"""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        with self._lock:
+            self._db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="查看运行历史统计")
+    parser.add_argument("--db", default=DEFAULT_PATH, help="历史库路径")
+    parser.add_argument("--profile", help="配置名称（不指定则统计全部）")
+    parser.add_argument("--kind", choices=["reboot", "wifi"], default="reboot")
+    parser.add_argument("--compact", action="store_true", help="立即压缩旧记录")
+    args = parser.parse_args(argv)
+
+    history = RunHistory(args.db)
+    if args.compact:
+        print(f"已压缩 {history.compact()} 条旧记录")
+    print(history.format_summary(args.profile, args.kind))
+    history.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,334 @@
+"""定时任务调度：按堆排序的多任务调度器
+
+每个任务由触发规则算出“计划时间”，下一次总是从上一次的计划时间往后推，与任务执行耗时无关，
+因此不会累积漂移。空闲时线程阻塞在 Event.wait 上（最长30秒醒一次核对墙上时钟，
+以便识别系统休眠），几乎不占CPU。
+
+配置文件中的 schedules 示例：
+    [{"name": "每日凌晨", "at": "04:00", "jitter": 300},
+     {"name": "工作日中午", "cron": "30 12 * * 1-5", "action": "reboot", "missed": "skip"},
+     {"name": "每6小时", "every": 6, "unit": "时"}]
+"""
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+import profiles
+
+ACTIONS = {"wifi_reboot": "连接WiFi后重启", "reboot": "重启", "wifi": "连接WiFi"}
+MISSED_POLICIES = {"run_once": "补执行一次", "skip": "跳过"}
+MAX_SLEEP = 30  # 空闲时最长等待多久再核对一次时钟（秒）
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def format_time(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class IntervalTrigger:
+    """固定间隔：计划时间为 anchor + k * seconds"""
+
+    def __init__(self, seconds, anchor=None):
+        if seconds <= 0:
+            raise ValueError("执行间隔必须大于0")
+        self.seconds = seconds
+        self.anchor = anchor  # 为 None 时由调度器在添加任务时绑定
+
+    def next_after(self, ts):
+        if ts < self.anchor:
+            return self.anchor
+        return self.anchor + (int((ts - self.anchor) // self.seconds) + 1) * self.seconds
+
+    def describe(self):
+        return f"每{self.seconds:g}秒"
+
+
+def _parse_cron_field(text, low, high):
+    values = set()
+    for part in text.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError(f"cron 步长无效：{text}")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(x) for x in part.split("-", 1))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"cron 字段超出范围 {low}-{high}：{text}")
+        values.update(range(start, end + 1, step))
+    return sorted(values)
+
+
+class CronTrigger:
+    """五段式 cron 表达式：分 时 日 月 周（周日为0或7），支持 * , - /"""
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron 表达式应为5段（分 时 日 月 周）：{expression}")
+        self.expression = expression
+        self.minutes = _parse_cron_field(fields[0], 0, 59)
+        self.hours = _parse_cron_field(fields[1], 0, 23)
+        self.days = set(_parse_cron_field(fields[2], 1, 31))
+        self.months = set(_parse_cron_field(fields[3], 1, 12))
+        self.weekdays = {d % 7 for d in _parse_cron_field(fields[4], 0, 7)}
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, day):
+        if day.month not in self.months:
+            return False
+        in_days = day.day in self.days
+        in_weekdays = (day.weekday() + 1) % 7 in self.weekdays
+        # 与标准 cron 一致：日和周都有限定时，满足其一即可
+        if self._any_day or self._any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def next_after(self, ts):
+        start = datetime.fromtimestamp(ts).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.replace(hour=0, minute=0)
+        for _ in range(366 * 5):
+            if self._day_matches(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate >= start:
+                            return candidate.timestamp()
+            day += timedelta(days=1)
+        raise ValueError(f"cron 表达式在5年内没有匹配的时间：{self.expression}")
+
+    def describe(self):
+        return f"cron {self.expression}"
+
+
+def daily_trigger(at):
+    """每天固定时刻，如 "04:00" """
+    try:
+        hour, minute = (int(x) for x in at.split(":")[:2])
+    except (ValueError, AttributeError):
+        raise ValueError(f"at 应为 时:分 的形式，如 04:00：{at}") from None
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        raise ValueError(f"at 超出范围：{at}")
+    trigger = CronTrigger(f"{minute} {hour} * * *")
+    trigger.describe = lambda: f"每天 {hour:02d}:{minute:02d}"
+    return trigger
+
+
+class Job:
+    """一个定时任务"""
+
+    def __init__(self, name, trigger, action="wifi_reboot", jitter=0, missed="run_once", run_now=False):
+        if action not in ACTIONS:
+            raise ValueError(f"未知的任务动作：{action}")
+        if missed not in MISSED_POLICIES:
+            raise ValueError(f"未知的错过处理方式：{missed}")
+        self.name = name
+        self.trigger = trigger
+        self.action = action
+        self.jitter = jitter  # 每次在计划时间后随机推迟 0~jitter 秒
+        self.missed = missed  # 错过计划时间（休眠、关机）后的处理方式
+        self.run_now = run_now  # 启动时立即执行一次
+        self.base = None  # 本次计划时间（不含随机推迟）
+        self.due = None  # 本次实际执行时间
+
+    @classmethod
+    def from_dict(cls, data, index=0):
+        """按配置中的一条规则创建任务；取值有误时抛出 ValueError，信息中带任务名"""
+        name = data.get("name") or f"任务{index + 1}"
+        unit = data.get("unit", "时")
+        jitter = data.get("jitter", 0)
+        action = data.get("action", "wifi_reboot")
+        missed = data.get("missed", "run_once")
+        errors = []
+        if unit not in profiles.CHOICES["interval_unit"]:
+            errors.append(f"unit 应为 {'/'.join(profiles.CHOICES['interval_unit'])} 之一")
+        if not _is_number(jitter) or jitter < 0:
+            errors.append("jitter 应为不小于0的数字")
+        if action not in ACTIONS:
+            errors.append(f"action 应为 {'/'.join(ACTIONS)} 之一")
+        if missed not in MISSED_POLICIES:
+            errors.append(f"missed 应为 {'/'.join(MISSED_POLICIES)} 之一")
+        if "every" in data and "cron" not in data and "at" not in data and (
+                not _is_number(data["every"]) or data["every"] <= 0):
+            errors.append("every 应为大于0的数字")
+        if not isinstance(data.get("run_now", False), bool):
+            errors.append("run_now 应为布尔值")
+        if errors:
+            raise ValueError(f"定时任务【{name}】：{'；'.join(errors)}")
+
+        try:
+            if "cron" in data:
+                trigger = CronTrigger(data["cron"])
+            elif "at" in data:
+                trigger = daily_trigger(data["at"])
+            elif "every" in data:
+                trigger = IntervalTrigger(profiles.convert_to_seconds(data["every"], unit))
+            else:
+                raise ValueError(f"定时规则需要 cron、at 或 every：{data}")
+        except ValueError as e:
+            raise ValueError(f"定时任务【{name}】：{str(e)}") from None
+        return cls(name, trigger, action, jitter, missed, data.get("run_now", False))
+
+    def describe(self):
+        text = f"{self.name}（{self.trigger.describe()}，{ACTIONS[self.action]}"
+        if self.jitter:
+            text += f"，随机推迟≤{self.jitter:g}秒"
+        return text + "）"
+
+
+def jobs_from_config(config, interval=None, unit=None):
+    """配置中 schedules 非空时使用其中的规则，否则按 auto_interval/interval_unit 生成一个间隔任务"""
+    if config.get("schedules") and interval is None:
+        return [Job.from_dict(data, i) for i, data in enumerate(config["schedules"])]
+    interval = interval or config["auto_interval"]
+    unit = unit or config["interval_unit"]
+    seconds = profiles.convert_to_seconds(interval, unit)
+    return [Job(f"每{interval}{unit}", IntervalTrigger(seconds), run_now=True)]
+
+
+class Scheduler:
+    """在后台线程中按计划时间依次执行任务；run_job(job) 同步执行，同一时间只运行一个任务"""
+
+    def __init__(self, run_job, state_path=None, log=None, on_change=None, grace=60):
+        self.run_job = run_job
+        self.state_path = state_path  # 记录各任务下次的计划时间，用于重启程序后识别错过的执行
+        self.log = log or (lambda message: None)
+        self.on_change = on_change  # 下次执行时间变化时回调 on_change(job 或 None)
+        self.grace = grace  # 超过计划时间多少秒视为错过
+        self.jobs = []
+        self._heap = []
+        self._seq = itertools.count()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # ---- 状态文件 ----
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        state = self._load_state()
+        for job in self.jobs:
+            if job.base is not None:
+                state[job.name] = {"next_base": job.base}
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.state_path)
+
+    # ---- 计划 ----
+    def _push(self, job, base, due=None):
+        job.base = base
+        job.due = due if due is not None else base + (random.uniform(0, job.jitter) if job.jitter else 0)
+        heapq.heappush(self._heap, (job.due, next(self._seq), job))
+
+    def add(self, job, now=None):
+        """添加任务；状态文件中有上次保存的计划时间时沿用，已错过的按任务的错过处理方式处理"""
+        now = now or time.time()
+        planned = self._load_state().get(job.name, {}).get("next_base")
+        if isinstance(job.trigger, IntervalTrigger) and job.trigger.anchor is None:
+            job.trigger.anchor = planned if planned is not None and not job.run_now else now
+
+        with self._lock:
+            self.jobs.append(job)
+            if job.run_now:
+                self._push(job, now, now)
+            elif planned is not None and planned < now - self.grace:
+                if job.missed == "run_once":
+                    self.log(f"⚠️ 定时任务【{job.name}】错过了 {format_time(planned)} 的执行，立即补执行一次")
+                    self._push(job, now, now)
+                else:
+                    self.log(f"⚠️ 定时任务【{job.name}】错过了 {format_time(planned)} 的执行，已跳过")
+                    self._push(job, job.trigger.next_after(now))
+            elif planned is not None:
+                self._push(job, planned)
+            else:
+                self._push(job, job.trigger.next_after(now))
+        self._wake.set()
+        return job
+
+    def next_job(self):
+        """最近一个待执行的任务"""
+        with self._lock:
+            return self._heap[0][2] if self._heap else None
+
+    # ---- 运行 ----
+    def start(self):
+        self._save_state()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="scheduler")
+        self._thread.start()
+        self._notify()
+        return self
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread and timeout is not None:
+            self._thread.join(timeout)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive() and not self._stopped.is_set()
+
+    def _notify(self):
+        if self.on_change:
+            self.on_change(self.next_job())
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            with self._lock:
+                due = self._heap[0][0] if self._heap else None
+            wait = MAX_SLEEP if due is None else min(due - time.time(), MAX_SLEEP)
+            if wait > 0:
+                self._wake.wait(wait)
+                self._wake.clear()
+                continue
+
+            with self._lock:
+                _, _, job = heapq.heappop(self._heap)
+            late = time.time() - job.due
+            if late > self.grace and job.missed == "skip":
+                self.log(f"⚠️ 定时任务【{job.name}】错过了 {format_time(job.due)} 的执行，已跳过")
+            else:
+                try:
+                    self.run_job(job)
+                except Exception as e:
+                    self.log(f"❌ 定时任务【{job.name}】执行出错：{str(e)}")
+            if self._stopped.is_set():
+                break
+
+            # 从计划时间往后推算，不受执行耗时影响；休眠或执行过久而落后时，已错过的计划由本次执行合并
+            now = time.time()
+            base = job.trigger.next_after(job.base)
+            if base < now - self.grace:
+                base = job.trigger.next_after(now)
+            with self._lock:
+                self._push(job, base)
+            self._save_state()
+            self._notify()
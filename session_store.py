@@ -0,0 +1,68 @@
+"""光猫登录会话的持久化：HTTP直连登录成功后按 光猫地址+用户名 保存 Cookie，
+下次运行先用它打开重启页，仍然有效就跳过整个登录流程
+
+光猫重启后所有会话都会失效，所以重启指令提交成功后会删除保存的会话（留着它下次只会多一次无效的检查请求）。
+复用发生在登录成功但后续步骤失败的情况：同一次操作的重试、或下一次运行都直接从重启页开始，不必再登录。
+文件中是有效的登录凭据，只允许当前用户读写。
+"""
+import json
+import os
+import threading
+import time
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "sessions.json")
+
+
+def session_key(config):
+    return f"{config['router_ip']}|{config['username']}"
+
+
+class SessionStore:
+    """线程安全的会话文件，每次修改后整体原子写回"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._sessions = None  # 首次使用时才读取文件
+
+    def _load(self):
+        if self._sessions is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._sessions = json.load(f)
+            except (OSError, ValueError):
+                self._sessions = {}
+        return self._sessions
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        try:
+            os.remove(tmp)  # 上次残留的临时文件可能权限较宽，重新创建
+        except FileNotFoundError:
+            pass
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self._sessions, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+    def get(self, config, max_age):
+        """返回保存时间在 max_age 秒内的 Cookie，没有时返回 None"""
+        with self._lock:
+            entry = self._load().get(session_key(config))
+        if not entry or time.time() - entry["saved"] > max_age:
+            return None
+        return dict(entry["cookies"])
+
+    def put(self, config, cookies):
+        with self._lock:
+            self._load()[session_key(config)] = {"cookies": dict(cookies), "saved": time.time()}
+            self._save()
+
+    def drop(self, config):
+        with self._lock:
+            if self._load().pop(session_key(config), None) is not None:
+                self._save()
+
+
+STORE = SessionStore()
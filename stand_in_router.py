@@ -0,0 +1,401 @@
+"""本地模拟光猫：复现中兴光猫的登录页、menu.gch 跳转和 manager_user_dev_conf_t.gch 重启页
+
+用于在没有真实光猫的情况下测试和对比各个重启引擎：
+    python stand_in_router.py --port 8080 --password 123456
+然后把配置中的 router_ip 改成 127.0.0.1:8080 即可。
+加上 --downtime 10 后，收到重启指令的光猫会断开10秒再恢复，用于测试重启后的断开/恢复确认。
+页面与真实光猫一样引用了样式表、图片和字体，--asset-latency 可模拟光猫返回静态资源较慢。
+故障注入（延迟分布、断开连接、500、卡住、中途消失）见 fault_injection.py。
+"""
+import argparse
+import base64
+import json
+import secrets
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import profiles
+
+MANAGE_PATH = "/getpage.gch?pid=1002&nextpage=manager_user_dev_conf_t.gch"
+
+# 各页面引用的静态资源（样式表中再引用背景图和字体），精简浏览器模式会屏蔽这些请求
+ASSET_LINKS = """<link rel="stylesheet" type="text/css" href="/static/frame.css">
+<link rel="icon" href="/static/favicon.ico">"""
+ASSET_IMAGES = """<img src="/static/logo.gif" alt=""><img src="/static/banner.jpg" alt="">"""
+STYLESHEET = """@font-face { font-family: "ZTE"; src: url("/static/zte.woff") format("woff"); }
+body { font-family: "ZTE", sans-serif; background: url("/static/bg.png") repeat-x; }
+.Button { background: url("/static/button.png") no-repeat; }"""
+# 1x1 透明 GIF，图片类资源统一返回它
+PIXEL = base64.b64decode("R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7")
+ASSETS = {
+    "/static/frame.css": ("text/css", STYLESHEET.encode("utf-8")),
+    "/static/favicon.ico": ("image/x-icon", PIXEL),
+    "/static/logo.gif": ("image/gif", PIXEL),
+    "/static/banner.jpg": ("image/gif", PIXEL),
+    "/static/bg.png": ("image/gif", PIXEL),
+    "/static/button.png": ("image/gif", PIXEL),
+    "/static/zte.woff": ("font/woff", bytes(2048)),
+}
+PAGE_ASSETS = {"assets": ASSET_LINKS, "images": ASSET_IMAGES}
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>ZXHN 登录</title>
+{assets}
+<script type="text/javascript">
+function goPage(role) {{
+    document.getElementById('Username').value = role;
+    document.getElementById('loginArea').style.display = '';
+}}
+</script></head>
+<body>
+{images}
+<table><tr>
+<td id="role_admin"><a class="admin" onclick="goPage('admin');">管理员</a></td>
+<td id="role_user"><a class="user" onclick="goPage('user');">普通用户</a></td>
+</tr></table>
+<form name="fLogin" id="fLogin" method="post" action="/">
+<input type="hidden" name="action" value="login">
+<input type="hidden" name="Frm_Logintoken" value="{token}">
+<input type="hidden" name="Username" id="Username" value="">
+<div id="loginArea" style="display:none">
+<input type="password" name="skypsd" id="skypsd" value="">
+<input type="submit" id="LoginId" value="登录">
+</div>
+</form>
+<div id="errmsg">{error}</div>
+</body></html>"""
+
+MENU_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>ZXHN</title>
+{assets}</head>
+<body>{images}<div id="mainMenu"><a href="{manage_path}">设备管理</a></div></body></html>"""
+
+MANAGE_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>设备管理</title>
+{assets}
+<script type="text/javascript">
+function pageRestart() {{
+    document.getElementById('confirmLayer').style.display = '';
+}}
+function hideConfirm() {{
+    document.getElementById('confirmLayer').style.display = 'none';
+}}
+function doRestart() {{
+    document.getElementById('IF_ACTION').value = 'devrestart';
+    document.getElementById('fSubmit').submit();
+}}
+</script></head>
+<body>
+{images}
+<form name="fSubmit" id="fSubmit" method="post" action="{manage_path}">
+<input type="hidden" name="IF_ACTION" id="IF_ACTION" value="">
+<input type="hidden" name="_SESSION_TOKEN" value="{token}">
+<input type="button" id="Submit1" class="Button" value="设备重启" onclick="pageRestart();">
+</form>
+<div id="confirmLayer" style="display:none">
+<span>确定要重启设备吗？</span>
+<input type="button" id="msgconfirmb" value="确定" onclick="doRestart();">
+<input type="button" id="msgcancelb" value="取消" onclick="hideConfirm();">
+</div>
+</body></html>"""
+
+RESTART_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>设备重启</title></head>
+<body><div id="restartMsg">设备正在重启，请稍候...</div></body></html>"""
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "Mini web server"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def router(self):
+        return self.server.router
+
+    def session(self):
+        for part in (self.headers.get("Cookie") or "").split(";"):
+            name, _, value = part.strip().partition("=")
+            if name == "SID" and value in self.router.sessions:
+                return value
+        return None
+
+    def read_form(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode("utf-8") if length else ""
+        return {k: v[0] for k, v in parse_qs(body, keep_blank_values=True).items()}
+
+    def send_page(self, html, status=200, headers=None, content_type="text/html; charset=utf-8"):
+        data = html if isinstance(html, bytes) else html.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def redirect(self, location, headers=None):
+        headers = dict(headers or {})
+        headers["Location"] = location
+        self.send_page("", status=302, headers=headers)
+
+    def do_GET(self):
+        if self.router.before_request(self):
+            return
+        path = urlsplit(self.path)
+        if path.path == "/":
+            self.send_page(self.router.login_page())
+        elif path.path in ASSETS:
+            self.router.before_asset()
+            content_type, data = ASSETS[path.path]
+            self.send_page(data, content_type=content_type)
+        elif path.path == "/menu.gch":
+            if not self.session():
+                return self.redirect("/")
+            self.send_page(MENU_PAGE.format(manage_path=MANAGE_PATH, **PAGE_ASSETS))
+        elif path.path == "/getpage.gch":
+            sid = self.session()
+            if not sid:
+                return self.redirect("/")
+            self.send_page(MANAGE_PAGE.format(manage_path=MANAGE_PATH, token=self.router.sessions[sid],
+                                              **PAGE_ASSETS))
+        else:
+            self.send_page("Not Found", status=404)
+
+    def do_POST(self):
+        if self.router.before_request(self):
+            return
+        path = urlsplit(self.path)
+        form = self.read_form()
+        if path.path == "/":
+            sid = self.router.login(form)
+            if sid is None:
+                return self.send_page(self.router.login_page(error="用户名或密码错误"))
+            self.redirect("/menu.gch", headers={"Set-Cookie": f"SID={sid}; path=/"})
+        elif path.path == "/getpage.gch":
+            sid = self.session()
+            if not sid:
+                return self.redirect("/")
+            if form.get("_SESSION_TOKEN") != self.router.sessions[sid]:
+                return self.send_page("Invalid token", status=403)
+            if form.get("IF_ACTION") != "devrestart":
+                return self.send_page(MANAGE_PAGE.format(manage_path=MANAGE_PATH, token=self.router.sessions[sid],
+                                                         **PAGE_ASSETS))
+            self.router.reboot()
+            self.send_page(RESTART_PAGE)
+        else:
+            self.send_page("Not Found", status=404)
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 客户端超时后先断开是正常情况（故障注入时尤其常见），不打印堆栈
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+class StandInRouter:
+    """在后台线程中运行的模拟光猫，可作为上下文管理器使用"""
+
+    def __init__(self, host="127.0.0.1", port=0, username="user", password="", latency=0.0,
+                 downtime=0.0, down_after=0.5, asset_latency=0.0, faults=None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.latency = latency  # 每个请求的额外延迟（秒）
+        self.downtime = downtime  # 重启时断开的时长（秒），0为不断开
+        self.down_after = down_after  # 收到重启指令后多久断开（秒）
+        self.asset_latency = asset_latency  # 静态资源（图片/样式/字体）的额外延迟（秒）
+        self.faults = faults  # fault_injection.FaultPlan，按规则注入故障
+        self.sessions = {}  # SID -> 会话令牌
+        self.login_tokens = set()
+        self.login_count = 0
+        self.reboot_count = 0
+        self.last_reboot_time = None
+        self.outage_count = 0
+        self.asset_count = 0  # 已返回的静态资源请求数
+        self._halted = threading.Event()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def router_ip(self):
+        return f"{self.host}:{self.port}"
+
+    def profile(self, **overrides):
+        """生成指向本模拟光猫的配置"""
+        config = profiles.get_default_config()
+        config.update({
+            "router_ip": self.router_ip,
+            "login_url": "http://{router_ip}/",
+            "start_page_url": "http://{router_ip}/menu.gch",
+            "manage_url": "http://{router_ip}" + MANAGE_PATH,
+            "username": self.username,
+            "password": self.password,
+            "wifi_list": [],
+            "auto_interval": 24,
+            "interval_unit": "时",
+            "verify_reboot": self.downtime > 0,
+        })
+        config.update(overrides)
+        return config
+
+    def before_request(self, handler):
+        """请求处理前的延迟和故障注入，返回 True 表示请求已被故障处理（不再正常应答）"""
+        if self.latency:
+            time.sleep(self.latency)
+        if self.faults is None:
+            return False
+        delay, action = self.faults.decide(handler.command, handler.path)
+        if delay:
+            time.sleep(delay)
+        if action is None:
+            return False
+        if action == "error":
+            handler.send_page("Internal Server Error", status=500)
+            return True
+        if action == "stall":
+            self._halted.wait(self.faults.stall)
+        elif action == "vanish":
+            # 光猫消失：连接不再有任何应答，直到模拟光猫停止
+            self._halted.wait()
+        # 不发送响应直接断开
+        handler.close_connection = True
+        return True
+
+    def before_asset(self):
+        with self._lock:
+            self.asset_count += 1
+        if self.asset_latency:
+            time.sleep(self.asset_latency)
+
+    def login_page(self, error=""):
+        token = secrets.token_hex(8)
+        with self._lock:
+            self.login_tokens.add(token)
+        return LOGIN_PAGE.format(token=token, error=error, **PAGE_ASSETS)
+
+    def login(self, form):
+        with self._lock:
+            if form.get("Frm_Logintoken") not in self.login_tokens:
+                return None
+            self.login_tokens.discard(form["Frm_Logintoken"])
+            if form.get("Username") != self.username or form.get("skypsd") != self.password:
+                return None
+            sid = secrets.token_hex(16)
+            self.sessions[sid] = secrets.token_hex(8)
+            self.login_count += 1
+            return sid
+
+    def reboot(self):
+        with self._lock:
+            self.reboot_count += 1
+            self.last_reboot_time = time.time()
+            # 重启后所有会话失效
+            self.sessions.clear()
+        if self.downtime:
+            threading.Thread(target=self.power_cycle, daemon=True).start()
+
+    def power_cycle(self):
+        """模拟断电重启：down_after 秒后关闭监听端口，downtime 秒后在同一端口恢复"""
+        if self._halted.wait(self.down_after):
+            return
+        with self._lock:
+            self.outage_count += 1
+        self._close_server()
+        if not self._halted.wait(self.downtime):
+            self._open_server()
+
+    def _open_server(self):
+        server = StandInServer((self.host, self.port), StandInHandler)
+        server.router = self
+        self.port = server.server_address[1]
+        self._thread = threading.Thread(target=server.serve_forever, daemon=True)
+        self._thread.start()
+        self._server = server
+
+    def _close_server(self):
+        server, self._server = self._server, None
+        if server:
+            server.shutdown()
+            server.server_close()
+
+    def start(self):
+        self._halted.clear()
+        self._open_server()
+        return self
+
+    def stop(self):
+        self._halted.set()
+        self._close_server()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def compare_engines(router, runs):
+    """在模拟光猫上依次运行各重启引擎并输出耗时"""
+    import reboot_engine
+
+    for name, cls in reboot_engine.ENGINE_CLASSES.items():
+        durations = []
+        error = None
+        for _ in range(runs):
+            start = time.perf_counter()
+            try:
+                cls(router.profile()).run()
+            except Exception as e:
+                error = e
+                break
+            durations.append(time.perf_counter() - start)
+        if durations:
+            print(f"{name:10s} 成功 {len(durations)} 次，平均 {sum(durations) / len(durations):.3f}s，"
+                  f"最快 {min(durations):.3f}s，最慢 {max(durations):.3f}s")
+        if error:
+            print(f"{name:10s} 失败：{error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟光猫")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--username", default="user")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的额外延迟（秒）")
+    parser.add_argument("--downtime", type=float, default=0.0, help="收到重启指令后断开的时长（秒）")
+    parser.add_argument("--asset-latency", type=float, default=0.0, help="静态资源的额外延迟（秒）")
+    parser.add_argument("--compare", type=int, metavar="N", help="对比各重启引擎，每个引擎运行N次后退出")
+    args = parser.parse_args()
+
+    router = StandInRouter(args.host, args.port, args.username, args.password, args.latency,
+                           args.downtime, asset_latency=args.asset_latency).start()
+    if args.compare:
+        compare_engines(router, args.compare)
+        router.stop()
+        return
+    print(f"模拟光猫已启动：http://{router.router_ip}/  （Ctrl+C 退出）")
+    print(json.dumps(router.profile(), ensure_ascii=False, indent=2))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        router.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""后台服务：重启后恢复定时任务时不立即执行，用户启动时立即执行一次"""
+import concurrent.futures
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import daemon
+import profiles
+
+
+@pytest.fixture
+def service(tmp_path):
+    (tmp_path / "configs").mkdir()
+    service = daemon.RebootDaemon(config_dir=str(tmp_path / "configs"), log_dir=str(tmp_path / "logs"))
+    service.repo.save(service.profile_path("test"), profiles.get_default_config())
+    service.ran = threading.Event()
+    service.run_scheduled_job = lambda name, config, job, runner=None: service.ran.set()
+    yield service
+    service.close()
+
+
+def interval_name(config):
+    return f"每{config['auto_interval']}{config['interval_unit']}"
+
+
+def test_resumed_schedule_keeps_saved_plan(service, tmp_path):
+    planned = time.time() + 86400
+    (tmp_path / "logs" / daemon.ACTIVE_FILE).write_text(json.dumps(["test"]), encoding="utf-8")
+    (tmp_path / "logs" / "schedule_test.json").write_text(
+        json.dumps({interval_name(profiles.get_default_config()): {"next_base": planned}}), encoding="utf-8")
+    service.resume_schedules()
+    assert not service.ran.wait(0.5)
+    assert service.schedules["test"].next_job().due == planned
+
+
+def test_resumed_schedule_uses_config_it_was_started_with(service, tmp_path):
+    # 界面带着未保存的修改启动定时任务，服务重启后应按这份配置恢复，而不是配置文件里的
+    config = dict(profiles.get_default_config(), auto_interval=7)
+    service.api_schedule({}, {"profile": "test", "config": config})
+    assert service.ran.wait(2)
+    assert os.stat(tmp_path / "logs" / daemon.ACTIVE_FILE).st_mode & 0o077 == 0
+
+    restarted = daemon.RebootDaemon(config_dir=str(tmp_path / "configs"), log_dir=str(tmp_path / "logs"))
+    started = []
+    restarted.run_scheduled_job = lambda name, config, job, runner=None: None
+    restarted.start_schedule = lambda name, config, resume=False: started.append((name, config, resume))
+    try:
+        restarted.resume_schedules()
+    finally:
+        restarted.close()
+    assert [(name, c["auto_interval"], resume) for name, c, resume in started] == [("test", 7, True)]
+
+
+def test_started_schedule_runs_immediately(service):
+    service.start_schedule("test", service.load_config("test"))
+    assert service.ran.wait(2)
+
+
+def test_restarting_a_schedule_keeps_it_stoppable(service):
+    # 重新启动定时任务会取消正在执行的作业，旧作业退出时不能移除新作业的登记
+    del service.run_scheduled_job
+    futures = []
+
+    def submit(name, config, action):
+        futures.append(concurrent.futures.Future())
+        return futures[-1]
+
+    registered = threading.Event()
+
+    def log(message):
+        if "已取消" in message:
+            registered.wait(2)  # 让旧作业在新作业登记之后才退出
+
+    service.submit = submit
+    service.profile_log = lambda name: log
+    config = service.load_config("test")
+    service.start_schedule("test", config)
+    wait_for(lambda: len(futures) == 1)
+    service.start_schedule("test", config)
+    wait_for(lambda: len(futures) == 2 and service._scheduled.get("test") is futures[1])
+    registered.set()
+    assert futures[0].cancelled()
+    time.sleep(0.1)
+    assert service._scheduled.get("test") is futures[1]
+    assert service.stop_schedule("test")
+    assert futures[1].cancelled()
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
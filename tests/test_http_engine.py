@@ -0,0 +1,79 @@
+"""HTTP直连引擎：用本地模拟光猫验证重启成功，以及密码错误时回退到浏览器模拟"""
+import pytest
+
+import reboot_engine
+import session_store
+from orchestrator import Orchestrator
+from stand_in_router import StandInRouter
+
+
+@pytest.fixture(autouse=True)
+def session_file(tmp_path, monkeypatch):
+    # 会话文件写到临时目录，不碰仓库中的 logs/sessions.json
+    monkeypatch.setattr(session_store, "STORE", session_store.SessionStore(str(tmp_path / "sessions.json")))
+
+
+@pytest.fixture
+def router():
+    with StandInRouter(password="secret") as router:
+        yield router
+
+
+class FakeSelenium:
+    """代替浏览器模拟引擎，只记录被调用"""
+    name = "selenium"
+    label = "浏览器模拟"
+    runs = 0
+
+    def __init__(self, config, **kwargs):
+        pass
+
+    def run(self):
+        FakeSelenium.runs += 1
+
+
+def test_http_engine_reboots_stand_in_router(router):
+    reboot_engine.HttpRebootEngine(router.profile()).run()
+    assert router.reboot_count == 1
+
+
+def test_run_reboot_uses_http_engine(router):
+    assert reboot_engine.run_reboot(router.profile()) == "http"
+    assert router.login_count == 1
+    assert router.reboot_count == 1
+
+
+def test_bad_password_falls_back_to_selenium(router, monkeypatch):
+    monkeypatch.setitem(reboot_engine.ENGINE_CLASSES, "selenium", FakeSelenium)
+    FakeSelenium.runs = 0
+    logs = []
+    assert reboot_engine.run_reboot(router.profile(password="wrong"), log=logs.append) == "selenium"
+    assert FakeSelenium.runs == 1
+    assert router.reboot_count == 0
+    assert any("改用浏览器模拟" in line for line in logs)
+
+
+def test_bad_password_raises_login_error(router):
+    with pytest.raises(reboot_engine.LoginError):
+        reboot_engine.HttpRebootEngine(router.profile(password="wrong")).run()
+
+
+def test_orchestrator_reboot_does_not_retry_login_error(router, monkeypatch):
+    orchestrator = Orchestrator()
+    browser_runs = []
+
+    async def selenium_reboot(config, log, progress, driver_pool, timer):
+        browser_runs.append(config["router_ip"])
+        raise reboot_engine.LoginError("登录失败")
+
+    monkeypatch.setattr(orchestrator, "_selenium_reboot", selenium_reboot)
+    config = router.profile(password="wrong", retry_attempts=3, retry_base_delay=0)
+    try:
+        with pytest.raises(reboot_engine.LoginError):
+            orchestrator.run(orchestrator.reboot(config, timeout=10))
+        assert browser_runs == [router.router_ip]
+        assert orchestrator.breaker(config).failures == 1
+        assert orchestrator.run(orchestrator.reboot(router.profile(), timeout=10)) == "http"
+        assert orchestrator.breaker(config).failures == 0
+    finally:
+        orchestrator.stop()
@@ -0,0 +1,121 @@
+"""设备作业队列：合并、拒绝重复的重启、等待者全部离开后取消作业"""
+import asyncio
+
+import pytest
+
+from job_queue import JobQueue, JobRejected
+from metrics import Metrics
+from orchestrator import Orchestrator
+
+
+class Blocker:
+    """作业工厂：每次调用记一次，作业一直阻塞到 release()"""
+
+    def __init__(self, result="done"):
+        self.result = result
+        self.calls = 0
+        self.started = asyncio.Event()
+        self.cancelled = False
+        self._release = asyncio.Event()
+
+    def __call__(self):
+        self.calls += 1
+        return self.run()
+
+    async def run(self):
+        self.started.set()
+        try:
+            await self._release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self.result
+
+    def release(self):
+        self._release.set()
+
+
+def total(counter):
+    return sum(value for _, _, value in counter.samples())
+
+
+def make_queue():
+    metrics = Metrics()
+    return JobQueue(Orchestrator(metrics=metrics), metrics), metrics
+
+
+def test_pending_jobs_of_same_kind_are_coalesced():
+    async def scenario():
+        jobs, metrics = make_queue()
+        running, pending = Blocker("first"), Blocker("wifi")
+        first = asyncio.ensure_future(jobs.run("r1", "reboot", running))
+        await running.started.wait()
+        waiters = [asyncio.ensure_future(jobs.run("r1", "wifi", pending)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert total(metrics.jobs_coalesced) == 2
+        running.release()
+        pending.release()
+        assert await first == "first"
+        assert await asyncio.gather(*waiters) == ["wifi"] * 3
+        assert pending.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_duplicate_reboot_is_rejected_while_one_is_running():
+    async def scenario():
+        jobs, metrics = make_queue()
+        running = Blocker()
+        first = asyncio.ensure_future(jobs.run("r1", "reboot", running))
+        await running.started.wait()
+        for kind in ("reboot", "wifi_reboot"):
+            with pytest.raises(JobRejected):
+                await jobs.run("r1", kind, Blocker())
+        assert total(metrics.jobs_rejected) == 2
+        # 其他光猫不受影响
+        other = Blocker("other")
+        other.release()
+        assert await jobs.run("r2", "reboot", other) == "other"
+        running.release()
+        assert await first == "done"
+
+    asyncio.run(scenario())
+
+
+def test_pending_job_is_dropped_when_last_waiter_cancels():
+    async def scenario():
+        jobs, _ = make_queue()
+        running, pending = Blocker(), Blocker()
+        first = asyncio.ensure_future(jobs.run("r1", "reboot", running))
+        await running.started.wait()
+        waiters = [asyncio.ensure_future(jobs.run("r1", "wifi", pending)) for _ in range(2)]
+        await asyncio.sleep(0)
+        waiters[0].cancel()
+        await asyncio.sleep(0)
+        assert (await jobs.status())[0]["pending"] == ["wifi"]  # 还有一个等待者，作业保留
+        waiters[1].cancel()
+        await asyncio.sleep(0)
+        assert (await jobs.status())[0]["pending"] == []
+        running.release()
+        await first
+        assert pending.calls == 0
+
+    asyncio.run(scenario())
+
+
+def test_running_job_is_cancelled_when_last_waiter_cancels():
+    async def scenario():
+        jobs, _ = make_queue()
+        running, after = Blocker(), Blocker("after")
+        waiter = asyncio.ensure_future(jobs.run("r1", "wifi", running))
+        await running.started.wait()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+        assert running.cancelled
+        # 队列继续处理后面的作业
+        after.release()
+        assert await jobs.run("r1", "reboot", after) == "after"
+
+    asyncio.run(scenario())
@@ -0,0 +1,70 @@
+"""WiFi选择：按信号排序、扫描结果缓存，以及用内存后端走完整的连接流程"""
+import asyncio
+
+from network_backend import MockBackend, Network, rank_networks
+from orchestrator import Orchestrator
+
+
+def test_rank_networks_orders_visible_by_signal_then_hidden_in_config_order():
+    networks = [Network("B", 40), Network("C", 90), Network("B", 70), Network("X", 99)]
+    ranked, signals = rank_networks(["A", "B", "C", "D"], networks)
+    assert ranked == ["C", "B", "A", "D"]
+    assert signals["B"] == 70  # 同名多个接入点取最强的
+
+
+def test_rank_networks_keeps_config_order_without_scan_results():
+    assert rank_networks(["A", "B"], [])[0] == ["A", "B"]
+
+
+def test_scan_is_cached_within_ttl():
+    backend = MockBackend({"A": 50}, scan_ttl=30)
+
+    async def scan_twice():
+        await backend.scan()
+        await backend.scan()
+
+    asyncio.run(scan_twice())
+    assert backend.scans == 1
+    backend.invalidate()
+    asyncio.run(backend.scan())
+    assert backend.scans == 2
+
+
+def test_scan_ttl_zero_always_rescans():
+    backend = MockBackend({"A": 50}, scan_ttl=0)
+    asyncio.run(backend.scan())
+    asyncio.run(backend.scan())
+    assert backend.scans == 2
+
+
+def test_connect_wifi_tries_strongest_first_and_skips_failures():
+    backend = MockBackend({"weak": 20, "strong": 90, "broken": 95}, fail={"broken"})
+    orchestrator = Orchestrator()
+    try:
+        connected = orchestrator.run(orchestrator.connect_wifi(["weak", "strong", "broken"], backend=backend))
+    finally:
+        orchestrator.stop()
+    assert connected
+    assert backend.attempts == ["broken", "strong"]
+
+
+def test_connect_wifi_invalidates_scan_after_all_fail():
+    backend = MockBackend({"A": 50}, fail={"A"})
+    orchestrator = Orchestrator()
+    try:
+        assert not orchestrator.run(orchestrator.connect_wifi(["A", "hidden"], backend=backend))
+        assert backend.attempts == ["A", "hidden"]
+        orchestrator.run(orchestrator.connect_wifi(["A"], backend=backend))
+    finally:
+        orchestrator.stop()
+    assert backend.scans == 2
+
+
+def test_connect_wifi_reports_unknown_backend():
+    orchestrator = Orchestrator()
+    logs = []
+    try:
+        assert not orchestrator.run(orchestrator.connect_wifi(["A"], log=logs.append, backend="bogus"))
+    finally:
+        orchestrator.stop()
+    assert any("未知的网络后端" in line for line in logs)
@@ -0,0 +1,43 @@
+"""阶段计时：请求失败时出错的阶段立即记录真实的错误"""
+import asyncio
+
+import pytest
+
+import session_store
+from fault_injection import LOGIN_POST, FaultPlan, FaultRule
+from orchestrator import AsyncHttpRebootEngine
+from phase_timer import PhaseTimer
+from reboot_engine import HttpRebootEngine
+from stand_in_router import StandInRouter
+
+
+@pytest.fixture(autouse=True)
+def session_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_store, "STORE", session_store.SessionStore(str(tmp_path / "sessions.json")))
+
+
+@pytest.fixture
+def router():
+    # 登录请求的连接总是被断开
+    with StandInRouter(password="secret", faults=FaultPlan([FaultRule("drop", *LOGIN_POST)])) as router:
+        yield router
+
+
+def failed_phase(timer):
+    return [(r.phase, r.outcome, r.error) for r in timer.records if r.outcome != "ok"]
+
+
+def test_failing_phase_records_request_error(router):
+    timer = PhaseTimer()
+    with pytest.raises(Exception) as info:
+        HttpRebootEngine(router.profile(), timer=timer).run()
+    assert str(info.value)
+    assert failed_phase(timer) == [("login_redirect", "error", str(info.value))]
+
+
+def test_async_engine_records_request_error(router):
+    timer = PhaseTimer()
+    with pytest.raises(Exception) as info:
+        asyncio.run(AsyncHttpRebootEngine(router.profile(), timer=timer).run())
+    assert str(info.value)
+    assert failed_phase(timer) == [("login_redirect", "error", str(info.value))]
@@ -0,0 +1,49 @@
+"""配置仓库：按修改时间缓存、校验错误和目录列表"""
+import json
+import os
+
+import pytest
+
+import profiles
+
+
+def write(path, data, mtime=None):
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, ns=(mtime, mtime))
+
+
+def test_load_fills_defaults_and_caches_until_file_changes(tmp_path):
+    repo = profiles.ProfileRepository(str(tmp_path))
+    path = tmp_path / "a.json"
+    write(path, {"router_ip": "10.0.0.1"}, mtime=1_000_000_000)
+    config = repo.load(str(path))
+    assert config["router_ip"] == "10.0.0.1"
+    assert config["reboot_timeout"] == profiles.get_default_config()["reboot_timeout"]
+
+    config["router_ip"] = "changed"  # 返回的是副本
+    assert repo.load(str(path))["router_ip"] == "10.0.0.1"
+
+    write(path, {"router_ip": "10.0.0.2"}, mtime=2_000_000_000)
+    assert repo.load(str(path))["router_ip"] == "10.0.0.2"
+
+
+def test_invalid_profile_raises_with_all_errors(tmp_path):
+    repo = profiles.ProfileRepository(str(tmp_path))
+    path = tmp_path / "bad.json"
+    write(path, {"reboot_timeout": -1, "engine": "telnet", "schedules": [{"every": 6, "jitter": -1}]})
+    with pytest.raises(profiles.ProfileError) as info:
+        repo.load(str(path))
+    message = str(info.value)
+    assert "reboot_timeout" in message and "engine" in message and "jitter" in message
+    assert list(repo.check()) == ["bad.json"]
+
+
+def test_list_follows_directory_changes(tmp_path):
+    repo = profiles.ProfileRepository(str(tmp_path))
+    write(tmp_path / "a.json", {})
+    (tmp_path / "notes.txt").write_text("x", encoding="utf-8")
+    assert repo.list() == ["a.json"]
+    write(tmp_path / "b.json", {})
+    os.utime(tmp_path, ns=(3_000_000_000, 3_000_000_000))
+    assert repo.list() == ["a.json", "b.json"]
@@ -0,0 +1,77 @@
+"""定时任务：添加任务时按 run_now、状态文件中保存的计划时间和错过处理方式决定首次执行时间"""
+import json
+
+import pytest
+
+import scheduler
+
+NOW = 1_700_000_000.0
+
+
+def make_scheduler(tmp_path, planned=None, name="每24时"):
+    state = tmp_path / "schedule.json"
+    if planned is not None:
+        state.write_text(json.dumps({name: {"next_base": planned}}), encoding="utf-8")
+    return scheduler.Scheduler(lambda job: None, state_path=str(state), grace=60)
+
+
+def interval_job(run_now=False, missed="run_once"):
+    return scheduler.Job("每24时", scheduler.IntervalTrigger(86400), missed=missed, run_now=run_now)
+
+
+def test_run_now_is_due_immediately(tmp_path):
+    runner = make_scheduler(tmp_path, planned=NOW + 3600)
+    job = runner.add(interval_job(run_now=True), now=NOW)
+    assert job.due == NOW
+    assert job.trigger.anchor == NOW
+
+
+def test_saved_plan_is_kept_without_run_now(tmp_path):
+    # 服务重启后恢复定时任务：沿用保存的计划时间，不立即执行
+    runner = make_scheduler(tmp_path, planned=NOW + 86000)
+    job = runner.add(interval_job(), now=NOW)
+    assert job.due == NOW + 86000
+    assert job.trigger.next_after(job.base) == NOW + 86000 + 86400
+
+
+def test_missed_plan_runs_once(tmp_path):
+    runner = make_scheduler(tmp_path, planned=NOW - 3600)
+    job = runner.add(interval_job(missed="run_once"), now=NOW)
+    assert job.due == NOW
+
+
+def test_missed_plan_is_skipped(tmp_path):
+    runner = make_scheduler(tmp_path, planned=NOW - 3600)
+    job = runner.add(interval_job(missed="skip"), now=NOW)
+    assert job.due == NOW - 3600 + 86400
+
+
+def test_plan_within_grace_is_not_missed(tmp_path):
+    runner = make_scheduler(tmp_path, planned=NOW - 30)
+    job = runner.add(interval_job(missed="skip"), now=NOW)
+    assert job.due == NOW - 30
+
+
+def test_without_state_first_run_is_one_interval_away(tmp_path):
+    runner = make_scheduler(tmp_path)
+    job = runner.add(interval_job(), now=NOW)
+    assert job.due == NOW + 86400
+
+
+def test_jitter_never_moves_due_before_plan(tmp_path):
+    runner = make_scheduler(tmp_path, planned=NOW + 600)
+    job = scheduler.Job("每24时", scheduler.IntervalTrigger(86400), jitter=300)
+    runner.add(job, now=NOW)
+    assert NOW + 600 <= job.due <= NOW + 900
+
+
+@pytest.mark.parametrize("rule, message", [
+    ({"every": 6, "jitter": -5}, "jitter"),
+    ({"at": "04:00", "missed": "later"}, "missed"),
+    ({"every": 1, "unit": "天"}, "unit"),
+    ({"at": "25:00"}, "at"),
+    ({"cron": "1 2 3"}, "cron"),
+])
+def test_invalid_rules_name_the_job(rule, message):
+    with pytest.raises(ValueError, match=rf"【任务1】.*{message}"):
+        scheduler.Job.from_dict(rule)